@@ -0,0 +1,66 @@
+"""
+Şirket bazlı dashboard yanıt önbelleği.
+Her şirketin bir veri sürümü vardır (CompanyDataVersion); kaydediciler ve rapor
+modelleri yazdığında sürüm commit sonrası veritabanında artırılır. Önbellek
+anahtarları sürümü içerdiği için eski girdiler veri değiştiği anda geçersiz olur.
+Sürüm veritabanında tutulduğundan zamanlayıcı ve job worker süreçlerinin yazdığı
+veriyi bütün web worker'ları görür.
+"""
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import CompanyDataVersion
+
+LOCMEM_BACKEND = "django.core.cache.backends.locmem.LocMemCache"
+
+
+def get_company_data_version(company_id):
+    """Şirketin güncel veri sürümü; henüz hiç yazım olmadıysa 0."""
+    version = (
+        CompanyDataVersion.objects.filter(company_id=company_id)
+        .values_list("version", flat=True)
+        .first()
+    )
+    return version or 0
+
+
+def bump_company_data_version(company_id):
+    """Şirketin önbellekteki tüm dashboard yanıtlarını geçersiz kılar."""
+    versions = CompanyDataVersion.objects.filter(company_id=company_id)
+    if versions.update(version=F("version") + 1, updated_at=timezone.now()):
+        return
+    CompanyDataVersion.objects.get_or_create(company_id=company_id)
+    versions.update(version=F("version") + 1, updated_at=timezone.now())
+
+
+def bump_company_data_version_on_commit(company_id):
+    """Yazım transaction'ı commit edildikten sonra sürümü artırır."""
+    transaction.on_commit(lambda: bump_company_data_version(company_id))
+
+
+def dashboard_cache_timeout():
+    """
+    DASHBOARD_CACHE_TIMEOUT; süreç içi (locmem) önbellekte süresiz girdi tutulmaz,
+    DASHBOARD_LOCAL_CACHE_TIMEOUT kullanılır.
+    """
+    timeout = getattr(settings, "DASHBOARD_CACHE_TIMEOUT", None)
+    if timeout is None and settings.CACHES["default"]["BACKEND"] == LOCMEM_BACKEND:
+        return getattr(settings, "DASHBOARD_LOCAL_CACHE_TIMEOUT", 300)
+    return timeout
+
+
+def get_cached_payload(endpoint, company_id, builder):
+    """
+    endpoint + şirket + veri sürümü anahtarıyla önbellekten okur; yoksa builder()
+    ile hesaplayıp yazar.
+    """
+    key = f"company:{company_id}:{endpoint}:v{get_company_data_version(company_id)}"
+    payload = cache.get(key)
+    if payload is None:
+        payload = builder()
+        cache.set(key, payload, timeout=dashboard_cache_timeout())
+    return payload
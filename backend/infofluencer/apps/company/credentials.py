@@ -0,0 +1,137 @@
+"""
+Google OAuth token'ları (GA4, YouTube) için süreç içi credential önbelleği.
+Token'lar şirket + sağlayıcı anahtarıyla CREDENTIAL_CACHE_TTL_SECONDS boyunca
+bellekte tutulur ve süresinin dolmasına CREDENTIAL_REFRESH_MARGIN_SECONDS kala
+yenilenir. Anahtar başına kilit sayesinde aynı anda gelen N istek en fazla bir
+token yenileme isteği ve bir DB yazımı üretir; diğerleri yenilenen token'ı
+bekleyip önbellekten alır. Token satırı kaydedildiğinde ya da silindiğinde
+girdi sinyallerle düşürülür.
+"""
+
+from collections import namedtuple
+from datetime import timedelta
+import logging
+import threading
+import time
+
+import requests
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import GA4Token, YouTubeToken
+
+GOOGLE_TOKEN_URI = "https://oauth2.googleapis.com/token"
+
+# sağlayıcı -> (token modeli, client id ayarı, client secret ayarı)
+CREDENTIAL_PROVIDERS = {
+    "ga4": (GA4Token, "GOOGLE_CLIENT_ID", "GOOGLE_CLIENT_SECRET"),
+    "youtube": (YouTubeToken, "YOUTUBE_CLIENT_ID", "YOUTUBE_CLIENT_SECRET"),
+}
+
+CachedCredentials = namedtuple(
+    "CachedCredentials", ["access_token", "refresh_token", "token_expiry", "loaded_at"]
+)
+
+
+def _margin():
+    return timedelta(seconds=getattr(settings, "CREDENTIAL_REFRESH_MARGIN_SECONDS", 300))
+
+
+def _expiring(token_expiry, now):
+    # Süresi bilinmeyen token geçerli sayılır (eski davranış)
+    return token_expiry is not None and token_expiry - _margin() <= now
+
+
+class CredentialProvider:
+    def __init__(self):
+        self._entries = {}
+        self._locks = {}
+        self._locks_guard = threading.Lock()
+
+    def _lock(self, key):
+        with self._locks_guard:
+            return self._locks.setdefault(key, threading.Lock())
+
+    def _usable(self, entry, now):
+        ttl = getattr(settings, "CREDENTIAL_CACHE_TTL_SECONDS", 300)
+        return (
+            entry is not None
+            and time.monotonic() - entry.loaded_at < ttl
+            and not _expiring(entry.token_expiry, now)
+        )
+
+    def get(self, company_id, provider, force_refresh=False):
+        """
+        Şirketin güncel token'ı (CachedCredentials) ya da bağlantı yoksa None.
+        force_refresh=True ise token süresine bakılmadan yenilenir.
+        """
+        key = (company_id, provider)
+        if not force_refresh:
+            entry = self._entries.get(key)
+            if self._usable(entry, timezone.now()):
+                return entry
+
+        with self._lock(key):
+            # Kilidi bekleyen istekler, önceki sahibin yenilediği token'ı kullanır
+            entry = self._entries.get(key)
+            if self._usable(entry, timezone.now()) and not force_refresh:
+                return entry
+            entry = self._load(company_id, provider, force_refresh)
+            if entry is None:
+                self._entries.pop(key, None)
+            else:
+                self._entries[key] = entry
+            return entry
+
+    def _load(self, company_id, provider, force_refresh):
+        model, _, _ = CREDENTIAL_PROVIDERS[provider]
+        with transaction.atomic():
+            # Row kilidi (destekleyen veritabanlarında) diğer süreçlerle de tek yenileme sağlar
+            token = (
+                model.objects.select_for_update()
+                .filter(company_id=company_id)
+                .order_by("-created_at")
+                .first()
+            )
+            if not token or not token.access_token:
+                return None
+            if token.refresh_token and (force_refresh or _expiring(token.token_expiry, timezone.now())):
+                self._refresh(provider, token)
+        return CachedCredentials(
+            token.access_token, token.refresh_token, token.token_expiry, time.monotonic()
+        )
+
+    def _refresh(self, provider, token):
+        """Token endpoint'ine tek istek atar; başarısız olursa mevcut token kullanılmaya devam eder."""
+        _, client_id_setting, client_secret_setting = CREDENTIAL_PROVIDERS[provider]
+        data = {
+            "client_id": getattr(settings, client_id_setting),
+            "client_secret": getattr(settings, client_secret_setting),
+            "refresh_token": token.refresh_token,
+            "grant_type": "refresh_token",
+        }
+        try:
+            resp = requests.post(GOOGLE_TOKEN_URI, data=data, timeout=30)
+        except requests.RequestException as e:
+            logging.error(f"{provider} token refresh error: {e}")
+            return False
+        if resp.status_code != 200:
+            logging.error(f"{provider} token refresh error: {resp.status_code} {resp.text}")
+            return False
+        token_data = resp.json()
+        token.access_token = token_data["access_token"]
+        token.token_expiry = timezone.now() + timedelta(seconds=token_data.get("expires_in", 3600))
+        token.save(update_fields=["access_token", "token_expiry", "updated_at"])
+        return True
+
+    def invalidate(self, company_id, provider=None):
+        """Şirketin (ya da yalnızca bir sağlayıcısının) önbellekteki token'larını düşürür."""
+        for name in [provider] if provider else CREDENTIAL_PROVIDERS:
+            self._entries.pop((company_id, name), None)
+
+    def clear(self):
+        self._entries.clear()
+
+
+credential_provider = CredentialProvider()
@@ -2,6 +2,34 @@
 Ortak kullanılan yardımcı fonksiyonlar (helpers) burada bulunur.
 """
 
+import heapq
+from functools import lru_cache
+
+UNKNOWN_LABELS = frozenset(
+    ["unknown", "bilinmiyor", "bilinmeyen", "", "(not set)", "not set"]
+)
+
+# Kaynaklara özgü etiketlerin ortak karşılıkları (küçük harfli ham değer -> etiket)
+_LABEL_ALIASES = {
+    "age": {
+        "age13-17": "13-17",
+        "age18-24": "18-24",
+        "age25-34": "25-34",
+        "age35-44": "35-44",
+        "age45-54": "45-54",
+        "age55-64": "55-64",
+        "age65-": "65+",
+    },
+    "gender": {"m": "male", "f": "female", "u": None},
+}
+
+# Boyut başına hazır arama tablosu; None değeri etiketin bilinmediğini belirtir
+_LABEL_LOOKUP = {
+    dimension: {**dict.fromkeys(UNKNOWN_LABELS), **aliases}
+    for dimension, aliases in _LABEL_ALIASES.items()
+}
+_DEFAULT_LABEL_LOOKUP = dict.fromkeys(UNKNOWN_LABELS)
+
 
 def camel_to_snake(name):
     import re
@@ -14,8 +42,20 @@ def is_known(val):
     """
     'unknown', 'not set', boş gibi değerleri filtreler.
     """
-    v = (val or "").strip().lower()
-    return v not in ["unknown", "bilinmiyor", "bilinmeyen", "", "(not set)", "not set"]
+    return (val or "").strip().lower() not in UNKNOWN_LABELS
+
+
+@lru_cache(maxsize=4096)
+def normalize_label(dimension, value):
+    """
+    Ham etiketi boyutun ortak etiketine çevirir (ör. YouTube 'age18-24' -> '18-24',
+    Instagram 'F' -> 'female'). Bilinmeyen değerler için None döner.
+    """
+    lookup = _LABEL_LOOKUP.get(dimension, _DEFAULT_LABEL_LOOKUP)
+    key = (value or "").strip().lower()
+    if key in lookup:
+        return lookup[key]
+    return value
 
 
 def refresh_ga4_token(ga4_token):
@@ -23,18 +63,109 @@ def refresh_ga4_token(ga4_token):
     pass
 
 
-def percent_distribution(raw_list, value_key):
+def percent_distribution(raw_list, *value_keys):
     """
-    Bir listedeki value_key toplamına göre yüzde dağılımı hesaplar.
+    Bir listedeki her value_key için, o anahtarın toplamına göre yüzde dağılımı hesaplar.
     """
-    total = sum(x[value_key] for x in raw_list) or 1
+    totals = {key: sum(x[key] for x in raw_list) or 1 for key in value_keys}
     return [
-        {**row, value_key: round(100 * row[value_key] / total, 1)} for row in raw_list
+        {**row, **{key: round(100 * row[key] / totals[key], 1) for key in value_keys}}
+        for row in raw_list
     ]
 
 
 def top_n(items, key, n=5):
     """
-    Bir listedeki en yüksek n elemanı döner.
+    Bir listedeki en yüksek n elemanı döner (tüm listeyi sıralamadan).
     """
-    return sorted(items, key=lambda x: x[key], reverse=True)[:n]
+    return heapq.nlargest(n, items, key=lambda x: x[key])
+
+
+def merge_distributions(dimension, sources):
+    """
+    Birden çok kaynağın (GA4, YouTube, Instagram) dağılımlarını tek geçişte birleştirir.
+
+    sources: her kaynak için (ham etiket, {alan: değer}) satırları üreten bir iterable.
+    Etiketler normalize_label ile ortak etikete çevrilir, bilinmeyenler atlanır.
+    Aynı kaynakta aynı etikete düşen satırlar toplanır; kaynaklar arasında her alan,
+    o alanı sağlayan kaynakların ortalamasıdır.
+    Dönüş: {etiket: {alan: değer}} (etiketlerin ilk görülme sırasıyla)
+    """
+    merged = {}
+    for rows in sources:
+        source_totals = {}
+        for raw_label, values in rows:
+            label = normalize_label(dimension, raw_label)
+            if label is None:
+                continue
+            totals = source_totals.setdefault(label, {})
+            for field, value in values.items():
+                totals[field] = totals.get(field, 0) + value
+        for label, totals in source_totals.items():
+            fields = merged.setdefault(label, {})
+            for field, value in totals.items():
+                total, count = fields.get(field, (0, 0))
+                fields[field] = (total + value, count + 1)
+    return {
+        label: {
+            field: total / count if count > 1 else total
+            for field, (total, count) in fields.items()
+        }
+        for label, fields in merged.items()
+    }
+
+
+def distribution_rows(merged, label_key, fields):
+    """merge_distributions çıktısını satır listesine çevirir; eksik alanlar 0 olur."""
+    return [
+        {label_key: label, **{field: values.get(field, 0) for field in fields}}
+        for label, values in merged.items()
+    ]
+
+
+def instagram_breakdown(demographics, breakdown):
+    """
+    Demografi yanıtındaki (bkz. queries.latest_instagram_demographics)
+    follower_demographics_<breakdown> sonuçlarını (etiket, değer) çiftleri olarak döner.
+    """
+    data = (demographics or {}).get(f"follower_demographics_{breakdown}") or {}
+    try:
+        results = data["data"][0]["total_value"]["breakdowns"][0]["results"]
+    except (KeyError, IndexError, TypeError):
+        return []
+    return [
+        (item["dimension_values"][0], item.get("value") or 0)
+        for item in results
+        if item.get("dimension_values")
+    ]
+
+
+def instagram_demographics_payload(rows):
+    """
+    InstagramDemographic satırlarını ({breakdown, label, value}) Graph yanıt biçimine
+    (follower_demographics_<breakdown>) geri çevirir; instagram_breakdown'ın tersidir.
+    """
+    results = {}
+    for row in rows:
+        results.setdefault(row["breakdown"], []).append(
+            {"dimension_values": [row["label"]], "value": row["value"]}
+        )
+    return {
+        f"follower_demographics_{breakdown}": {
+            "data": [
+                {
+                    "name": "follower_demographics",
+                    "period": "lifetime",
+                    "total_value": {
+                        "breakdowns": [{"dimension_keys": [breakdown], "results": items}]
+                    },
+                }
+            ]
+        }
+        for breakdown, items in results.items()
+    }
+
+
+def stored_number(value):
+    """FloatField'dan okunan tam sayı değerleri Graph yanıtındaki gibi int döner."""
+    return int(value) if float(value).is_integer() else value
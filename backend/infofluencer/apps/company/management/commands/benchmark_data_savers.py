@@ -0,0 +1,79 @@
+"""
+GA4DataSaver yazma hızını ölçer: eski satır satır INSERT yolu ile toplu upsert yolu.
+Tüm yazımlar geri alınan bir transaction içinde yapılır; veritabanı değişmez.
+
+Kullanım: python manage.py benchmark_data_savers --rows 500 --repeat 3
+"""
+
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from apps.accounts.models import CompanyProfile
+from apps.company.models import GA4CityData
+from apps.company.scripts.data_savers import GA4DataSaver
+
+
+def _legacy_save_city_data(company_id, data):
+    """Toplu yoldan önceki davranış: delete + satır başına create, transaction yok."""
+    company = CompanyProfile.objects.get(id=company_id)
+    GA4CityData.objects.filter(company=company).delete()
+    for item in data:
+        GA4CityData.objects.create(
+            company=company,
+            city=item["city"],
+            active_users=item["active_users"],
+            sessions=item["sessions"],
+            user_engagement_duration=item["user_engagement_duration"],
+            event_count=item["event_count"],
+            conversions=item["conversions"],
+        )
+
+
+class Command(BaseCommand):
+    help = "GA4DataSaver için eski ve toplu yazma yollarının satır/saniye karşılaştırması"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=500)
+        parser.add_argument("--repeat", type=int, default=3)
+
+    def handle(self, *args, **options):
+        rows = options["rows"]
+        repeat = options["repeat"]
+        data = [
+            {
+                "city": f"City {i}",
+                "active_users": i,
+                "sessions": i * 2,
+                "user_engagement_duration": i * 1.5,
+                "event_count": float(i * 3),
+                "conversions": float(i % 7),
+            }
+            for i in range(rows)
+        ]
+
+        with transaction.atomic():
+            user = User.objects.create(username="benchmark-data-savers")
+            company = CompanyProfile.objects.create(
+                user=user,
+                work_email="benchmark@example.com",
+                first_name="Benchmark",
+                last_name="Company",
+            )
+            for label, saver in (
+                ("legacy", _legacy_save_city_data),
+                ("bulk", GA4DataSaver.save_city_data),
+            ):
+                elapsed = []
+                for _ in range(repeat):
+                    started = time.perf_counter()
+                    saver(company.id, data)
+                    elapsed.append(time.perf_counter() - started)
+                best = min(elapsed)
+                self.stdout.write(
+                    f"{label:>6}: {rows} satır, en iyi {best * 1000:.1f} ms, "
+                    f"{rows / best:,.0f} satır/sn"
+                )
+            transaction.set_rollback(True)
@@ -0,0 +1,37 @@
+"""
+Rapor snapshot geçmişini indirger ve saklama süresini uygular.
+Son SNAPSHOT_RAW_DAYS gün ham kalır, SNAPSHOT_WEEKLY_DAYS'e kadar haftada bir,
+sonrasında ayda bir snapshot tutulur; SNAPSHOT_RETENTION_DAYS'ten eskiler silinir.
+Günlük cron ile çalıştırılması önerilir.
+
+Kullanım: python manage.py prune_snapshots --provider instagram --dry-run
+"""
+
+from django.core.management.base import BaseCommand
+
+from apps.company.scripts.snapshot_history import SNAPSHOT_MODELS, compact_snapshots
+
+
+class Command(BaseCommand):
+    help = "GA4/YouTube/Instagram rapor snapshot'larını haftalık/aylık indirger ve eskilerini siler"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--provider",
+            action="append",
+            choices=list(SNAPSHOT_MODELS),
+            help="Yalnızca bu sağlayıcı(lar)ın snapshot'ları (tekrarlanabilir)",
+        )
+        parser.add_argument(
+            "--dry-run", action="store_true", help="Değişiklik yapmadan sayıları göster"
+        )
+
+    def handle(self, *args, **options):
+        for provider in options["provider"] or SNAPSHOT_MODELS:
+            stats = compact_snapshots(SNAPSHOT_MODELS[provider], dry_run=options["dry_run"])
+            self.stdout.write(
+                f"{provider}: {stats['week']} haftalık, {stats['month']} aylık, "
+                f"{stats['deleted']} silinen snapshot"
+            )
+        if options["dry_run"]:
+            self.stdout.write("(dry-run: değişiklik yapılmadı)")
@@ -0,0 +1,97 @@
+"""
+Bağlı GA4/YouTube/Instagram hesaplarının verisini arka planda yeniler.
+Token tabloları last_data_fetch'e göre taranır; eskimiş şirketler sağlayıcı başına
+sınırlı eşzamanlılıkla yenilenir. Cron ile tek sefer ya da --interval ile sürekli
+çalıştırılabilir. Yenilemeler RefreshJob olarak kaydedilir; run_refresh_jobs worker'ında
+ya da kullanıcı isteğiyle aktif işi olan şirketler atlanır.
+
+Kullanım: python manage.py refresh_stale_accounts --max-age-minutes 60 --interval 300
+"""
+
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from apps.company.scripts import graph_rate
+from apps.company.scripts.graph_client import get_graph_rate_metrics
+from apps.company.scripts.refresh_scheduler import (
+    PROVIDERS,
+    collect_stale_tasks,
+    provider_limits,
+    run_refreshes,
+)
+
+
+class Command(BaseCommand):
+    help = "Eskimiş GA4/YouTube/Instagram verilerini sağlayıcı başına sınırlı iş havuzuyla yeniler"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--provider",
+            action="append",
+            choices=PROVIDERS,
+            help="Yalnızca bu sağlayıcı(lar)ı yenile (tekrarlanabilir)",
+        )
+        parser.add_argument(
+            "--max-age-minutes",
+            type=int,
+            default=None,
+            help="Bu süreden eski veriler yenilenir (varsayılan: REFRESH_STALE_AFTER_MINUTES)",
+        )
+        parser.add_argument(
+            "--limit", type=int, default=None, help="Sağlayıcı başına tur başına en fazla şirket"
+        )
+        parser.add_argument(
+            "--interval",
+            type=int,
+            default=0,
+            help="Saniye; verilirse komut turları bu aralıkla sürekli tekrarlar",
+        )
+        parser.add_argument(
+            "--dry-run", action="store_true", help="Yalnızca kuyruğa alınacak şirketleri listele"
+        )
+
+    def handle(self, *args, **options):
+        # Arka plan süreci: Graph kotası için uzun beklemeler serbest
+        graph_rate.use_worker_waits()
+        providers = options["provider"] or PROVIDERS
+        max_age = (
+            timedelta(minutes=options["max_age_minutes"])
+            if options["max_age_minutes"] is not None
+            else None
+        )
+        while True:
+            self._run_once(providers, max_age, options["limit"], options["dry_run"])
+            if not options["interval"]:
+                break
+            time.sleep(options["interval"])
+
+    def _run_once(self, providers, max_age, limit, dry_run):
+        tasks = collect_stale_tasks(providers, max_age, limit)
+        if dry_run or not tasks:
+            for provider, company_id in tasks:
+                self.stdout.write(f"{provider}: company={company_id}")
+            self.stdout.write(f"{len(tasks)} yenileme kuyrukta")
+            return
+
+        started = time.perf_counter()
+        results = run_refreshes(tasks, provider_limits())
+        failed = 0
+        for provider, company_id, error in results:
+            if error:
+                failed += 1
+                self.stderr.write(f"❌ {provider} company={company_id}: {error}")
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"✅ {len(results) - failed}/{len(results)} yenileme tamamlandı "
+                f"({time.perf_counter() - started:.1f} sn)"
+            )
+        )
+        if "instagram" in providers:
+            rate = get_graph_rate_metrics()
+            self.stdout.write(
+                f"Graph kota: uygulama %{rate['app']['usage_percent'] or 0:.0f}, "
+                f"{rate['throttled_calls']}/{rate['calls']} çağrı bekletildi "
+                f"({rate['throttled_seconds']:.1f} sn)"
+            )
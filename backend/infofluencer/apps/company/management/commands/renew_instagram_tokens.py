@@ -0,0 +1,61 @@
+"""
+Süresi yaklaşan Instagram token'larını toplu yeniler.
+Token'lar kullanıcı isteklerinde yenilenmediği için bu komut düzenli (ör. günlük)
+çalıştırılmalıdır.
+
+Kullanım: python manage.py renew_instagram_tokens --within-days 7 --workers 4
+"""
+
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from apps.company.scripts import graph_rate
+from apps.company.scripts.instagram_tokens import expiring_tokens, renew_tokens
+
+
+class Command(BaseCommand):
+    help = "Süresi yaklaşan Instagram token'larını sınırlı eşzamanlılıkla yeniler"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--within-days",
+            type=int,
+            default=None,
+            help="Bu kadar gün içinde süresi dolacak token'lar (varsayılan: INSTAGRAM_TOKEN_RENEW_WITHIN_DAYS)",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=None,
+            help="Aynı anda yenilenecek token sayısı (varsayılan: INSTAGRAM_TOKEN_RENEW_CONCURRENCY)",
+        )
+        parser.add_argument("--limit", type=int, default=None, help="Tur başına en fazla token")
+        parser.add_argument(
+            "--dry-run", action="store_true", help="Yalnızca yenilenecek token'ları listele"
+        )
+
+    def handle(self, *args, **options):
+        # Arka plan süreci: Graph kotası için uzun beklemeler serbest
+        graph_rate.use_worker_waits()
+        within = (
+            timedelta(days=options["within_days"]) if options["within_days"] is not None else None
+        )
+        tokens = expiring_tokens(within, options["limit"])
+        if options["dry_run"] or not tokens:
+            for token in tokens:
+                self.stdout.write(f"instagram: company={token.company_id} expiry={token.token_expiry}")
+            self.stdout.write(f"{len(tokens)} token yenilenecek")
+            return
+
+        started = time.perf_counter()
+        renewed, errors = renew_tokens(tokens, options["workers"])
+        for company_id, error in errors:
+            self.stderr.write(f"❌ instagram company={company_id}: {error}")
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"✅ {renewed}/{len(tokens)} token yenilendi "
+                f"({time.perf_counter() - started:.1f} sn)"
+            )
+        )
@@ -0,0 +1,62 @@
+"""
+RefreshJob kuyruğundaki veri yenileme işlerini çalıştıran yerel worker.
+--once ile kuyruk boşalınca çıkar; aksi halde yeni işler için kuyruğu yoklamaya devam eder.
+
+Kullanım: python manage.py run_refresh_jobs --workers 4 --poll-interval 5
+"""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from apps.company.scripts import graph_rate
+from apps.company.scripts.refresh_jobs import fail_stale_jobs, work
+
+
+def _work_in_thread(stop_event, poll_interval):
+    try:
+        return work(stop_event, poll_interval)
+    finally:
+        # İş parçacığına ait veritabanı bağlantısını bırak
+        connections.close_all()
+
+
+class Command(BaseCommand):
+    help = "Kuyruktaki RefreshJob işlerini çalıştırır"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=2)
+        parser.add_argument("--poll-interval", type=float, default=5.0)
+        parser.add_argument(
+            "--once", action="store_true", help="Kuyruk boşalınca çık"
+        )
+
+    def handle(self, *args, **options):
+        # Arka plan süreci: Graph kotası için uzun beklemeler serbest
+        graph_rate.use_worker_waits()
+        stale = fail_stale_jobs()
+        if stale:
+            self.stderr.write(f"{stale} zaman aşımına uğramış iş başarısız sayıldı")
+
+        stop_event = None if options["once"] else threading.Event()
+        workers = max(options["workers"], 1)
+        self.stdout.write(f"🚀 {workers} worker başlatıldı")
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="refresh-job") as executor:
+            futures = [
+                executor.submit(_work_in_thread, stop_event, options["poll_interval"])
+                for _ in range(workers)
+            ]
+            try:
+                totals = [future.result() for future in futures]
+            except KeyboardInterrupt:
+                if stop_event is not None:
+                    stop_event.set()
+                totals = [future.result() for future in futures]
+
+        succeeded = sum(ok for ok, _ in totals)
+        failed = sum(err for _, err in totals)
+        self.stdout.write(
+            self.style.SUCCESS(f"✅ {succeeded} iş tamamlandı, {failed} iş başarısız")
+        )
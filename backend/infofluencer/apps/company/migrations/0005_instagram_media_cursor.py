@@ -0,0 +1,48 @@
+# Generated by Django 4.2.7 on 2026-10-18 11:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('company', '0004_refreshjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InstagramMediaCursor',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ig_account_id', models.CharField(max_length=100, unique=True)),
+                ('last_media_timestamp', models.DateTimeField(blank=True, null=True)),
+                ('last_media_id', models.CharField(blank=True, max_length=100)),
+                ('backfill_after', models.TextField(blank=True)),
+                ('backfill_complete', models.BooleanField(default=False)),
+                ('last_run_at', models.DateTimeField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='InstagramMedia',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ig_account_id', models.CharField(max_length=100)),
+                ('media_id', models.CharField(max_length=100, unique=True)),
+                ('media_type', models.CharField(blank=True, max_length=30)),
+                ('timestamp', models.DateTimeField(blank=True, null=True)),
+                ('like_count', models.IntegerField(default=0)),
+                ('comments_count', models.IntegerField(default=0)),
+                ('data', models.JSONField(default=dict)),
+                ('insights', models.JSONField(default=dict)),
+                ('comments_analysis', models.JSONField(blank=True, null=True)),
+                ('insights_fetched_at', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['-timestamp'],
+                'indexes': [models.Index(fields=['ig_account_id', '-timestamp'], name='company_ins_ig_acco_b3b3ff_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,87 @@
+# Generated by Django 4.2.7 on 2026-10-18 11:45
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def _insight_value(response):
+    entry = ((response or {}).get("data") or [{}])[0]
+    if "total_value" in entry:
+        value = (entry.get("total_value") or {}).get("value")
+    elif "values" in entry:
+        value = (entry.get("values") or [{}])[0].get("value")
+    else:
+        value = entry.get("value")
+    return value if isinstance(value, (int, float)) and not isinstance(value, bool) else None
+
+
+def copy_media_insights(apps, schema_editor):
+    """Medya insights JSON'unu metrik satırlarına taşır."""
+    InstagramMedia = apps.get_model("company", "InstagramMedia")
+    InstagramMediaMetric = apps.get_model("company", "InstagramMediaMetric")
+    rows = []
+    for media_pk, insights in InstagramMedia.objects.values_list("id", "insights").iterator():
+        for metric, response in (insights or {}).items():
+            value = _insight_value(response)
+            if value is not None:
+                rows.append(InstagramMediaMetric(media_id=media_pk, metric=metric, value=value))
+    InstagramMediaMetric.objects.bulk_create(rows, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('company', '0005_instagram_media_cursor'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InstagramDemographic',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ig_account_id', models.CharField(max_length=100)),
+                ('breakdown', models.CharField(max_length=20)),
+                ('label', models.CharField(max_length=255)),
+                ('value', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['ig_account_id', 'breakdown', '-value'], name='company_ins_ig_acco_4b5bf1_idx')],
+                'unique_together': {('ig_account_id', 'breakdown', 'label')},
+            },
+        ),
+        migrations.CreateModel(
+            name='InstagramAccountDailyMetric',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ig_account_id', models.CharField(max_length=100)),
+                ('metric', models.CharField(max_length=50)),
+                ('period', models.CharField(choices=[('day', 'Günlük'), ('total', 'Dönem toplamı')], max_length=10)),
+                ('date', models.DateField()),
+                ('value', models.FloatField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['ig_account_id', 'metric', '-date'], name='company_ins_ig_acco_6c78f9_idx')],
+                'unique_together': {('ig_account_id', 'metric', 'period', 'date')},
+            },
+        ),
+        migrations.CreateModel(
+            name='InstagramMediaMetric',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('metric', models.CharField(max_length=50)),
+                ('value', models.FloatField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('media', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='metrics', to='company.instagrammedia')),
+            ],
+            options={
+                'unique_together': {('media', 'metric')},
+            },
+        ),
+        migrations.RunPython(copy_media_insights, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='instagrammedia',
+            name='insights',
+        ),
+    ]
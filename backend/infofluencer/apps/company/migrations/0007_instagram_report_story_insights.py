@@ -0,0 +1,22 @@
+# Generated by Django 4.2.7 on 2026-10-18 11:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('company', '0006_instagram_normalized'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='instagramreport',
+            name='story_insights',
+            field=models.JSONField(default=list),
+        ),
+        migrations.AddIndex(
+            model_name='instagramreport',
+            index=models.Index(fields=['company', '-fetched_at'], name='company_ins_company_1bbadb_idx'),
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 4.2.7 on 2026-10-18 11:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('company', '0007_instagram_report_story_insights'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ga4report',
+            name='granularity',
+            field=models.CharField(choices=[('raw', 'Ham'), ('week', 'Haftalık'), ('month', 'Aylık')], default='raw', max_length=10),
+        ),
+        migrations.AddField(
+            model_name='instagramreport',
+            name='granularity',
+            field=models.CharField(choices=[('raw', 'Ham'), ('week', 'Haftalık'), ('month', 'Aylık')], default='raw', max_length=10),
+        ),
+        migrations.AddField(
+            model_name='youtubereport',
+            name='granularity',
+            field=models.CharField(choices=[('raw', 'Ham'), ('week', 'Haftalık'), ('month', 'Aylık')], default='raw', max_length=10),
+        ),
+        migrations.AddIndex(
+            model_name='ga4report',
+            index=models.Index(fields=['company', '-fetched_at'], name='company_ga4_company_62fb9a_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ga4report',
+            index=models.Index(fields=['granularity', 'fetched_at'], name='company_ga4_granula_715454_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='instagramreport',
+            index=models.Index(fields=['granularity', 'fetched_at'], name='company_ins_granula_a6d5e6_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='youtubereport',
+            index=models.Index(fields=['company', '-fetched_at'], name='company_you_company_eed2f5_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='youtubereport',
+            index=models.Index(fields=['granularity', 'fetched_at'], name='company_you_granula_d4ce09_idx'),
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 4.2.7 on 2026-10-18 11:51
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0002_initial'),
+        ('company', '0008_report_snapshot_history'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GA4MetricRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('report_type', models.CharField(max_length=50)),
+                ('metric', models.CharField(max_length=50)),
+                ('window', models.CharField(choices=[('7d', 'Son 7 gün'), ('28d', 'Son 28 gün'), ('90d', 'Son 90 gün'), ('month', 'Takvim ayı')], max_length=10)),
+                ('date', models.DateField()),
+                ('value', models.FloatField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('company', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ga4_metric_rollups', to='accounts.companyprofile')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['company', 'report_type', 'window', 'metric', '-date'], name='company_ga4_company_7c907a_idx')],
+                'unique_together': {('company', 'report_type', 'metric', 'window', 'date')},
+            },
+        ),
+        migrations.CreateModel(
+            name='GA4DailyMetric',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('report_type', models.CharField(max_length=50)),
+                ('dimension_value', models.CharField(max_length=255)),
+                ('date', models.DateField()),
+                ('metric', models.CharField(max_length=50)),
+                ('value', models.FloatField(default=0)),
+                ('company', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ga4_daily_metrics', to='accounts.companyprofile')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['company', 'report_type', 'metric', 'date'], name='company_ga4_company_4a1dbc_idx')],
+                'unique_together': {('company', 'report_type', 'dimension_value', 'date', 'metric')},
+            },
+        ),
+    ]
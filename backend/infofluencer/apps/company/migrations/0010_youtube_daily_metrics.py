@@ -0,0 +1,44 @@
+# Generated by Django 4.2.7 on 2026-10-18 11:53
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0002_initial'),
+        ('company', '0009_ga4_daily_rollups'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='YouTubeIngestState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('report_type', models.CharField(max_length=50)),
+                ('last_window_end', models.DateField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('company', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='youtube_ingest_states', to='accounts.companyprofile')),
+            ],
+            options={
+                'unique_together': {('company', 'report_type')},
+            },
+        ),
+        migrations.CreateModel(
+            name='YouTubeDailyMetric',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('report_type', models.CharField(max_length=50)),
+                ('dimension_value', models.CharField(max_length=255)),
+                ('date', models.DateField()),
+                ('metric', models.CharField(max_length=50)),
+                ('value', models.FloatField(default=0)),
+                ('company', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='youtube_daily_metrics', to='accounts.companyprofile')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['company', 'report_type', 'date'], name='company_you_company_e61862_idx')],
+                'unique_together': {('company', 'report_type', 'dimension_value', 'date', 'metric')},
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-18 11:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('company', '0010_youtube_daily_metrics'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='instagramtoken',
+            name='token_expiry',
+            field=models.DateTimeField(blank=True, db_index=True, null=True),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 4.2.7 on 2026-10-18 12:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('company', '0011_instagram_token_expiry_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InstagramMetricCapability',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ig_account_id', models.CharField(max_length=100)),
+                ('scope', models.CharField(max_length=20)),
+                ('metric', models.CharField(max_length=64)),
+                ('supported', models.BooleanField()),
+                ('error_message', models.CharField(blank=True, default='', max_length=255)),
+                ('checked_at', models.DateTimeField()),
+            ],
+            options={
+                'unique_together': {('ig_account_id', 'scope', 'metric')},
+            },
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.7 on 2026-10-18 12:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('company', '0012_instagram_metric_capability'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InstagramComment',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('comment_id', models.CharField(max_length=100, unique=True)),
+                ('media_id', models.CharField(max_length=100)),
+                ('username', models.CharField(blank=True, max_length=100)),
+                ('text', models.TextField(blank=True)),
+                ('like_count', models.IntegerField(default=0)),
+                ('timestamp', models.DateTimeField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['media_id', '-like_count'], name='company_ins_media_i_6d4a20_idx'), models.Index(fields=['media_id', '-timestamp'], name='company_ins_media_i_2470c7_idx')],
+            },
+        ),
+    ]
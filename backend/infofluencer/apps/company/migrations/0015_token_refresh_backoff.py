@@ -0,0 +1,43 @@
+# Generated by Django 4.2.7 on 2026-10-18 12:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('company', '0014_company_data_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ga4token',
+            name='next_refresh_after',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='ga4token',
+            name='refresh_failures',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='instagramtoken',
+            name='next_refresh_after',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='instagramtoken',
+            name='refresh_failures',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='youtubetoken',
+            name='next_refresh_after',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='youtubetoken',
+            name='refresh_failures',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 4.2.7 on 2026-10-18 12:32
+
+from django.db import migrations
+
+
+def drop_active_users_rollups(apps, schema_editor):
+    """Günlerin toplamıyla şişirilmiş active_users pencerelerini siler."""
+    GA4MetricRollup = apps.get_model("company", "GA4MetricRollup")
+    GA4MetricRollup.objects.filter(metric="active_users").delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('company', '0015_token_refresh_backoff'),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_active_users_rollups, migrations.RunPython.noop),
+    ]
@@ -19,6 +19,9 @@ class GA4Token(models.Model):
 
     # ✅ Bu satırı ekleyin (eğer yoksa)
     last_data_fetch = models.DateTimeField(null=True, blank=True)
+    # Zamanlayıcı: art arda başarısız yenileme sayısı ve bir sonraki denemenin en erken zamanı
+    refresh_failures = models.PositiveIntegerField(default=0)
+    next_refresh_after = models.DateTimeField(null=True, blank=True)
 
     def __str__(self):
         return f"GA4 Token for {self.company}"
@@ -34,6 +37,9 @@ class YouTubeToken(models.Model):
 
     # ✅ Bu satırı da ekleyin (eğer yoksa)
     last_data_fetch = models.DateTimeField(null=True, blank=True)
+    # Zamanlayıcı: art arda başarısız yenileme sayısı ve bir sonraki denemenin en erken zamanı
+    refresh_failures = models.PositiveIntegerField(default=0)
+    next_refresh_after = models.DateTimeField(null=True, blank=True)
 
     def __str__(self):
         return f"YouTube Token for {self.company}"
@@ -56,12 +62,16 @@ class InstagramToken(models.Model):
     """Instagram Graph API token modeli"""
     company = models.ForeignKey(CompanyProfile, on_delete=models.CASCADE)
     access_token = models.TextField()
-    token_expiry = models.DateTimeField(null=True, blank=True)
+    # renew_instagram_tokens süresi yaklaşan token'ları bu indeksle seçer
+    token_expiry = models.DateTimeField(null=True, blank=True, db_index=True)
     instagram_business_account_id = models.CharField(max_length=100, null=True, blank=True)
     facebook_page_id = models.CharField(max_length=100, null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     last_data_fetch = models.DateTimeField(null=True, blank=True)
+    # Zamanlayıcı: art arda başarısız yenileme sayısı ve bir sonraki denemenin en erken zamanı
+    refresh_failures = models.PositiveIntegerField(default=0)
+    next_refresh_after = models.DateTimeField(null=True, blank=True)
 
     def __str__(self):
         return f"Instagram Token for {self.company}"
@@ -228,6 +238,51 @@ class GA4AgeData(models.Model):
         unique_together = ["company", "age"]
 
 
+class GA4DailyMetric(models.Model):
+    """GA4 günlük fact tablosu: rapor tipi, boyut değeri ve gün başına bir metrik değeri"""
+
+    company = models.ForeignKey(
+        CompanyProfile, on_delete=models.CASCADE, related_name="ga4_daily_metrics"
+    )
+    report_type = models.CharField(max_length=50)
+    dimension_value = models.CharField(max_length=255)
+    date = models.DateField()
+    metric = models.CharField(max_length=50)
+    value = models.FloatField(default=0)
+
+    class Meta:
+        unique_together = ["company", "report_type", "dimension_value", "date", "metric"]
+        indexes = [models.Index(fields=["company", "report_type", "metric", "date"])]
+
+
+class GA4MetricRollup(models.Model):
+    """
+    GA4 günlük fact'lerinin toplamları. Kayan pencerelerde date pencerenin son
+    günü, aylıkta ayın ilk günüdür.
+    """
+
+    WINDOW_CHOICES = [
+        ("7d", "Son 7 gün"),
+        ("28d", "Son 28 gün"),
+        ("90d", "Son 90 gün"),
+        ("month", "Takvim ayı"),
+    ]
+
+    company = models.ForeignKey(
+        CompanyProfile, on_delete=models.CASCADE, related_name="ga4_metric_rollups"
+    )
+    report_type = models.CharField(max_length=50)
+    metric = models.CharField(max_length=50)
+    window = models.CharField(max_length=10, choices=WINDOW_CHOICES)
+    date = models.DateField()
+    value = models.FloatField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ["company", "report_type", "metric", "window", "date"]
+        indexes = [models.Index(fields=["company", "report_type", "window", "metric", "-date"])]
+
+
 # ===== YOUTUBE REPORT MODELS =====
 
 
@@ -281,6 +336,37 @@ class YouTubeAgeGroupData(models.Model):
         unique_together = ["company", "age_group", "gender"]
 
 
+class YouTubeDailyMetric(models.Model):
+    """YouTube günlük fact tablosu: rapor tipi, boyut değeri ve gün başına bir metrik değeri"""
+
+    company = models.ForeignKey(
+        CompanyProfile, on_delete=models.CASCADE, related_name="youtube_daily_metrics"
+    )
+    report_type = models.CharField(max_length=50)
+    dimension_value = models.CharField(max_length=255)
+    date = models.DateField()
+    metric = models.CharField(max_length=50)
+    value = models.FloatField(default=0)
+
+    class Meta:
+        unique_together = ["company", "report_type", "dimension_value", "date", "metric"]
+        indexes = [models.Index(fields=["company", "report_type", "date"])]
+
+
+class YouTubeIngestState(models.Model):
+    """Rapor tipi başına son başarıyla çekilen günlük pencerenin bitiş günü"""
+
+    company = models.ForeignKey(
+        CompanyProfile, on_delete=models.CASCADE, related_name="youtube_ingest_states"
+    )
+    report_type = models.CharField(max_length=50)
+    last_window_end = models.DateField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ["company", "report_type"]
+
+
 class YouTubeTopSubscribersData(models.Model):
     """YouTube Top Subscribers Report Data"""
 
@@ -347,27 +433,244 @@ class BillingInfo(models.Model):
     auto_renew = models.BooleanField()
     # ... diğer alanlar ...
 
+# Snapshot çözünürlüğü: yeni snapshot'lar 'raw' yazılır, prune_snapshots eski
+# olanları haftalık/aylık tek snapshot'a indirger
+SNAPSHOT_GRANULARITY_CHOICES = [
+    ("raw", "Ham"),
+    ("week", "Haftalık"),
+    ("month", "Aylık"),
+]
+
+
 class GA4Report(models.Model):
     company = models.ForeignKey(CompanyProfile, on_delete=models.CASCADE)
     fetched_at = models.DateTimeField(auto_now_add=True)
+    granularity = models.CharField(max_length=10, choices=SNAPSHOT_GRANULARITY_CHOICES, default="raw")
     report_data = models.JSONField()  # Tüm metrikler ve dimensionlar burada saklanacak
     class Meta:
         ordering = ['-fetched_at']
+        indexes = [
+            models.Index(fields=['company', '-fetched_at']),
+            models.Index(fields=['granularity', 'fetched_at']),
+        ]
 
 class YouTubeReport(models.Model):
     company = models.ForeignKey(CompanyProfile, on_delete=models.CASCADE)
     fetched_at = models.DateTimeField(auto_now_add=True)
+    granularity = models.CharField(max_length=10, choices=SNAPSHOT_GRANULARITY_CHOICES, default="raw")
     report_data = models.JSONField()  # Tüm metrikler ve dimensionlar burada saklanacak
     class Meta:
         ordering = ['-fetched_at']
+        indexes = [
+            models.Index(fields=['company', '-fetched_at']),
+            models.Index(fields=['granularity', 'fetched_at']),
+        ]
 
 class InstagramReport(models.Model):
     company = models.ForeignKey(CompanyProfile, on_delete=models.CASCADE)
     fetched_at = models.DateTimeField(auto_now_add=True)
+    granularity = models.CharField(max_length=10, choices=SNAPSHOT_GRANULARITY_CHOICES, default="raw")
     basic_info = models.JSONField()
     media_data = models.JSONField()
     demographics = models.JSONField()
     user_insights = models.JSONField()
     calculated_metrics = models.JSONField()
+    story_insights = models.JSONField(default=list)
     class Meta:
         ordering = ['-fetched_at']
+        indexes = [
+            models.Index(fields=['company', '-fetched_at']),
+            models.Index(fields=['granularity', 'fetched_at']),
+        ]
+
+class RefreshJob(models.Model):
+    """Arka planda çalışan veri yenileme işi (run_refresh_jobs worker'ı çalıştırır)"""
+
+    PROVIDER_CHOICES = [("ga4", "GA4"), ("youtube", "YouTube"), ("instagram", "Instagram")]
+    STATUS_PENDING = "pending"
+    STATUS_RUNNING = "running"
+    STATUS_SUCCEEDED = "succeeded"
+    STATUS_FAILED = "failed"
+    STATUS_CHOICES = [
+        (STATUS_PENDING, "Pending"),
+        (STATUS_RUNNING, "Running"),
+        (STATUS_SUCCEEDED, "Succeeded"),
+        (STATUS_FAILED, "Failed"),
+    ]
+    ACTIVE_STATUSES = (STATUS_PENDING, STATUS_RUNNING)
+
+    company = models.ForeignKey(CompanyProfile, on_delete=models.CASCADE)
+    provider = models.CharField(max_length=20, choices=PROVIDER_CHOICES)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    progress = models.JSONField(default=dict)  # {bölüm: pending | done | empty | failed}
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["created_at"]
+        indexes = [models.Index(fields=["status", "created_at"])]
+        constraints = [
+            # Şirket/sağlayıcı başına aynı anda tek aktif iş; tekrar eden istekler bu işe bağlanır
+            models.UniqueConstraint(
+                fields=["company", "provider"],
+                condition=models.Q(status__in=["pending", "running"]),
+                name="unique_active_refresh_job",
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.provider} refresh for {self.company} ({self.status})"
+
+
+class CompanyDataVersion(models.Model):
+    """Şirketin dashboard önbellek sürümü; tüm süreçler (web worker'ları, zamanlayıcı, job worker) aynı satırı okur"""
+
+    company = models.OneToOneField(
+        CompanyProfile, on_delete=models.CASCADE, primary_key=True, related_name="data_version"
+    )
+    version = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.company_id} data version {self.version}"
+
+
+class InstagramMediaCursor(models.Model):
+    """Instagram medya aktarımının hesap başına kontrol noktası (high-water mark ve backfill imleci)"""
+
+    ig_account_id = models.CharField(max_length=100, unique=True)
+    last_media_timestamp = models.DateTimeField(null=True, blank=True)
+    last_media_id = models.CharField(max_length=100, blank=True)
+    backfill_after = models.TextField(blank=True)  # Graph paging.cursors.after
+    backfill_complete = models.BooleanField(default=False)
+    last_run_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Instagram media cursor for {self.ig_account_id}"
+
+
+class InstagramMedia(models.Model):
+    """Aktarılmış Instagram medyası; yeni ve yakın tarihli medyalar her yenilemede güncellenir"""
+
+    ig_account_id = models.CharField(max_length=100)
+    media_id = models.CharField(max_length=100, unique=True)
+    media_type = models.CharField(max_length=30, blank=True)
+    timestamp = models.DateTimeField(null=True, blank=True)
+    like_count = models.IntegerField(default=0)
+    comments_count = models.IntegerField(default=0)
+    data = models.JSONField(default=dict)  # Graph'tan gelen ham medya alanları
+    comments_analysis = models.JSONField(null=True, blank=True)
+    insights_fetched_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ["-timestamp"]
+        indexes = [models.Index(fields=["ig_account_id", "-timestamp"])]
+
+    def __str__(self):
+        return f"Instagram media {self.media_id}"
+
+
+class InstagramMediaMetric(models.Model):
+    """Medya başına tek bir insights metriği (reach, saved, views, ...)"""
+
+    media = models.ForeignKey(InstagramMedia, on_delete=models.CASCADE, related_name="metrics")
+    metric = models.CharField(max_length=50)
+    value = models.FloatField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ("media", "metric")
+
+    def __str__(self):
+        return f"{self.media_id} - {self.metric}: {self.value}"
+
+
+class InstagramComment(models.Model):
+    """Medya yorumu; yorum sayfaları medya satırından önce yazılabildiği için media_id ile bağlanır"""
+
+    comment_id = models.CharField(max_length=100, unique=True)
+    media_id = models.CharField(max_length=100)
+    username = models.CharField(max_length=100, blank=True)
+    text = models.TextField(blank=True)
+    like_count = models.IntegerField(default=0)
+    timestamp = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["media_id", "-like_count"]),
+            models.Index(fields=["media_id", "-timestamp"]),
+        ]
+
+    def __str__(self):
+        return f"Instagram comment {self.comment_id}"
+
+
+class InstagramAccountDailyMetric(models.Model):
+    """
+    Hesap düzeyi insights. period='day' satırları Graph'ın günlük değerleridir;
+    period='total' satırları çekildiği güne yazılan son 28 günlük toplamdır.
+    """
+
+    PERIOD_DAY = "day"
+    PERIOD_TOTAL = "total"
+    PERIOD_CHOICES = [
+        (PERIOD_DAY, "Günlük"),
+        (PERIOD_TOTAL, "Dönem toplamı"),
+    ]
+
+    ig_account_id = models.CharField(max_length=100)
+    metric = models.CharField(max_length=50)
+    period = models.CharField(max_length=10, choices=PERIOD_CHOICES)
+    date = models.DateField()
+    value = models.FloatField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ("ig_account_id", "metric", "period", "date")
+        indexes = [models.Index(fields=["ig_account_id", "metric", "-date"])]
+
+    def __str__(self):
+        return f"{self.ig_account_id} - {self.metric} ({self.period}) {self.date}"
+
+
+class InstagramDemographic(models.Model):
+    """Takipçi demografisinin (yaş, şehir, ülke, cinsiyet) kırılım başına satırları"""
+
+    ig_account_id = models.CharField(max_length=100)
+    breakdown = models.CharField(max_length=20)
+    label = models.CharField(max_length=255)
+    value = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ("ig_account_id", "breakdown", "label")
+        indexes = [models.Index(fields=["ig_account_id", "breakdown", "-value"])]
+
+    def __str__(self):
+        return f"{self.ig_account_id} - {self.breakdown}: {self.label}"
+
+
+class InstagramMetricCapability(models.Model):
+    """Bir hesabın (ya da medya tipinin) insights metriğini API'nin kabul edip etmediği"""
+
+    SCOPE_USER = "USER"
+
+    ig_account_id = models.CharField(max_length=100)
+    # USER (hesap insights) ya da medya tipi (IMAGE, VIDEO, CAROUSEL_ALBUM, STORY)
+    scope = models.CharField(max_length=20)
+    metric = models.CharField(max_length=64)
+    supported = models.BooleanField()
+    error_message = models.CharField(max_length=255, blank=True, default="")
+    checked_at = models.DateTimeField()
+
+    class Meta:
+        unique_together = ("ig_account_id", "scope", "metric")
+
+    def __str__(self):
+        return f"{self.ig_account_id} - {self.scope}/{self.metric}: {self.supported}"
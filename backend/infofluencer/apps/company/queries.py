@@ -0,0 +1,193 @@
+"""
+Dashboard endpointlerinin kullandığı veritabanı sorguları.
+Toplamlar veritabanında aggregate() ile hesaplanır, listeler values() ile yalnızca
+gereken kolonları döner; her fonksiyon tek bir SQL sorgusu çalıştırır.
+"""
+
+from django.db.models import Avg, Count, Sum
+from django.utils import timezone
+
+from .helpers import instagram_demographics_payload
+from .models import (
+    GA4AgeData,
+    GA4UserGenderData,
+    GA4CountryData,
+    GA4UserAcquisitionSourceData,
+    GA4SessionSourceMediumData,
+    GA4DeviceCategoryData,
+    GA4OperatingSystemData,
+    GA4CityData,
+    YouTubeAgeGroupData,
+    InstagramReport,
+    InstagramToken,
+    InstagramAccountDailyMetric,
+    InstagramComment,
+    InstagramDemographic,
+    InstagramMedia,
+    GA4MetricRollup,
+)
+
+
+def acquisition_totals(company):
+    """Kullanıcı edinme tablosunun toplam/ortalama değerleri (satır yoksa row_count=0)."""
+    return GA4UserAcquisitionSourceData.objects.filter(company=company).aggregate(
+        total_sessions=Sum("sessions"),
+        total_users=Sum("new_users"),
+        avg_engagement=Avg("engagement_rate"),
+        row_count=Count("id"),
+    )
+
+
+def acquisition_channels(company):
+    return (
+        GA4UserAcquisitionSourceData.objects.filter(company=company)
+        .order_by("-new_users")
+        .values(
+            "acquisition_source",
+            "new_users",
+            "sessions",
+            "engagement_rate",
+            "conversions",
+            "user_engagement_duration",
+        )
+    )
+
+
+def session_sources(company):
+    return (
+        GA4SessionSourceMediumData.objects.filter(company=company)
+        .order_by("-sessions")
+        .values(
+            "session_source_medium",
+            "sessions",
+            "conversions",
+            "engagement_rate",
+            "bounce_rate",
+        )
+    )
+
+
+def device_categories(company):
+    return GA4DeviceCategoryData.objects.filter(company=company).values(
+        "device_category", "active_users", "engaged_sessions", "bounce_rate"
+    )
+
+
+def top_operating_systems(company, limit=10):
+    return (
+        GA4OperatingSystemData.objects.filter(company=company)
+        .order_by("-active_users")
+        .values("operating_system", "active_users", "engaged_sessions", "engagement_rate")[
+            :limit
+        ]
+    )
+
+
+def age_rows(company):
+    return (
+        GA4AgeData.objects.filter(company=company)
+        .order_by("-active_users")
+        .values("age", "active_users", "sessions", "user_engagement_duration")
+    )
+
+
+def gender_rows(company):
+    return GA4UserGenderData.objects.filter(company=company).values(
+        "gender", "sessions", "engagement_rate"
+    )
+
+
+def country_rows(company):
+    return (
+        GA4CountryData.objects.filter(company=company)
+        .order_by("-active_users")
+        .values("country", "active_users", "sessions", "bounce_rate")
+    )
+
+
+def city_rows(company):
+    return (
+        GA4CityData.objects.filter(company=company)
+        .order_by("-active_users")
+        .values("city", "active_users", "sessions")
+    )
+
+
+def ga4_recent_rollups(company, report_type, window, metrics, days):
+    """
+    Metriklerin son days günlük rollup değerleri; en yeni gün önce. Tamamlanmamış
+    bugünün (eski aktarımlardan kalmış olabilir) pencereleri dahil edilmez.
+    """
+    return (
+        GA4MetricRollup.objects.filter(
+            company=company,
+            report_type=report_type,
+            window=window,
+            metric__in=metrics,
+            date__lt=timezone.localdate(),
+        )
+        .order_by("-date")
+        .values("metric", "date", "value")[: len(metrics) * days]
+    )
+
+
+def youtube_age_gender_rows(company):
+    return YouTubeAgeGroupData.objects.filter(company=company).values(
+        "age_group", "gender", "viewer_percentage"
+    )
+
+
+def instagram_demographic_rows(company):
+    """Şirkete bağlı Instagram hesabının demografi satırları; kırılım içinde büyükten küçüğe."""
+    ig_ids = InstagramToken.objects.filter(company=company).values("instagram_business_account_id")
+    return (
+        InstagramDemographic.objects.filter(ig_account_id__in=ig_ids)
+        .order_by("breakdown", "-value", "label")
+        .values("breakdown", "label", "value")
+    )
+
+
+def latest_instagram_demographics(company):
+    """
+    Instagram demografisi (veri yoksa None). follower_demographics_* kırılımları
+    InstagramDemographic tablosundan, tabloya yazılmayan online_followers gibi
+    alanlar son raporun demographics kolonundan okunur.
+    """
+    snapshot = (
+        InstagramReport.objects.filter(company=company)
+        .values_list("demographics", flat=True)
+        .first()
+    )
+    demographics = dict(snapshot or {})
+    demographics.update(instagram_demographics_payload(instagram_demographic_rows(company)))
+    return demographics or None
+
+
+def instagram_account(company):
+    """Şirkete bağlı Instagram hesabının id'si ve son yenileme zamanı (bağlı değilse None)."""
+    return (
+        InstagramToken.objects.filter(company=company)
+        .exclude(instagram_business_account_id__isnull=True)
+        .exclude(instagram_business_account_id="")
+        .values("instagram_business_account_id", "last_data_fetch")
+        .first()
+    )
+
+
+def instagram_daily_metric_rows(ig_account_id, since):
+    """Hesabın since gününden itibaren insights satırları; metrik içinde en yeni gün önce."""
+    return (
+        InstagramAccountDailyMetric.objects.filter(ig_account_id=ig_account_id, date__gte=since)
+        .order_by("metric", "-date")
+        .values("metric", "period", "date", "value")
+    )
+
+
+def instagram_comment_texts(ig_account_id, since):
+    """Hesabın medyalarına since'ten beri yazılmış yorum metinleri (iterator, bellekte biriktirmez)."""
+    media_ids = InstagramMedia.objects.filter(ig_account_id=ig_account_id).values("media_id")
+    return (
+        InstagramComment.objects.filter(media_id__in=media_ids, timestamp__gte=since)
+        .values_list("text", flat=True)
+        .iterator(chunk_size=10000)
+    )
@@ -0,0 +1,180 @@
+"""
+Yorum metni analizi: kelime frekansı, hashtag, mention, emoji ve sözlük tabanlı
+Türkçe/İngilizce duygu skoru.
+Yorumlar toplu (batch) işlenir. Her token kalıcı bir sözlükte bir kez tamsayı
+id'ye çevrilir; sayımlar ve duygu skorları bu id'ler üzerinde NumPy bincount ile
+hesaplanır. Token türü, stopword ve polarite bilgisi yorum başına değil, sözlüğe
+yeni giren token başına bir kez belirlenir.
+"""
+
+import re
+
+import numpy as np
+
+TOKEN_KIND_WORD = 0
+TOKEN_KIND_HASHTAG = 1
+TOKEN_KIND_MENTION = 2
+TOKEN_KIND_EMOJI = 3
+
+_EMOJI = (
+    "\U0001F1E6-\U0001F1FF"  # bayraklar
+    "\U0001F300-\U0001FAFF"  # semboller, yüzler, eller
+    "\u2600-\u27BF"          # çeşitli semboller, ❤ ✨
+    "\u2B50\u2B55"
+)
+TOKEN_RE = re.compile(rf"#\w+|@[\w.]+|[{_EMOJI}]|[^\W\d_]{{2,}}")
+
+STOPWORDS = frozenset(
+    """
+    ve ile de da bu şu o bir çok en için gibi ama ki mi mı mu mü ne ya daha
+    olan olarak ben sen biz siz onlar bana sana beni seni benim senin her şey
+    the and a an of to in is it this that for on with you your my me we are be
+    was so at as im its just but not all have
+    """.split()
+)
+
+POSITIVE_WORDS = frozenset(
+    """
+    güzel harika süper mükemmel muhteşem bayıldım sevdim seviyorum teşekkürler
+    teşekkür başarılı enfes efsane iyi şahane tebrikler bravo hayran tatlı
+    love great amazing awesome beautiful perfect nice good best wonderful thanks
+    cute excellent fantastic wow cool congrats
+    """.split()
+)
+
+NEGATIVE_WORDS = frozenset(
+    """
+    kötü berbat rezalet iğrenç sevmedim beğenmedim pahalı bozuk sahte yalan
+    şikayet maalesef üzgün yazık saçma rezil kalitesiz
+    bad worst terrible awful hate ugly fake poor boring disappointed scam sad
+    horrible expensive broken
+    """.split()
+)
+
+POSITIVE_EMOJIS = frozenset("❤😍🥰😘😊😀😁😂🤣👏🔥💯✨🙏👍💖💕💗💙💚💛💜🤩😻🎉")
+NEGATIVE_EMOJIS = frozenset("😡😠🤬👎😢😭😞😒🙄💔🤮😤")
+
+
+def _normalize(text):
+    # Türkçe büyük İ, str.lower() ile "i̇" olmasın; emoji varyasyon seçicisi atılır
+    return text.replace("İ", "i").lower().replace("\ufe0f", "")
+
+
+def _token_info(token):
+    """(tür, stopword mü, polarite) - sözlüğe giren her token için bir kez hesaplanır."""
+    first = token[0]
+    if first == "#":
+        return TOKEN_KIND_HASHTAG, False, 0
+    if first == "@":
+        return TOKEN_KIND_MENTION, False, 0
+    if len(token) == 1:
+        return TOKEN_KIND_EMOJI, False, (token in POSITIVE_EMOJIS) - (token in NEGATIVE_EMOJIS)
+    return (
+        TOKEN_KIND_WORD,
+        token in STOPWORDS,
+        (token in POSITIVE_WORDS) - (token in NEGATIVE_WORDS),
+    )
+
+
+class CommentAnalyzer:
+    """Yorum batch'lerini biriktirir; sonuç istenen anda summary() ile alınır."""
+
+    def __init__(self):
+        self._index = {}
+        self._tokens = []
+        self._kinds = np.zeros(0, dtype=np.int8)
+        self._stop = np.zeros(0, dtype=bool)
+        self._polarity = np.zeros(0, dtype=np.int8)
+        self._counts = np.zeros(0, dtype=np.int64)
+        self.comments = 0
+        self.sentiment_counts = np.zeros(3, dtype=np.int64)  # negatif, nötr, pozitif
+        self._score_sum = 0.0
+
+    def _grow(self, start):
+        """start'tan sonra sözlüğe giren token'ların özellik dizilerini uzatır."""
+        new = self._tokens[start:]
+        if not new:
+            return
+        info = [_token_info(token) for token in new]
+        kinds, stop, polarity = zip(*info)
+        self._kinds = np.concatenate((self._kinds, np.array(kinds, dtype=np.int8)))
+        self._stop = np.concatenate((self._stop, np.array(stop, dtype=bool)))
+        self._polarity = np.concatenate((self._polarity, np.array(polarity, dtype=np.int8)))
+        self._counts = np.concatenate((self._counts, np.zeros(len(new), dtype=np.int64)))
+
+    def add_texts(self, texts):
+        """Bir yorum metni batch'ini işler."""
+        texts = [text for text in texts if text]
+        if not texts:
+            return
+        per_comment = [TOKEN_RE.findall(_normalize(text)) for text in texts]
+        lengths = np.fromiter((len(tokens) for tokens in per_comment), dtype=np.int64, count=len(per_comment))
+
+        index = self._index
+        tokens = self._tokens
+        known = len(tokens)
+
+        def token_id(token):
+            token_id = index.get(token)
+            if token_id is None:
+                token_id = index[token] = len(tokens)
+                tokens.append(token)
+            return token_id
+
+        ids = np.fromiter(
+            (token_id(token) for comment in per_comment for token in comment),
+            dtype=np.int64,
+            count=int(lengths.sum()),
+        )
+        self._grow(known)
+        self._counts += np.bincount(ids, minlength=len(tokens))
+
+        # Yorum başına duygu: pozitif ve negatif token sayılarının farkı / toplamı
+        owners = np.repeat(np.arange(len(texts)), lengths)
+        polarity = self._polarity[ids]
+        positive = np.bincount(owners, weights=polarity > 0, minlength=len(texts))
+        negative = np.bincount(owners, weights=polarity < 0, minlength=len(texts))
+        polar = positive + negative
+        scores = np.divide(positive - negative, polar, out=np.zeros(len(texts)), where=polar > 0)
+        self.sentiment_counts += np.bincount(np.sign(scores).astype(np.int64) + 1, minlength=3)
+        self._score_sum += float(scores.sum())
+        self.comments += len(texts)
+
+    def _top(self, mask, limit):
+        counts = np.where(mask, self._counts, 0)
+        count = int(np.count_nonzero(counts))
+        if not count:
+            return []
+        limit = min(limit, count)
+        top = np.argpartition(-counts, limit - 1)[:limit]
+        top = top[np.lexsort((top, -counts[top]))]
+        return [{"term": self._tokens[i], "count": int(counts[i])} for i in top]
+
+    def summary(self, limit=20):
+        negative, neutral, positive = (int(value) for value in self.sentiment_counts)
+        return {
+            "comments": self.comments,
+            "top_terms": self._top((self._kinds == TOKEN_KIND_WORD) & ~self._stop, limit),
+            "hashtags": self._top(self._kinds == TOKEN_KIND_HASHTAG, limit),
+            "mentions": self._top(self._kinds == TOKEN_KIND_MENTION, limit),
+            "emojis": self._top(self._kinds == TOKEN_KIND_EMOJI, limit),
+            "sentiment": {
+                "positive": positive,
+                "neutral": neutral,
+                "negative": negative,
+                "average_score": round(self._score_sum / self.comments, 4) if self.comments else 0,
+            },
+        }
+
+
+def analyze_comment_texts(texts, batch_size=10000, limit=20):
+    """Metin dizisini (liste ya da iterator) batch'ler halinde analiz eder."""
+    analyzer = CommentAnalyzer()
+    batch = []
+    for text in texts:
+        batch.append(text)
+        if len(batch) >= batch_size:
+            analyzer.add_texts(batch)
+            batch = []
+    analyzer.add_texts(batch)
+    return analyzer.summary(limit)
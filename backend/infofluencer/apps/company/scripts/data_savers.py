@@ -1,5 +1,5 @@
 """
-GA4 ve YouTube'dan gelen verileri veritabanına kaydeden yardımcı fonksiyonlar.
+GA4, YouTube ve Instagram'dan gelen verileri veritabanına kaydeden yardımcı fonksiyonlar.
 """
 
 from ..models import (
@@ -16,8 +16,64 @@ from ..models import (
     YouTubeAgeGroupData,
     YouTubeTopSubscribersData,
 )
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
 from apps.accounts.models import CompanyProfile
-from apps.company.models import YouTubeReport
+from apps.company.cache import bump_company_data_version_on_commit
+from apps.company.helpers import instagram_breakdown
+from apps.company.models import (
+    InstagramAccountDailyMetric,
+    InstagramComment,
+    InstagramDemographic,
+    InstagramMedia,
+    InstagramMediaMetric,
+    InstagramToken,
+    YouTubeReport,
+)
+
+# Instagram demografisinde kaydedilen kırılımlar
+INSTAGRAM_BREAKDOWNS = ("age", "city", "country", "gender")
+
+# Medya satırına ayrı kolon/tablo olarak yazılan, ham veriye (data) girmeyen anahtarlar
+_MEDIA_ENRICHED_KEYS = ("insights", "comments_analysis")
+
+
+def bulk_replace_company_rows(model, company, key_field, rows, field_map):
+    """
+    Şirketin bir rapor tablosunu tek transaction içinde yeni satırlarla değiştirir.
+
+    Satırlar unique_together (company, key_field) kısıtına karşı tek bir
+    INSERT ... ON CONFLICT DO UPDATE ile yazılır, yeni veride olmayan eski satırlar
+    tek bir DELETE ile silinir. Böylece okuyucular hiçbir zaman boş tablo görmez.
+    Commit sonrası şirketin dashboard önbelleği geçersiz kılınır.
+
+    field_map: {model alanı: satırdaki anahtar}; key_field da içinde olmalıdır.
+    """
+    objects = {}
+    for item in rows:
+        values = {field: item[key] for field, key in field_map.items()}
+        # Aynı boyut değeri iki kez gelirse sonuncusu geçerli olsun
+        objects[values[key_field]] = model(company=company, **values)
+
+    update_fields = [field for field in field_map if field != key_field] + ["updated_at"]
+    with transaction.atomic():
+        if objects:
+            model.objects.bulk_create(
+                list(objects.values()),
+                update_conflicts=True,
+                unique_fields=["company", key_field],
+                update_fields=update_fields,
+            )
+        model.objects.filter(company=company).exclude(
+            **{f"{key_field}__in": list(objects)}
+        ).delete()
+        bump_company_data_version_on_commit(company.id)
+
+
+def _identity_map(*fields):
+    return {field: field for field in fields}
 
 
 class GA4DataSaver:
@@ -27,186 +83,400 @@ class GA4DataSaver:
     def save_user_acquisition_source_data(company_id, data):
         """Save User Acquisition Source Data"""
         company = CompanyProfile.objects.get(id=company_id)
-
-        # Clear existing data
-        GA4UserAcquisitionSourceData.objects.filter(company=company).delete()
-
-        # Save new data
-        for item in data:
-            GA4UserAcquisitionSourceData.objects.create(
-                company=company,
-                acquisition_source=item["acquisition_source"],
-                new_users=item["new_users"],
-                sessions=item["sessions"],
-                engagement_rate=item["engagement_rate"],
-                user_engagement_duration=item["user_engagement_duration"],
-                conversions=item["conversions"],
-            )
+        bulk_replace_company_rows(
+            GA4UserAcquisitionSourceData,
+            company,
+            "acquisition_source",
+            data,
+            _identity_map(
+                "acquisition_source",
+                "new_users",
+                "sessions",
+                "engagement_rate",
+                "user_engagement_duration",
+                "conversions",
+            ),
+        )
 
     @staticmethod
     def save_session_source_medium_data(company_id, data):
         """Save Session Source Medium Data"""
         company = CompanyProfile.objects.get(id=company_id)
-        GA4SessionSourceMediumData.objects.filter(company=company).delete()
-
-        for item in data:
-            GA4SessionSourceMediumData.objects.create(
-                company=company,
-                session_source_medium=item["session_source_medium"],
-                sessions=item["sessions"],
-                conversions=item["conversions"],
-                engagement_rate=item["engagement_rate"],
-                event_count=item["event_count"],
-                bounce_rate=item["bounce_rate"],
-            )
+        bulk_replace_company_rows(
+            GA4SessionSourceMediumData,
+            company,
+            "session_source_medium",
+            data,
+            _identity_map(
+                "session_source_medium",
+                "sessions",
+                "conversions",
+                "engagement_rate",
+                "event_count",
+                "bounce_rate",
+            ),
+        )
 
     @staticmethod
     def save_operating_system_data(company_id, data):
         """Save Operating System Data"""
         company = CompanyProfile.objects.get(id=company_id)
-        GA4OperatingSystemData.objects.filter(company=company).delete()
-
-        for item in data:
-            GA4OperatingSystemData.objects.create(
-                company=company,
-                operating_system=item["operating_system"],
-                active_users=item["active_users"],
-                engaged_sessions=item["engaged_sessions"],
-                engagement_rate=item["engagement_rate"],
-                user_engagement_duration=item["user_engagement_duration"],
-                event_count=item["event_count"],
-                bounce_rate=item["bounce_rate"],
-            )
+        bulk_replace_company_rows(
+            GA4OperatingSystemData,
+            company,
+            "operating_system",
+            data,
+            _identity_map(
+                "operating_system",
+                "active_users",
+                "engaged_sessions",
+                "engagement_rate",
+                "user_engagement_duration",
+                "event_count",
+                "bounce_rate",
+            ),
+        )
 
     @staticmethod
     def save_age_data(company_id, data):
         """Save Age Data"""
         company = CompanyProfile.objects.get(id=company_id)
-        GA4AgeData.objects.filter(company=company).delete()
-
-        for item in data:
-            GA4AgeData.objects.create(
-                company=company,
-                age=item["age"],
-                active_users=item["active_users"],
-                sessions=item["sessions"],
-                user_engagement_duration=item["user_engagement_duration"],
-                event_count=item["event_count"],
-                conversions=item["conversions"],
-            )
+        bulk_replace_company_rows(
+            GA4AgeData,
+            company,
+            "age",
+            data,
+            _identity_map(
+                "age",
+                "active_users",
+                "sessions",
+                "user_engagement_duration",
+                "event_count",
+                "conversions",
+            ),
+        )
 
     @staticmethod
     def save_country_data(company_id, data):
         """Save Country Data"""
         company = CompanyProfile.objects.get(id=company_id)
-        GA4CountryData.objects.filter(company=company).delete()
-
-        for item in data:
-            GA4CountryData.objects.create(
-                company=company,
-                country=item["country"],
-                active_users=item["active_users"],
-                new_users=item["new_users"],
-                sessions=item["sessions"],
-                user_engagement_duration=item["user_engagement_duration"],
-                event_count=item["event_count"],
-                engagement_rate=item["engagement_rate"],
-                conversions=item["conversions"],
-                bounce_rate=item["bounce_rate"],
-            )
+        bulk_replace_company_rows(
+            GA4CountryData,
+            company,
+            "country",
+            data,
+            _identity_map(
+                "country",
+                "active_users",
+                "new_users",
+                "sessions",
+                "user_engagement_duration",
+                "event_count",
+                "engagement_rate",
+                "conversions",
+                "bounce_rate",
+            ),
+        )
 
     @staticmethod
     def save_city_data(company_id, data):
         """Save City Data"""
         company = CompanyProfile.objects.get(id=company_id)
-        GA4CityData.objects.filter(company=company).delete()
-
-        for item in data:
-            GA4CityData.objects.create(
-                company=company,
-                city=item["city"],
-                active_users=item["active_users"],
-                sessions=item["sessions"],
-                user_engagement_duration=item["user_engagement_duration"],
-                event_count=item["event_count"],
-                conversions=item["conversions"],
-            )
+        bulk_replace_company_rows(
+            GA4CityData,
+            company,
+            "city",
+            data,
+            _identity_map(
+                "city",
+                "active_users",
+                "sessions",
+                "user_engagement_duration",
+                "event_count",
+                "conversions",
+            ),
+        )
 
     @staticmethod
     def save_device_category_data(company_id, data):
         """Save Device Category Data"""
         company = CompanyProfile.objects.get(id=company_id)
-        GA4DeviceCategoryData.objects.filter(company=company).delete()
-
-        for item in data:
-            GA4DeviceCategoryData.objects.create(
-                company=company,
-                device_category=item["device_category"],
-                active_users=item["active_users"],
-                engaged_sessions=item["engaged_sessions"],
-                user_engagement_duration=item["user_engagement_duration"],
-                event_count=item["event_count"],
-                bounce_rate=item["bounce_rate"],
-            )
+        bulk_replace_company_rows(
+            GA4DeviceCategoryData,
+            company,
+            "device_category",
+            data,
+            _identity_map(
+                "device_category",
+                "active_users",
+                "engaged_sessions",
+                "user_engagement_duration",
+                "event_count",
+                "bounce_rate",
+            ),
+        )
 
     @staticmethod
     def save_user_gender_data(company_id, data):
         """Save User Gender Data"""
         company = CompanyProfile.objects.get(id=company_id)
-        GA4UserGenderData.objects.filter(company=company).delete()
-
-        for item in data:
-            GA4UserGenderData.objects.create(
-                company=company,
-                gender=item["gender"],
-                sessions=item["sessions"],
-                engagement_rate=item["engagement_rate"],
-                user_engagement_duration=item["user_engagement_duration"],
-                event_count=item["event_count"],
-            )
+        bulk_replace_company_rows(
+            GA4UserGenderData,
+            company,
+            "gender",
+            data,
+            _identity_map(
+                "gender",
+                "sessions",
+                "engagement_rate",
+                "user_engagement_duration",
+                "event_count",
+            ),
+        )
 
 
 class YouTubeDataSaver:
     """YouTube Data Saver Class"""
 
     @staticmethod
-    def save_trafficSource_data(company_id, data):
+    def _save_report_section(company_id, key, data):
+        """
+        Bölümü yeni bir YouTubeReport snapshot'ı olarak ekler; diğer bölümler son
+        snapshot'tan taşınır, geçmiş snapshot'lar değiştirilmez. Son snapshot satır
+        kilidiyle okunur, böylece eşzamanlı bölüm yazımları birbirini ezmez.
+        """
         company = CompanyProfile.objects.get(id=company_id)
-        report, _ = YouTubeReport.objects.get_or_create(company=company)
-        report_data = report.report_data or {}
-        report_data['traffic_sources'] = data
-        report.report_data = report_data
-        report.save()
+        with transaction.atomic():
+            report = (
+                YouTubeReport.objects.select_for_update()
+                .filter(company=company)
+                .first()
+            )
+            report_data = dict((report.report_data or {}) if report else {})
+            report_data[key] = data
+            YouTubeReport.objects.create(company=company, report_data=report_data)
+
+    @staticmethod
+    def save_trafficSource_data(company_id, data):
+        YouTubeDataSaver._save_report_section(company_id, 'traffic_sources', data)
 
     @staticmethod
     def save_ageGroup_data(company_id, data):
-        company = CompanyProfile.objects.get(id=company_id)
-        report, _ = YouTubeReport.objects.get_or_create(company=company)
-        report_data = report.report_data or {}
-        report_data['age_groups'] = data
-        report.report_data = report_data
-        report.save()
+        YouTubeDataSaver._save_report_section(company_id, 'age_groups', data)
 
     @staticmethod
     def save_deviceType_data(company_id, data):
-        company = CompanyProfile.objects.get(id=company_id)
-        report, _ = YouTubeReport.objects.get_or_create(company=company)
-        report_data = report.report_data or {}
-        report_data['device_types'] = data
-        report.report_data = report_data
-        report.save()
+        YouTubeDataSaver._save_report_section(company_id, 'device_types', data)
 
     @staticmethod
     def save_top_subscribers_data(company_id, data):
         """Save Top Subscribers Data"""
         company = CompanyProfile.objects.get(id=company_id)
-        YouTubeTopSubscribersData.objects.filter(company=company).delete()
-
-        for item in data:
-            YouTubeTopSubscribersData.objects.create(
-                company=company,
-                video_id=item["video"],
-                subscribers_gained=item["subscribersGained"],
-                subscribers_lost=item["subscribersLost"],
-                views=item["views"],
+        bulk_replace_company_rows(
+            YouTubeTopSubscribersData,
+            company,
+            "video_id",
+            data,
+            {
+                "video_id": "video",
+                "subscribers_gained": "subscribersGained",
+                "subscribers_lost": "subscribersLost",
+                "views": "views",
+            },
+        )
+
+
+def _numeric(value):
+    """Sayısal insights değeri; breakdown sözlükleri vb. için None."""
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        return None
+    return value
+
+
+class InstagramDataSaver:
+    """Instagram Data Saver Class"""
+
+    @staticmethod
+    def insight_value(response):
+        """Graph insights yanıtındaki ilk değer (total_value ya da values[0])."""
+        entry = ((response or {}).get("data") or [{}])[0]
+        if "total_value" in entry:
+            return _numeric((entry.get("total_value") or {}).get("value"))
+        if "values" in entry:
+            return _numeric((entry.get("values") or [{}])[0].get("value"))
+        return _numeric(entry.get("value"))
+
+    @staticmethod
+    def save_media(ig_id, medias):
+        """Medyaları media_id, metriklerini (medya, metrik) üzerinden toplu upsert eder."""
+        if not medias:
+            return
+        now = timezone.now()
+        objects = {}
+        for media in medias:
+            objects[media["id"]] = InstagramMedia(
+                ig_account_id=ig_id,
+                media_id=media["id"],
+                media_type=media.get("media_type", ""),
+                timestamp=parse_datetime(media.get("timestamp") or ""),
+                like_count=media.get("like_count") or 0,
+                comments_count=media.get("comments_count") or 0,
+                data={
+                    key: value
+                    for key, value in media.items()
+                    if key not in _MEDIA_ENRICHED_KEYS
+                },
+                comments_analysis=media.get("comments_analysis"),
+                insights_fetched_at=now,
+            )
+
+        with transaction.atomic():
+            InstagramMedia.objects.bulk_create(
+                list(objects.values()),
+                update_conflicts=True,
+                unique_fields=["media_id"],
+                update_fields=[
+                    "ig_account_id",
+                    "media_type",
+                    "timestamp",
+                    "like_count",
+                    "comments_count",
+                    "data",
+                    "comments_analysis",
+                    "insights_fetched_at",
+                    "updated_at",
+                ],
             )
+            # Upsert edilen satırların id'leri tek sorguda okunur
+            media_pks = dict(
+                InstagramMedia.objects.filter(media_id__in=list(objects)).values_list(
+                    "media_id", "id"
+                )
+            )
+            metrics = {}
+            for media in medias:
+                for metric, response in (media.get("insights") or {}).items():
+                    value = InstagramDataSaver.insight_value(response)
+                    if value is not None:
+                        metrics[(media["id"], metric)] = InstagramMediaMetric(
+                            media_id=media_pks[media["id"]], metric=metric, value=value
+                        )
+            if metrics:
+                InstagramMediaMetric.objects.bulk_create(
+                    list(metrics.values()),
+                    update_conflicts=True,
+                    unique_fields=["media", "metric"],
+                    update_fields=["value", "updated_at"],
+                )
+
+    @staticmethod
+    def save_comments(media_id, comments):
+        """Bir yorum sayfasını comment_id üzerinden toplu upsert eder."""
+        rows = {
+            comment["id"]: InstagramComment(
+                comment_id=comment["id"],
+                media_id=media_id,
+                username=(comment.get("username") or "")[:100],
+                text=comment.get("text") or "",
+                like_count=comment.get("like_count") or 0,
+                timestamp=parse_datetime(comment.get("timestamp") or ""),
+            )
+            for comment in comments
+            if comment.get("id")
+        }
+        InstagramComment.objects.bulk_create(
+            list(rows.values()),
+            update_conflicts=True,
+            unique_fields=["comment_id"],
+            update_fields=["text", "like_count", "updated_at"],
+        )
+        return len(rows)
+
+    @staticmethod
+    def user_insight_rows(user_insights, fetched_on=None):
+        """
+        Hesap insights yanıtını {(metric, period, date): value} satırlarına çevirir.
+        values dizisindeki noktalar end_time gününe (period='day'), total_value
+        toplamları çekildiği güne (period='total') yazılır.
+        """
+        fetched_on = fetched_on or timezone.localdate()
+        rows = {}
+        for metric, response in (user_insights or {}).items():
+            for entry in (response or {}).get("data") or []:
+                if "total_value" in entry:
+                    value = _numeric((entry.get("total_value") or {}).get("value"))
+                    if value is not None:
+                        key = (metric, InstagramAccountDailyMetric.PERIOD_TOTAL, fetched_on)
+                        rows[key] = value
+                for point in entry.get("values") or []:
+                    end_time = parse_datetime(point.get("end_time") or "")
+                    value = _numeric(point.get("value"))
+                    if end_time and value is not None:
+                        key = (metric, InstagramAccountDailyMetric.PERIOD_DAY, end_time.date())
+                        rows[key] = value
+        return rows
+
+    @staticmethod
+    def save_user_insights(ig_id, user_insights, fetched_on=None):
+        """Hesap insights'ını günlük metrik satırlarına yazar (bkz. user_insight_rows)."""
+        rows = InstagramDataSaver.user_insight_rows(user_insights, fetched_on)
+        if not rows:
+            return
+        InstagramAccountDailyMetric.objects.bulk_create(
+            [
+                InstagramAccountDailyMetric(
+                    ig_account_id=ig_id, metric=metric, period=period, date=date, value=value
+                )
+                for (metric, period, date), value in rows.items()
+            ],
+            update_conflicts=True,
+            unique_fields=["ig_account_id", "metric", "period", "date"],
+            update_fields=["value", "updated_at"],
+        )
+
+    @staticmethod
+    def save_demographics(ig_id, demographics):
+        """
+        Demografi kırılımlarını satırlara yazar; yanıtta bulunan her kırılımın
+        eski etiketleri tek DELETE ile silinir, gelmeyen kırılımlar korunur.
+        """
+        demographics = demographics or {}
+        with transaction.atomic():
+            for breakdown in INSTAGRAM_BREAKDOWNS:
+                if f"follower_demographics_{breakdown}" not in demographics:
+                    continue
+                values = {}
+                for label, value in instagram_breakdown(demographics, breakdown):
+                    if label and _numeric(value) is not None:
+                        values[label] = int(value)
+                if values:
+                    InstagramDemographic.objects.bulk_create(
+                        [
+                            InstagramDemographic(
+                                ig_account_id=ig_id, breakdown=breakdown, label=label, value=value
+                            )
+                            for label, value in values.items()
+                        ],
+                        update_conflicts=True,
+                        unique_fields=["ig_account_id", "breakdown", "label"],
+                        update_fields=["value", "updated_at"],
+                    )
+                InstagramDemographic.objects.filter(
+                    ig_account_id=ig_id, breakdown=breakdown
+                ).exclude(label__in=list(values)).delete()
+
+    @staticmethod
+    def save_comprehensive(ig_id, data):
+        """
+        get_comprehensive_instagram_data çıktısını normalize tablolara yazar.
+        Medyalar ingest_media tarafından zaten save_media ile yazıldığı için burada
+        yalnızca hesap insights'ı ve demografi kaydedilir.
+        """
+        with transaction.atomic():
+            InstagramDataSaver.save_user_insights(ig_id, data.get("user_insights"))
+            InstagramDataSaver.save_demographics(ig_id, data.get("demographics"))
+            company_ids = InstagramToken.objects.filter(
+                instagram_business_account_id=ig_id
+            ).values_list("company_id", flat=True)
+            for company_id in set(company_ids):
+                bump_company_data_version_on_commit(company_id)
@@ -0,0 +1,170 @@
+"""
+GA4 günlük fact tabloları ve toplam (rollup) tabloları.
+Raporlar 'date' ek boyutuyla çekilip GA4DailyMetric'e gün gün yazılır. Sonra
+etkilenen günlerin 7/28/90 günlük kayan toplamları ve takvim ayı toplamları
+GA4MetricRollup'ta güncellenir. Her yenilemede yalnızca son kaydedilen günden
+itibaren (GA4'ün geç işlenen verisi için GA4_DAILY_RESTATE_DAYS geriye dönük)
+dünün sonuna kadar veri çekilir; bugün henüz tamamlanmadığı için fact'lere girmez.
+"""
+
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max, Sum
+from django.utils import timezone
+
+from apps.company.cache import bump_company_data_version_on_commit
+from apps.company.models import GA4DailyMetric, GA4MetricRollup
+from apps.company.scripts.ga4_reports import DATE_COLUMN, GA4_REPORTS
+
+# Günlük kırılımda çekilen raporlar
+GA4_DAILY_REPORTS = ("userAcquisitionSource", "deviceCategory", "country")
+
+# Oran metrikleri ve tekil kullanıcı sayıları (active_users) günler/boyutlar arasında
+# toplanamaz: aynı kullanıcı birden çok gün aktif olabilir. Rollup'lara girmezler;
+# pencere bazında tekil kullanıcı gerekiyorsa GA4'ten o aralık için ayrıca çekilmelidir.
+NON_ADDITIVE_METRICS = frozenset(["engagement_rate", "bounce_rate", "active_users"])
+
+ROLLING_WINDOWS = {"7d": 7, "28d": 28, "90d": 90}
+
+
+def ingest_window(company):
+    """Çekilecek gün aralığı: (başlangıç, bitiş) date; bitiş son tamamlanmış gün (dün)."""
+    end = timezone.localdate() - timedelta(days=1)
+    last = GA4DailyMetric.objects.filter(company=company).aggregate(last=Max("date"))["last"]
+    if last is None:
+        return end - timedelta(days=getattr(settings, "GA4_DAILY_BACKFILL_DAYS", 90) - 1), end
+    start = min(last, end) - timedelta(days=getattr(settings, "GA4_DAILY_RESTATE_DAYS", 3))
+    return start, end
+
+
+def store_daily_rows(company, report_type, rows, start, end):
+    """
+    Günlük rapor satırlarını fact tablosuna yazar. start'tan itibaren eski fact'ler
+    aynı transaction'da silinir; yeniden işlenen günlerde kaybolan boyutlar ve
+    eski sürümlerin yazdığı tamamlanmamış günler kalmaz. Aralık dışındaki satırlar atlanır.
+    """
+    spec = GA4_REPORTS[report_type]
+    metrics = [name for name, _, _ in spec.columns]
+    facts = {}
+    for row in rows:
+        day = datetime.strptime(row[DATE_COLUMN], "%Y%m%d").date()
+        if not start <= day <= end:
+            continue
+        dimension_value = str(row[spec.dimension_column])[:255]
+        for metric in metrics:
+            facts[(dimension_value, day, metric)] = GA4DailyMetric(
+                company=company,
+                report_type=report_type,
+                dimension_value=dimension_value,
+                date=day,
+                metric=metric,
+                value=row[metric],
+            )
+    with transaction.atomic():
+        GA4DailyMetric.objects.filter(
+            company=company, report_type=report_type, date__gte=start
+        ).delete()
+        GA4DailyMetric.objects.bulk_create(list(facts.values()), batch_size=1000)
+    return len(facts)
+
+
+def _months(first, last):
+    """first ile last arasındaki ayların (ilk gün, sonraki ayın ilk günü) çiftleri."""
+    month = first.replace(day=1)
+    while month <= last:
+        next_month = date(month.year + (month.month == 12), month.month % 12 + 1, 1)
+        yield month, next_month
+        month = next_month
+
+
+def refresh_rollups(company, report_type, since):
+    """
+    since gününden son fact gününe kadar biten kayan pencereleri ve bu günlere
+    dokunan ayları yeniden hesaplar. Günlük toplamlar tek sorguda okunur,
+    pencereler NumPy kümülatif toplamıyla çıkarılır.
+    """
+    first = since - timedelta(days=max(ROLLING_WINDOWS.values()) - 1)
+    daily_totals = (
+        GA4DailyMetric.objects.filter(company=company, report_type=report_type, date__gte=first)
+        .exclude(metric__in=NON_ADDITIVE_METRICS)
+        .values("metric", "date")
+        .annotate(total=Sum("value"))
+        .order_by()
+    )
+    by_metric = defaultdict(dict)
+    for row in daily_totals:
+        by_metric[row["metric"]][row["date"]] = row["total"]
+    if not by_metric:
+        return 0
+
+    last = max(max(values) for values in by_metric.values())
+    # Son fact gününden sonraki (ör. tamamlanmamış güne ait eski) kayan pencereler silinir
+    GA4MetricRollup.objects.filter(
+        company=company, report_type=report_type, window__in=ROLLING_WINDOWS, date__gt=last
+    ).delete()
+    days = (last - first).days + 1
+    start_offset = max((since - first).days, 0)
+    ends = np.arange(start_offset, days)
+
+    rollups = []
+    for metric, values in by_metric.items():
+        series = np.zeros(days)
+        for day, total in values.items():
+            series[(day - first).days] = total
+        cumulative = np.concatenate(([0.0], np.cumsum(series)))
+
+        for window, size in ROLLING_WINDOWS.items():
+            sums = cumulative[ends + 1] - cumulative[np.maximum(ends + 1 - size, 0)]
+            for offset, value in zip(ends.tolist(), sums.tolist()):
+                rollups.append(
+                    GA4MetricRollup(
+                        company=company,
+                        report_type=report_type,
+                        metric=metric,
+                        window=window,
+                        date=first + timedelta(days=offset),
+                        value=value,
+                    )
+                )
+
+        for month, next_month in _months(since, last):
+            # Ayın ilk günü her zaman first'ten sonradır (first = since - 89 gün)
+            lo = (month - first).days
+            hi = (min(next_month, last + timedelta(days=1)) - first).days
+            rollups.append(
+                GA4MetricRollup(
+                    company=company,
+                    report_type=report_type,
+                    metric=metric,
+                    window="month",
+                    date=month,
+                    value=float(series[lo:hi].sum()),
+                )
+            )
+
+    GA4MetricRollup.objects.bulk_create(
+        rollups,
+        batch_size=1000,
+        update_conflicts=True,
+        unique_fields=["company", "report_type", "metric", "window", "date"],
+        update_fields=["value", "updated_at"],
+    )
+    return len(rollups)
+
+
+def ingest_ga4_daily(company, engine):
+    """Son kaydedilen günden düne kadar günlük raporları çeker, fact ve rollup tablolarını günceller."""
+    start, end = ingest_window(company)
+    reports = engine.run(GA4_DAILY_REPORTS, start.isoformat(), end.isoformat(), daily=True)
+    stored = 0
+    with transaction.atomic():
+        for report_type, rows in reports.items():
+            stored += store_daily_rows(company, report_type, rows, start, end)
+            refresh_rollups(company, report_type, start)
+        bump_company_data_version_on_commit(company.id)
+    print(f"✅ GA4 günlük veriler: {start} - {end}, {stored} fact")
+    return stored
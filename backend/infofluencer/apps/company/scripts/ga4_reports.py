@@ -1,459 +1,351 @@
 """
 GA4 API'den rapor verisi çekmek için kullanılan fonksiyonlar.
+Raporlar GA4_REPORTS kayıt defterinde bildirimsel olarak tanımlanır; yeni bir
+rapor eklemek için tek bir GA4ReportSpec girdisi yeterlidir.
 """
 
+import threading
+from dataclasses import dataclass
+
+import numpy as np
 from google.analytics.data_v1beta import BetaAnalyticsDataClient
 from google.analytics.data_v1beta.types import (
+    BatchRunReportsRequest,
     RunReportRequest,
+    RunReportResponse,
     DateRange,
     Dimension,
     Metric,
 )
 from google.oauth2.credentials import Credentials
 
+from ..credentials import credential_provider
+from ..models import (
+    GA4UserAcquisitionSourceData,
+    GA4SessionSourceMediumData,
+    GA4OperatingSystemData,
+    GA4UserGenderData,
+    GA4DeviceCategoryData,
+    GA4CountryData,
+    GA4CityData,
+    GA4AgeData,
+)
 
-def get_ga4_report(
-    report_type, access_token, refresh_token, client_id, client_secret, property_id
-):
-    """GA4 Report Dispatcher - Updated to match your existing functions"""
-
-    # Create credentials
-    creds = Credentials(
-        token=access_token,
-        refresh_token=refresh_token,
-        token_uri="https://oauth2.googleapis.com/token",
-        client_id=client_id,
-        client_secret=client_secret,
-    )
-
-    # Report function mapping
-    report_functions = {
-        "userAcquisitionSource": run_userAcquisitionSource_report,
-        "sessionSourceMedium": run_sessionSourceMedium_report,
-        "operatingSystem": run_operatingSystem_report,
-        "userGender": run_userGender_report,
-        "deviceCategory": run_deviceCategory_report,
-        "country": run_country_report,
-        "city": run_city_report,
-        "age": run_age_report,
-    }
-
-    if report_type not in report_functions:
-        raise ValueError(f"Unsupported GA4 report type: {report_type}")
-
-    # Call the specific report function
-    return report_functions[report_type](
-        access_token, refresh_token, client_id, client_secret, property_id
-    )
-
-
-def run_userAcquisitionSource_report(
-    access_token,
-    refresh_token,
-    client_id,
-    client_secret,
-    property_id,
-    token_uri="https://oauth2.googleapis.com/token",
-):
-    # Dinamik olarak kimlik bilgilerini oluştur
-    creds = Credentials(
-        token=access_token,
-        refresh_token=refresh_token,
-        token_uri=token_uri,
-        client_id=client_id,
-        client_secret=client_secret,
-    )
-
-    client = BetaAnalyticsDataClient(credentials=creds)
-
-    request = RunReportRequest(
-        property=f"properties/{property_id}",
-        dimensions=[Dimension(name="sessionSource")],
-        metrics=[
-            Metric(name="newUsers"),
-            Metric(name="sessions"),
-            Metric(name="engagementRate"),
-            Metric(name="userEngagementDuration"),
-            Metric(name="conversions"),
-        ],
-        date_ranges=[DateRange(start_date="2025-01-01", end_date="2025-05-27")],
-    )
-
-    response = client.run_report(request)
-
-    data = []
-    for row in response.rows:
-        data.append(
-            {
-                "acquisition_source": row.dimension_values[0].value,
-                "new_users": int(row.metric_values[0].value),
-                "sessions": int(row.metric_values[1].value),
-                "engagement_rate": float(row.metric_values[2].value),
-                "user_engagement_duration": float(row.metric_values[3].value),
-                "conversions": int(row.metric_values[4].value),
-            }
-        )
-
-    return data
-
-
-def run_sessionSourceMedium_report(
-    access_token,
-    refresh_token,
-    client_id,
-    client_secret,
-    property_id,
-    token_uri="https://oauth2.googleapis.com/token",
-):
-    # Kimlik bilgilerini oluştur
-    creds = Credentials(
-        token=access_token,
-        refresh_token=refresh_token,
-        token_uri=token_uri,
-        client_id=client_id,
-        client_secret=client_secret,
-    )
-
-    client = BetaAnalyticsDataClient(credentials=creds)
-
-    request = RunReportRequest(
-        property=f"properties/{property_id}",
-        dimensions=[Dimension(name="sessionSourceMedium")],
-        metrics=[
-            Metric(name="sessions"),
-            Metric(name="conversions"),
-            Metric(name="engagementRate"),
-            Metric(name="eventCount"),
-            Metric(name="bounceRate"),
-        ],
-        date_ranges=[DateRange(start_date="2025-01-01", end_date="2025-05-27")],
-    )
-
-    response = client.run_report(request)
-
-    data = []
-    for row in response.rows:
-        data.append(
-            {
-                "session_source_medium": row.dimension_values[0].value,
-                "sessions": int(row.metric_values[0].value),
-                "conversions": int(row.metric_values[1].value),
-                "engagement_rate": float(row.metric_values[2].value),
-                "event_count": int(row.metric_values[3].value),
-                "bounce_rate": float(row.metric_values[4].value),
-            }
-        )
-
-    return data
-
-
-def run_operatingSystem_report(
-    access_token,
-    refresh_token,
-    client_id,
-    client_secret,
-    property_id,
-    token_uri="https://oauth2.googleapis.com/token",
-):
-    # Kimlik bilgilerini oluştur
-    creds = Credentials(
-        token=access_token,
-        refresh_token=refresh_token,
-        token_uri=token_uri,
-        client_id=client_id,
-        client_secret=client_secret,
-    )
-
-    client = BetaAnalyticsDataClient(credentials=creds)
-
-    request = RunReportRequest(
-        property=f"properties/{property_id}",
-        dimensions=[Dimension(name="operatingSystem")],
-        metrics=[
-            Metric(name="activeUsers"),
-            Metric(name="engagedSessions"),
-            Metric(name="engagementRate"),
-            Metric(name="userEngagementDuration"),
-            Metric(name="eventCount"),
-            Metric(name="bounceRate"),
-        ],
-        date_ranges=[DateRange(start_date="2025-01-01", end_date="2025-05-27")],
-    )
-
-    response = client.run_report(request)
-
-    data = []
-    for row in response.rows:
-        data.append(
-            {
-                "operating_system": row.dimension_values[0].value,
-                "active_users": int(row.metric_values[0].value),
-                "engaged_sessions": int(row.metric_values[1].value),
-                "engagement_rate": float(row.metric_values[2].value),
-                "user_engagement_duration": float(row.metric_values[3].value),
-                "event_count": float(row.metric_values[4].value),
-                "bounce_rate": float(row.metric_values[5].value),
-            }
-        )
-
-    return data
-
-
-def run_userGender_report(
-    access_token,
-    refresh_token,
-    client_id,
-    client_secret,
-    property_id,
-    token_uri="https://oauth2.googleapis.com/token",
-):
-    # Kimlik bilgilerini oluştur
-    creds = Credentials(
-        token=access_token,
-        refresh_token=refresh_token,
-        token_uri=token_uri,
-        client_id=client_id,
-        client_secret=client_secret,
-    )
-
-    client = BetaAnalyticsDataClient(credentials=creds)
-
-    request = RunReportRequest(
-        property=f"properties/{property_id}",
-        dimensions=[Dimension(name="userGender")],
-        metrics=[
-            Metric(name="activeUsers"),
-            Metric(name="sessions"),
-            Metric(name="engagementRate"),
-            Metric(name="userEngagementDuration"),
-            Metric(name="eventCount"),
-        ],
-        date_ranges=[DateRange(start_date="2025-01-01", end_date="2025-05-27")],
-    )
-
-    response = client.run_report(request)
-
-    data = []
-    for row in response.rows:
-        data.append(
-            {
-                "gender": row.dimension_values[0].value,
-                "sessions": int(
-                    row.metric_values[1].value
-                ),  # Fixed: activeUsers was mapped to sessions
-                "engagement_rate": float(
-                    row.metric_values[2].value
-                ),  # Fixed: sessions was mapped to engagement_rate
-                "user_engagement_duration": float(row.metric_values[3].value),
-                "event_count": float(row.metric_values[4].value),
-            }
-        )
-
-    return data
-
-
-def run_deviceCategory_report(
+GA4_TOKEN_URI = "https://oauth2.googleapis.com/token"
+
+# batchRunReports tek çağrıda en fazla 5 rapor kabul eder
+GA4_BATCH_LIMIT = 5
+
+_NUMPY_TYPES = {"int": np.int64, "float": np.float64}
+
+# Snapshot raporlarının tarih aralığı
+DEFAULT_START_DATE = "2025-01-01"
+DEFAULT_END_DATE = "2025-05-27"
+
+# Günlük raporlarda 'date' boyutunun yazıldığı kolon
+DATE_COLUMN = "date"
+
+# Günlük raporlar boyut x gün satırı döndüğünden varsayılan 10.000 satır sınırı yükseltilir
+GA4_DAILY_ROW_LIMIT = 250000
+
+
+@dataclass(frozen=True)
+class GA4ReportSpec:
+    """
+    Bir GA4 raporunun tanımı.
+    dimension_column: boyut değerinin yazılacağı kolon (hedef modeldeki alan adı)
+    columns: (kolon adı, GA4 metrik adı, "int" | "float") üçlüleri
+    metrics: API'den istenen metrikler (kolonlarda kullanılmayanlar da olabilir)
+    """
+
+    dimension: str
+    dimension_column: str
+    metrics: tuple
+    columns: tuple
+    model: type
+
+    @property
+    def column_names(self):
+        return (self.dimension_column,) + tuple(name for name, _, _ in self.columns)
+
+
+GA4_REPORTS = {
+    "userAcquisitionSource": GA4ReportSpec(
+        dimension="sessionSource",
+        dimension_column="acquisition_source",
+        metrics=("newUsers", "sessions", "engagementRate", "userEngagementDuration", "conversions"),
+        columns=(
+            ("new_users", "newUsers", "int"),
+            ("sessions", "sessions", "int"),
+            ("engagement_rate", "engagementRate", "float"),
+            ("user_engagement_duration", "userEngagementDuration", "float"),
+            ("conversions", "conversions", "int"),
+        ),
+        model=GA4UserAcquisitionSourceData,
+    ),
+    "sessionSourceMedium": GA4ReportSpec(
+        dimension="sessionSourceMedium",
+        dimension_column="session_source_medium",
+        metrics=("sessions", "conversions", "engagementRate", "eventCount", "bounceRate"),
+        columns=(
+            ("sessions", "sessions", "int"),
+            ("conversions", "conversions", "int"),
+            ("engagement_rate", "engagementRate", "float"),
+            ("event_count", "eventCount", "int"),
+            ("bounce_rate", "bounceRate", "float"),
+        ),
+        model=GA4SessionSourceMediumData,
+    ),
+    "operatingSystem": GA4ReportSpec(
+        dimension="operatingSystem",
+        dimension_column="operating_system",
+        metrics=("activeUsers", "engagedSessions", "engagementRate", "userEngagementDuration", "eventCount", "bounceRate"),
+        columns=(
+            ("active_users", "activeUsers", "int"),
+            ("engaged_sessions", "engagedSessions", "int"),
+            ("engagement_rate", "engagementRate", "float"),
+            ("user_engagement_duration", "userEngagementDuration", "float"),
+            ("event_count", "eventCount", "float"),
+            ("bounce_rate", "bounceRate", "float"),
+        ),
+        model=GA4OperatingSystemData,
+    ),
+    "userGender": GA4ReportSpec(
+        dimension="userGender",
+        dimension_column="gender",
+        metrics=("activeUsers", "sessions", "engagementRate", "userEngagementDuration", "eventCount"),
+        columns=(
+            ("sessions", "sessions", "int"),
+            ("engagement_rate", "engagementRate", "float"),
+            ("user_engagement_duration", "userEngagementDuration", "float"),
+            ("event_count", "eventCount", "float"),
+        ),
+        model=GA4UserGenderData,
+    ),
+    "deviceCategory": GA4ReportSpec(
+        dimension="deviceCategory",
+        dimension_column="device_category",
+        metrics=("activeUsers", "engagedSessions", "engagementRate", "userEngagementDuration", "eventCount", "bounceRate"),
+        columns=(
+            ("active_users", "activeUsers", "int"),
+            ("engaged_sessions", "engagedSessions", "int"),
+            ("user_engagement_duration", "userEngagementDuration", "float"),
+            ("event_count", "eventCount", "float"),
+            ("bounce_rate", "bounceRate", "float"),
+        ),
+        model=GA4DeviceCategoryData,
+    ),
+    "country": GA4ReportSpec(
+        dimension="country",
+        dimension_column="country",
+        metrics=("activeUsers", "newUsers", "sessions", "userEngagementDuration", "eventCount", "engagementRate", "conversions", "bounceRate"),
+        columns=(
+            ("active_users", "activeUsers", "int"),
+            ("new_users", "newUsers", "int"),
+            ("sessions", "sessions", "int"),
+            ("user_engagement_duration", "userEngagementDuration", "float"),
+            ("event_count", "eventCount", "float"),
+            ("engagement_rate", "engagementRate", "float"),
+            ("conversions", "conversions", "float"),
+            ("bounce_rate", "bounceRate", "float"),
+        ),
+        model=GA4CountryData,
+    ),
+    "city": GA4ReportSpec(
+        dimension="city",
+        dimension_column="city",
+        metrics=("activeUsers", "sessions", "userEngagementDuration", "eventCount", "conversions"),
+        columns=(
+            ("active_users", "activeUsers", "int"),
+            ("sessions", "sessions", "int"),
+            ("user_engagement_duration", "userEngagementDuration", "float"),
+            ("event_count", "eventCount", "float"),
+            ("conversions", "conversions", "float"),
+        ),
+        model=GA4CityData,
+    ),
+    "age": GA4ReportSpec(
+        dimension="userAgeBracket",
+        dimension_column="age",
+        metrics=("activeUsers", "sessions", "userEngagementDuration", "eventCount", "conversions"),
+        columns=(
+            ("active_users", "activeUsers", "int"),
+            ("sessions", "sessions", "int"),
+            ("user_engagement_duration", "userEngagementDuration", "float"),
+            ("event_count", "eventCount", "float"),
+            ("conversions", "conversions", "float"),
+        ),
+        model=GA4AgeData,
+    ),
+}
+
+
+def decode_report_columns(response, spec, daily=False):
+    """
+    Rapor satırlarını tek geçişte kolon dizilerine çevirir: {kolon adı: np.ndarray}.
+    proto-plus sarmalayıcıları yerine ham protobuf mesajı okunur; sayısal
+    dönüşümler kolon başına tek seferde NumPy ile yapılır.
+    daily=True ise ikinci boyut GA4 'date' (YYYYMMDD) olarak DATE_COLUMN'a yazılır.
+    """
+    pb = RunReportResponse.pb(response) if isinstance(response, RunReportResponse) else response
+    metric_index = {name: i for i, name in enumerate(spec.metrics)}
+    wanted = [metric_index[metric] for _, metric, _ in spec.columns]
+
+    dimension_values = []
+    dates = []
+    raw = [[] for _ in wanted]
+    for row in pb.rows:
+        dimension_values.append(row.dimension_values[0].value)
+        if daily:
+            dates.append(row.dimension_values[1].value)
+        metric_values = row.metric_values
+        for column, index in zip(raw, wanted):
+            column.append(metric_values[index].value)
+
+    columns = {spec.dimension_column: np.array(dimension_values, dtype=object)}
+    if daily:
+        columns[DATE_COLUMN] = np.array(dates, dtype=object)
+    for (name, _, kind), values in zip(spec.columns, raw):
+        # GA4 tam sayı metrikleri de metin olarak döner; önce float, sonra hedef tip
+        numbers = np.array(values, dtype=np.float64) if values else np.empty(0)
+        columns[name] = numbers.astype(_NUMPY_TYPES[kind])
+    return columns
+
+
+def columns_to_rows(columns, spec):
+    """Kolon dizilerini kaydedicilerin beklediği satır dict listesine çevirir."""
+    names = spec.column_names
+    if DATE_COLUMN in columns:
+        names = (DATE_COLUMN,) + names
+    return [dict(zip(names, values)) for values in zip(*(columns[name].tolist() for name in names))]
+
+
+def decode_report_rows(response, spec, daily=False):
+    return columns_to_rows(decode_report_columns(response, spec, daily=daily), spec)
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_ga4_client(
+    cache_key,
     access_token,
     refresh_token,
     client_id,
     client_secret,
-    property_id,
-    token_uri="https://oauth2.googleapis.com/token",
+    token_uri=GA4_TOKEN_URI,
 ):
-    # Kimlik bilgilerini oluştur
-    creds = Credentials(
-        token=access_token,
-        refresh_token=refresh_token,
-        token_uri=token_uri,
-        client_id=client_id,
-        client_secret=client_secret,
-    )
-
-    client = BetaAnalyticsDataClient(credentials=creds)
-
-    request = RunReportRequest(
-        property=f"properties/{property_id}",
-        dimensions=[Dimension(name="deviceCategory")],
-        metrics=[
-            Metric(name="activeUsers"),
-            Metric(name="engagedSessions"),
-            Metric(name="engagementRate"),
-            Metric(name="userEngagementDuration"),
-            Metric(name="eventCount"),
-            Metric(name="bounceRate"),
-        ],
-        date_ranges=[DateRange(start_date="2025-01-01", end_date="2025-05-27")],
-    )
-
-    response = client.run_report(request)
-
-    data = []
-    for row in response.rows:
-        data.append(
-            {
-                "device_category": row.dimension_values[0].value,
-                "active_users": int(row.metric_values[0].value),
-                "engaged_sessions": int(row.metric_values[1].value),
-                "user_engagement_duration": float(row.metric_values[3].value),
-                "event_count": float(row.metric_values[4].value),
-                "bounce_rate": float(row.metric_values[5].value),
-            }
+    """
+    cache_key (ör. şirket id) başına tek bir BetaAnalyticsDataClient (gRPC kanalı) tutar.
+    Token değişirse (ör. credential_provider yenilediğinde) istemci yeniden oluşturulur.
+    """
+    fingerprint = (access_token, refresh_token, client_id)
+    with _clients_lock:
+        cached = _clients.get(cache_key)
+        if cached and cached[0] == fingerprint:
+            return cached[1]
+        creds = Credentials(
+            token=access_token,
+            refresh_token=refresh_token,
+            token_uri=token_uri,
+            client_id=client_id,
+            client_secret=client_secret,
         )
-
-    return data
-
-
-def run_country_report(
-    access_token,
-    refresh_token,
-    client_id,
-    client_secret,
-    property_id,
-    token_uri="https://oauth2.googleapis.com/token",
-):
-    # Kimlik bilgilerini oluştur
-    creds = Credentials(
-        token=access_token,
-        refresh_token=refresh_token,
-        token_uri=token_uri,
-        client_id=client_id,
-        client_secret=client_secret,
-    )
-
-    client = BetaAnalyticsDataClient(credentials=creds)
-
-    request = RunReportRequest(
-        property=f"properties/{property_id}",
-        dimensions=[Dimension(name="country")],
-        metrics=[
-            Metric(name="activeUsers"),
-            Metric(name="newUsers"),
-            Metric(name="sessions"),
-            Metric(name="userEngagementDuration"),
-            Metric(name="eventCount"),
-            Metric(name="engagementRate"),
-            Metric(name="conversions"),
-            Metric(name="bounceRate"),
-        ],
-        date_ranges=[DateRange(start_date="2025-01-01", end_date="2025-05-27")],
-    )
-
-    response = client.run_report(request)
-
-    data = []
-    for row in response.rows:
-        data.append(
-            {
-                "country": row.dimension_values[0].value,
-                "active_users": int(row.metric_values[0].value),
-                "new_users": int(row.metric_values[1].value),
-                "sessions": int(row.metric_values[2].value),
-                "user_engagement_duration": float(row.metric_values[3].value),
-                "event_count": float(row.metric_values[4].value),
-                "engagement_rate": float(row.metric_values[5].value),
-                "conversions": float(row.metric_values[6].value),
-                "bounce_rate": float(row.metric_values[7].value),
-            }
+        client = BetaAnalyticsDataClient(credentials=creds)
+        _clients[cache_key] = (fingerprint, client)
+        return client
+
+
+class GA4ReportEngine:
+    """
+    Bir property için rapor tanımlarını batchRunReports çağrılarına (5'erli) gruplar.
+    Aynı yenileme içinde tekrar eden rapor tipleri ve birebir aynı istekler tek
+    kez çalıştırılır.
+    """
+
+    def __init__(self, client, property_id):
+        self.client = client
+        self.property_id = property_id
+
+    @classmethod
+    def for_company(cls, company_profile, property_id, client_id, client_secret):
+        """
+        Şirketin token'ları credential_provider'dan alınır: süresi dolmak üzere olan
+        token bir kez yenilenip kaydedilir, istemci yenilenen token'la kurulur.
+        """
+        credentials = credential_provider.get(company_profile.id, "ga4")
+        if credentials is None:
+            raise ValueError("GA4 bağlantısı yok.")
+        client = get_ga4_client(
+            company_profile.id,
+            credentials.access_token,
+            credentials.refresh_token,
+            client_id,
+            client_secret,
         )
-
-    return data
-
-
-def run_city_report(
-    access_token,
-    refresh_token,
-    client_id,
-    client_secret,
-    property_id,
-    token_uri="https://oauth2.googleapis.com/token",
-):
-    # Kimlik bilgilerini oluştur
-    creds = Credentials(
-        token=access_token,
-        refresh_token=refresh_token,
-        token_uri=token_uri,
-        client_id=client_id,
-        client_secret=client_secret,
-    )
-
-    client = BetaAnalyticsDataClient(credentials=creds)
-
-    request = RunReportRequest(
-        property=f"properties/{property_id}",
-        dimensions=[Dimension(name="city")],
-        metrics=[
-            Metric(name="activeUsers"),
-            Metric(name="sessions"),
-            Metric(name="userEngagementDuration"),
-            Metric(name="eventCount"),
-            Metric(name="conversions"),
-        ],
-        date_ranges=[DateRange(start_date="2025-01-01", end_date="2025-05-27")],
-    )
-
-    response = client.run_report(request)
-
-    data = []
-    for row in response.rows:
-        data.append(
-            {
-                "city": row.dimension_values[0].value,
-                "active_users": int(row.metric_values[0].value),
-                "sessions": int(row.metric_values[1].value),
-                "user_engagement_duration": float(row.metric_values[2].value),
-                "event_count": float(row.metric_values[3].value),
-                "conversions": float(row.metric_values[4].value),
-            }
+        return cls(client, property_id)
+
+    @staticmethod
+    def build_request(report_type, start_date=DEFAULT_START_DATE, end_date=DEFAULT_END_DATE, daily=False):
+        spec = GA4_REPORTS[report_type]
+        dimensions = [Dimension(name=spec.dimension)]
+        if daily:
+            dimensions.append(Dimension(name="date"))
+        request = RunReportRequest(
+            dimensions=dimensions,
+            metrics=[Metric(name=name) for name in spec.metrics],
+            date_ranges=[DateRange(start_date=start_date, end_date=end_date)],
         )
-
-    return data
+        if daily:
+            request.limit = GA4_DAILY_ROW_LIMIT
+        return request
+
+    def run(self, report_types, start_date=DEFAULT_START_DATE, end_date=DEFAULT_END_DATE, daily=False):
+        """
+        Rapor tiplerini çalıştırır: {report_type: [satır dict, ...]}
+        daily=True ise satırlar boyut + gün kırılımındadır ve 'date' (YYYYMMDD) içerir.
+        """
+        for report_type in report_types:
+            if report_type not in GA4_REPORTS:
+                raise ValueError(f"Unsupported GA4 report type: {report_type}")
+
+        # Aynı isteği üreten rapor tiplerini tek isteğe indir
+        unique_requests = {}
+        types_by_request = {}
+        for report_type in dict.fromkeys(report_types):
+            request = self.build_request(report_type, start_date, end_date, daily)
+            key = RunReportRequest.serialize(request)
+            unique_requests.setdefault(key, request)
+            types_by_request.setdefault(key, []).append(report_type)
+
+        keys = list(unique_requests)
+        results = {}
+        for start in range(0, len(keys), GA4_BATCH_LIMIT):
+            chunk = keys[start:start + GA4_BATCH_LIMIT]
+            response = self.client.batch_run_reports(
+                BatchRunReportsRequest(
+                    property=f"properties/{self.property_id}",
+                    requests=[unique_requests[key] for key in chunk],
+                )
+            )
+            for key, report in zip(chunk, response.reports):
+                for report_type in types_by_request[key]:
+                    results[report_type] = decode_report_rows(
+                        report, GA4_REPORTS[report_type], daily=daily
+                    )
+
+        return results
 
 
-def run_age_report(
-    access_token,
-    refresh_token,
-    client_id,
-    client_secret,
-    property_id,
-    token_uri="https://oauth2.googleapis.com/token",
+def get_ga4_report(
+    report_type, access_token, refresh_token, client_id, client_secret, property_id
 ):
-    # Kimlik bilgilerini oluştur
-    creds = Credentials(
-        token=access_token,
-        refresh_token=refresh_token,
-        token_uri=token_uri,
-        client_id=client_id,
-        client_secret=client_secret,
-    )
+    """Tek bir GA4 raporunu çeker (şirket yerine property bazında önbelleğe alınan istemciyle)."""
+    if report_type not in GA4_REPORTS:
+        raise ValueError(f"Unsupported GA4 report type: {report_type}")
 
-    client = BetaAnalyticsDataClient(credentials=creds)
-
-    request = RunReportRequest(
-        property=f"properties/{property_id}",
-        dimensions=[Dimension(name="userAgeBracket")],
-        metrics=[
-            Metric(name="activeUsers"),
-            Metric(name="sessions"),
-            Metric(name="userEngagementDuration"),
-            Metric(name="eventCount"),
-            Metric(name="conversions"),
-        ],
-        date_ranges=[DateRange(start_date="2025-01-01", end_date="2025-05-27")],
+    client = get_ga4_client(
+        property_id, access_token, refresh_token, client_id, client_secret
     )
-
-    response = client.run_report(request)
-
-    data = []
-    for row in response.rows:
-        data.append(
-            {
-                "age": row.dimension_values[0].value,
-                "active_users": int(row.metric_values[0].value),
-                "sessions": int(row.metric_values[1].value),
-                "user_engagement_duration": float(row.metric_values[2].value),
-                "event_count": float(row.metric_values[3].value),
-                "conversions": float(row.metric_values[4].value),
-            }
-        )
-
-    return data
+    return GA4ReportEngine(client, property_id).run([report_type])[report_type]
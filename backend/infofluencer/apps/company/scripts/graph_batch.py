@@ -0,0 +1,83 @@
+"""
+Graph API toplu istek (batch) katmanı.
+Metrik başına ayrı HTTP isteği yerine alt istekleri tek bir `batch=` POST'unda
+(en fazla 50 alt istek) gönderir ve yanıtları istek sırasıyla geri dağıtır.
+"""
+
+import json
+from urllib.parse import urlencode
+
+from apps.company.scripts.graph_client import GRAPH_API_VERSION, graph_base_url, graph_post
+
+GRAPH_BATCH_LIMIT = 50
+
+
+def _relative_url(path, params):
+    url = f"{GRAPH_API_VERSION}/{path.lstrip('/')}"
+    if params:
+        url = f"{url}?{urlencode(params)}"
+    return url
+
+
+def _decode_item(item):
+    """Tek bir batch yanıt öğesini (status_code, body) çiftine çevirir."""
+    if not item:
+        # Meta zaman aşımına uğrayan alt istekler için null döner
+        return None, None
+    code = item.get("code")
+    try:
+        body = json.loads(item.get("body") or "null")
+    except ValueError:
+        body = None
+    return code, body
+
+
+def graph_batch_get(sub_requests, access_token, timeout=30):
+    """
+    GET alt isteklerini batch olarak gönderir.
+
+    sub_requests: [(path, params), ...] - path, sürüm öneki olmadan ('123/insights')
+    Dönüş: her alt istek için aynı sırada (status_code, body) listesi.
+    Başarısız alt istekler (status_code, hata gövdesi), işlenmeyenler (None, None) döner.
+    """
+    results = []
+    for start in range(0, len(sub_requests), GRAPH_BATCH_LIMIT):
+        chunk = sub_requests[start:start + GRAPH_BATCH_LIMIT]
+        batch = [
+            {"method": "GET", "relative_url": _relative_url(path, params)}
+            for path, params in chunk
+        ]
+        try:
+            resp = graph_post(
+                f"{graph_base_url()}/",
+                data={
+                    "access_token": access_token,
+                    "include_headers": "false",
+                    "batch": json.dumps(batch),
+                },
+                timeout=timeout,
+                # Meta her alt isteği kotadan ayrı bir çağrı olarak düşer
+                cost=len(chunk),
+                # Alt isteklerin hepsi GET; batch'i tekrar göndermek güvenli
+                retry=True,
+            )
+        except Exception as e:
+            print(f"Graph batch exception: {e}")
+            results.extend([(None, None)] * len(chunk))
+            continue
+
+        if resp.status_code != 200:
+            print(f"❌ Graph batch hatası: {resp.status_code}")
+            try:
+                error_body = resp.json()
+            except ValueError:
+                error_body = None
+            results.extend([(resp.status_code, error_body)] * len(chunk))
+            continue
+
+        items = resp.json()
+        for index in range(len(chunk)):
+            item = items[index] if index < len(items) else None
+            results.append(_decode_item(item))
+
+    return results
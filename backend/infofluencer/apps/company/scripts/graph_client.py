@@ -0,0 +1,178 @@
+"""
+Meta Graph API için ortak HTTP istemcisi.
+Tüm Graph çağrıları bağlantı havuzlu, keep-alive açık tek bir `requests.Session`
+üzerinden gider; yeniden deneme/backoff politikası ve varsayılan zaman aşımı
+settings üzerinden ayarlanır. Açılan ve yeniden kullanılan bağlantı sayıları
+get_graph_connection_stats() ile okunabilir. Her çağrı graph_rate yöneticisinden
+geçer; güncel kota kullanımı get_graph_rate_metrics() ile okunabilir.
+5xx yeniden denemesi yalnızca tekrarlanması güvenli çağrılarda yapılır: GET'ler ve
+salt okunur batch POST'u. Tek kullanımlık OAuth kodu gibi token değişimleri
+retry=False ile yeniden denemesiz oturumdan gider.
+"""
+
+import threading
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.util.retry import Retry
+
+from apps.company.scripts import graph_rate
+
+GRAPH_API_VERSION = "v22.0"
+
+_stats_lock = threading.Lock()
+_stats = {"requests": 0, "connections_opened": 0}
+
+_sessions = {}
+_session_lock = threading.Lock()
+
+
+def _increment(counter):
+    with _stats_lock:
+        _stats[counter] += 1
+
+
+class _CountingHTTPConnection(HTTPConnection):
+    def connect(self):
+        _increment("connections_opened")
+        super().connect()
+
+
+class _CountingHTTPSConnection(HTTPSConnection):
+    def connect(self):
+        _increment("connections_opened")
+        super().connect()
+
+
+class _CountingHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = _CountingHTTPConnection
+
+    def _make_request(self, *args, **kwargs):
+        _increment("requests")
+        return super()._make_request(*args, **kwargs)
+
+
+class _CountingHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = _CountingHTTPSConnection
+
+    def _make_request(self, *args, **kwargs):
+        _increment("requests")
+        return super()._make_request(*args, **kwargs)
+
+
+class GraphHTTPAdapter(HTTPAdapter):
+    """Gerçek TCP bağlantı açılışlarını ve her HTTP denemesini sayan adapter."""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": _CountingHTTPConnectionPool,
+            "https": _CountingHTTPSConnectionPool,
+        }
+
+
+def graph_base_url():
+    """Graph API kök adresi (testlerde sahte sunucuya yönlendirilebilir)."""
+    return getattr(settings, "GRAPH_API_BASE_URL", "https://graph.facebook.com").rstrip("/")
+
+
+def graph_url(path, version=GRAPH_API_VERSION):
+    """'123/insights' gibi bir yolu tam Graph API adresine çevirir."""
+    return f"{graph_base_url()}/{version}/{path.lstrip('/')}"
+
+
+def _build_session(retry_enabled=True):
+    retry = Retry(
+        total=getattr(settings, "GRAPH_API_MAX_RETRIES", 2) if retry_enabled else 0,
+        backoff_factor=getattr(settings, "GRAPH_API_BACKOFF_FACTOR", 0.5),
+        status_forcelist=(500, 502, 503, 504),
+        allowed_methods=frozenset(["GET", "POST"]),
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    pool_size = getattr(settings, "GRAPH_API_POOL_SIZE", 20)
+    adapter = GraphHTTPAdapter(
+        pool_connections=getattr(settings, "GRAPH_API_POOL_HOSTS", 4),
+        pool_maxsize=pool_size,
+        max_retries=retry,
+        pool_block=False,
+    )
+    session = requests.Session()
+    session.headers.update({"Connection": "keep-alive"})
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def get_graph_session(retry=True):
+    """Süreç genelinde paylaşılan, havuzlu Graph oturumunu döner (retry=False: yeniden denemesiz)."""
+    session = _sessions.get(retry)
+    if session is None:
+        with _session_lock:
+            session = _sessions.get(retry)
+            if session is None:
+                session = _sessions[retry] = _build_session(retry)
+    return session
+
+
+def reset_graph_session():
+    """Oturumları kapatır; bir sonraki çağrıda güncel ayarlarla yeniden kurulur."""
+    with _session_lock:
+        for session in _sessions.values():
+            session.close()
+        _sessions.clear()
+
+
+def _timeout(timeout):
+    if timeout is not None:
+        return timeout
+    return getattr(settings, "GRAPH_API_TIMEOUT", 15)
+
+
+def _governed(method, url, access_token, cost, retry, **kwargs):
+    key = graph_rate.account_key(access_token)
+    graph_rate.governor.acquire(key, cost)
+    resp = getattr(get_graph_session(retry), method)(url, **kwargs)
+    graph_rate.governor.observe(resp.headers, key)
+    return resp
+
+
+def graph_get(url, params=None, timeout=None, retry=True):
+    """Havuzlu oturumla GET isteği. retry=False: tek kullanımlık kod/token değişimleri için."""
+    access_token = (params or {}).get("access_token")
+    return _governed("get", url, access_token, 1, retry, params=params, timeout=_timeout(timeout))
+
+
+def graph_post(url, data=None, timeout=None, cost=1, retry=False):
+    """
+    Havuzlu oturumla POST isteği. cost: kotadan düşülecek çağrı sayısı (batch'te alt istek sayısı).
+    POST varsayılan olarak yeniden denenmez; yalnızca tekrarı güvenli çağrılar retry=True verir.
+    """
+    access_token = (data or {}).get("access_token")
+    return _governed("post", url, access_token, cost, retry, data=data, timeout=_timeout(timeout))
+
+
+def get_graph_connection_stats():
+    """Toplam HTTP denemesi, açılan ve yeniden kullanılan bağlantı sayıları."""
+    with _stats_lock:
+        requests_made = _stats["requests"]
+        opened = _stats["connections_opened"]
+    return {
+        "requests": requests_made,
+        "connections_opened": opened,
+        "connections_reused": max(requests_made - opened, 0),
+    }
+
+
+def reset_graph_connection_stats():
+    with _stats_lock:
+        for key in _stats:
+            _stats[key] = 0
+
+
+def get_graph_rate_metrics():
+    """Uygulama/hesap bazında kota kullanımı ve hız sınırı nedeniyle bekletilen çağrılar."""
+    return graph_rate.governor.metrics()
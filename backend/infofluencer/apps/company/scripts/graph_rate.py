@@ -0,0 +1,272 @@
+"""
+Graph API hız sınırı yöneticisi.
+Meta her yanıtta kullanım yüzdelerini döner: uygulama geneli için X-App-Usage,
+hesap (business use case) bazında X-Business-Use-Case-Usage. Bu başlıklardan
+uygulama ve hesap (access token) başına birer token bucket tutulur:
+- Bir yüzde artışına kaç çağrı düştüğü gözlenerek saatlik kapasite tahmin edilir.
+- Bucket'ta GRAPH_RATE_TARGET_PERCENT'e kadar kalan çağrı sayısı bulunur ve
+  kayan bir saatlik pencere varsayımıyla kapasite/3600 hızında dolar.
+- Çağrılar bucket boşsa dolana kadar bekletilir. Meta erişimi kestiyse
+  (%100 ya da estimated_time_to_regain_access) süre bitene kadar bekletilir.
+- Son okunan kullanım yüzdesi, yeni başlık gelmedikçe saatlik pencereye göre
+  (saniyede 100/3600 puan) azaltılır; çağrılar bekletilip yanıt gelmediğinde
+  eski bir okuma sonsuza kadar geçerli kalmaz.
+Kapasite henüz bilinmiyorsa çağrılar sınırlanmaz. Kapasite bilinmeden hedefin
+aşıldığı görüldüyse her çağrı bir kez GRAPH_RATE_BACKOFF_SECONDS bekleyip gönderilir.
+Web istekleri en fazla GRAPH_RATE_REQUEST_MAX_WAIT_SECONDS bekler; daha uzun bekleme
+gerekiyorsa çağrı gönderilmeden GraphRateLimited fırlatılır. Uzun beklemeler
+(GRAPH_RATE_MAX_WAIT_SECONDS) yalnızca use_worker_waits() çağıran arka plan
+süreçlerinde (management komutları) uygulanır.
+"""
+
+import hashlib
+import json
+import threading
+import time
+
+from django.conf import settings
+
+APP_USAGE_HEADER = "X-App-Usage"
+BUSINESS_USAGE_HEADER = "X-Business-Use-Case-Usage"
+
+_USAGE_FIELDS = ("call_count", "total_cputime", "total_time")
+
+# Yeni kapasite örneğinin tahmine ağırlığı
+_CAPACITY_SMOOTHING = 0.3
+
+# Meta kullanımı kayan bir saatlik pencerede ölçer; yüzde en geç bu sürede sıfırlanır
+_USAGE_WINDOW_SECONDS = 3600
+
+
+# Arka plan süreçlerinde True: çağrılar kota için uzun süre bekletilir
+_worker_waits = False
+
+
+class GraphRateLimited(Exception):
+    """Kota beklemesi web isteğinin bekleme sınırını aşıyor; çağrı gönderilmedi, tekrar denenebilir."""
+
+    def __init__(self, retry_after):
+        self.retry_after = retry_after
+        super().__init__(f"Graph API hız sınırı: {retry_after:.0f} sn sonra tekrar deneyin.")
+
+
+def use_worker_waits(enabled=True):
+    """Süreçteki tüm Graph çağrıları için uzun (worker) beklemeleri açar/kapatır."""
+    global _worker_waits
+    _worker_waits = enabled
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def _usage_percent(usage):
+    return max(float(usage.get(field) or 0) for field in _USAGE_FIELDS)
+
+
+def parse_app_usage(headers):
+    """X-App-Usage başlığından kullanım yüzdesi; başlık yoksa None."""
+    raw = headers.get(APP_USAGE_HEADER)
+    if not raw:
+        return None
+    try:
+        return _usage_percent(json.loads(raw))
+    except (ValueError, TypeError, AttributeError):
+        return None
+
+
+def parse_business_usage(headers):
+    """
+    X-Business-Use-Case-Usage başlığından (en yüksek kullanım yüzdesi, erişimin
+    geri geleceği saniye); başlık yoksa None.
+    """
+    raw = headers.get(BUSINESS_USAGE_HEADER)
+    if not raw:
+        return None
+    try:
+        entries = [entry for values in json.loads(raw).values() for entry in values]
+    except (ValueError, TypeError, AttributeError):
+        return None
+    if not entries:
+        return None
+    percent = max(_usage_percent(entry) for entry in entries)
+    regain_minutes = max(float(entry.get("estimated_time_to_regain_access") or 0) for entry in entries)
+    return percent, regain_minutes * 60
+
+
+def account_key(access_token):
+    """Hesap bucket'ı anahtarı; token'ın kendisi bellekte/metriklerde tutulmaz."""
+    if not access_token:
+        return None
+    return hashlib.sha256(access_token.encode("utf-8")).hexdigest()[:16]
+
+
+class UsageBucket:
+    """Tek bir kullanım kotası (uygulama ya da hesap) için token bucket."""
+
+    def __init__(self):
+        self.percent = None
+        self.capacity = None  # %100'e karşılık gelen tahmini saatlik çağrı sayısı
+        self.tokens = None
+        self.blocked_until = 0.0
+        self.updated = time.monotonic()
+        self._sampled_percent = None
+        self._calls_since_sample = 0
+
+    def _target(self):
+        return _setting("GRAPH_RATE_TARGET_PERCENT", 90)
+
+    def refill(self, now):
+        elapsed = now - self.updated
+        if self.tokens is not None and self.capacity:
+            limit = self.capacity * self._target() / 100
+            self.tokens = min(limit, self.tokens + self.capacity / 3600 * elapsed)
+        if self.percent is not None:
+            self.percent = max(self.percent - 100 * elapsed / _USAGE_WINDOW_SECONDS, 0.0)
+        self.updated = now
+
+    def observe(self, percent, regain_seconds, now):
+        self.refill(now)
+        if (
+            self._sampled_percent is not None
+            and percent > self._sampled_percent
+            and self._calls_since_sample
+        ):
+            sample = self._calls_since_sample * 100 / (percent - self._sampled_percent)
+            if self.capacity is None:
+                self.capacity = sample
+            else:
+                self.capacity += _CAPACITY_SMOOTHING * (sample - self.capacity)
+        self._sampled_percent = percent
+        self._calls_since_sample = 0
+        self.percent = percent
+        if self.capacity:
+            self.tokens = self.capacity * (self._target() - percent) / 100
+        if percent >= 100 or regain_seconds:
+            cooldown = regain_seconds or _setting("GRAPH_RATE_BACKOFF_SECONDS", 5)
+            self.blocked_until = max(self.blocked_until, now + cooldown)
+
+    def wait_time(self, cost, now, waited=0.0):
+        """
+        Çağrının gönderilebilmesi için beklenmesi gereken saniye. Kapasite bilinmiyorsa
+        hedef aşımı çağrı başına tek bir GRAPH_RATE_BACKOFF_SECONDS bekletir; waited
+        bu çağrının şimdiye kadar beklediği süredir.
+        """
+        if now < self.blocked_until:
+            return self.blocked_until - now
+        if self.percent is None or self.percent < self._target():
+            if self.tokens is None or self.tokens >= cost:
+                return 0.0
+        if not self.capacity:
+            return max(_setting("GRAPH_RATE_BACKOFF_SECONDS", 5) - waited, 0.0)
+        # Bucket'ın alabileceğinden büyük batch'ler dolu bucket'ı bekler
+        cost = min(cost, self.capacity * self._target() / 100)
+        return max((cost - (self.tokens or 0)) / (self.capacity / 3600), 0.0)
+
+    def consume(self, cost):
+        if self.tokens is not None:
+            self.tokens -= cost
+        self._calls_since_sample += cost
+
+    def snapshot(self):
+        return {
+            "usage_percent": round(self.percent, 1) if self.percent is not None else None,
+            "estimated_hourly_capacity": round(self.capacity) if self.capacity else None,
+            "available_calls": round(self.tokens, 1) if self.tokens is not None else None,
+            "blocked_for_seconds": round(max(self.blocked_until - time.monotonic(), 0.0), 1),
+        }
+
+
+class GraphRateGovernor:
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._app = UsageBucket()
+        self._accounts = {}
+        self._stats = {
+            "calls": 0,
+            "throttled_calls": 0,
+            "throttled_seconds": 0.0,
+            "rejected_calls": 0,
+        }
+
+    def _account(self, key):
+        bucket = self._accounts.get(key)
+        if bucket is None:
+            bucket = self._accounts[key] = UsageBucket()
+        return bucket
+
+    def acquire(self, key=None, cost=1):
+        """
+        Uygulama ve hesap bucket'larında yer açılana kadar bekler, çağrıyı düşer.
+        Worker süreçlerinde GRAPH_RATE_MAX_WAIT_SECONDS'ten uzun beklenmez; süre dolarsa
+        çağrı yine de yapılır. Web isteklerinde gereken bekleme
+        GRAPH_RATE_REQUEST_MAX_WAIT_SECONDS'i aşıyorsa GraphRateLimited fırlatılır.
+        Dönüş: beklenen saniye.
+        """
+        if not _setting("GRAPH_RATE_GOVERNOR_ENABLED", True):
+            return 0.0
+        fail_fast = not _worker_waits
+        started = time.monotonic()
+        if fail_fast:
+            deadline = started + _setting("GRAPH_RATE_REQUEST_MAX_WAIT_SECONDS", 2)
+        else:
+            deadline = started + _setting("GRAPH_RATE_MAX_WAIT_SECONDS", 300)
+        waited = 0.0
+        with self._condition:
+            buckets = [self._app] + ([self._account(key)] if key else [])
+            while True:
+                now = time.monotonic()
+                for bucket in buckets:
+                    bucket.refill(now)
+                wait = max(bucket.wait_time(cost, now, now - started) for bucket in buckets)
+                if wait <= 0:
+                    break
+                if fail_fast and now + wait > deadline:
+                    self._stats["rejected_calls"] += 1
+                    raise GraphRateLimited(wait)
+                if now >= deadline:
+                    break
+                # Yeni bir yanıt başlıkları güncellerse bekleyenler uyandırılır
+                self._condition.wait(min(wait, deadline - now))
+                waited = time.monotonic() - started
+            for bucket in buckets:
+                bucket.consume(cost)
+            self._stats["calls"] += 1
+            if waited:
+                self._stats["throttled_calls"] += 1
+                self._stats["throttled_seconds"] += waited
+        return waited
+
+    def observe(self, headers, key=None):
+        """Yanıt başlıklarındaki kullanım yüzdelerini bucket'lara işler."""
+        app_percent = parse_app_usage(headers)
+        business = parse_business_usage(headers) if key else None
+        if app_percent is None and business is None:
+            return
+        with self._condition:
+            now = time.monotonic()
+            if app_percent is not None:
+                self._app.observe(app_percent, 0, now)
+            if business is not None:
+                self._account(key).observe(business[0], business[1], now)
+            self._condition.notify_all()
+
+    def metrics(self):
+        """Uygulama ve hesap bazında güncel kullanım ile bekletilen çağrı sayaçları."""
+        with self._condition:
+            return {
+                "app": self._app.snapshot(),
+                "accounts": {key: bucket.snapshot() for key, bucket in self._accounts.items()},
+                "calls": self._stats["calls"],
+                "throttled_calls": self._stats["throttled_calls"],
+                "throttled_seconds": round(self._stats["throttled_seconds"], 2),
+                "rejected_calls": self._stats["rejected_calls"],
+            }
+
+
+governor = GraphRateGovernor()
+
+
+def reset_graph_rate_governor():
+    global governor
+    governor = GraphRateGovernor()
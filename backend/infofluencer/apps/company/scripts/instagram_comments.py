@@ -0,0 +1,134 @@
+"""
+Instagram medya yorumlarının sayfalı aktarımı.
+Yorumlar after imleciyle sayfa sayfa çekilir (medya başına en fazla
+INSTAGRAM_COMMENT_MAX_PAGES sayfa). Her sayfa InstagramComment'e yazılır,
+özet istatistiklere ve metin analizine (bkz. comment_analytics) işlenir;
+bellekte tüm yorumlar tutulmaz. En çok beğenilen yorumlar heap ile seçilir.
+Medyanın comments_analysis JSON'ı sabit boyutta kalır: sayaçlar, ilk
+INSTAGRAM_COMMENT_TEXT_SAMPLE metin, en beğenilen TOP_COMMENTS yorum ve
+text_analytics özeti. comment_texts yalnızca bir örnektir; metinli yorumların
+toplamı text_count'ta, örneğin kesilip kesilmediği comment_texts_truncated'da
+döner.
+"""
+
+import heapq
+
+from django.conf import settings
+
+from apps.company.scripts.comment_analytics import CommentAnalyzer
+from apps.company.scripts.data_savers import InstagramDataSaver
+from apps.company.scripts.graph_client import graph_get, graph_url
+
+# replies: yorumun Graph'ın döndüğü ilk yanıt sayfası (replies_count için)
+COMMENT_FIELDS = "id,text,username,timestamp,like_count,replies"
+
+TOP_COMMENTS = 5
+
+# Medya başına text_analytics'te tutulan terim/hashtag/emoji sayısı
+TEXT_ANALYTICS_LIMIT = 10
+
+
+def _compact(comment):
+    return {
+        'text': (comment.get('text') or '').strip(),
+        'username': comment.get('username', ''),
+        'timestamp': comment.get('timestamp', ''),
+        'like_count': comment.get('like_count') or 0,
+    }
+
+
+class CommentStats:
+    """Yorumları tek geçişte özetler; bellek kullanımı yorum sayısından bağımsızdır."""
+
+    def __init__(self, text_sample=None, top_k=TOP_COMMENTS):
+        self.text_sample = (
+            text_sample if text_sample is not None
+            else getattr(settings, 'INSTAGRAM_COMMENT_TEXT_SAMPLE', 20)
+        )
+        self.top_k = top_k
+        self.total = 0
+        self.text_count = 0
+        self.total_length = 0
+        self.with_likes = 0
+        self.replies = 0
+        self.texts = []
+        self._top = []  # (like_count, -sıra, yorum) min-heap; eşitlikte önce gelen kalır
+
+    def add(self, comment):
+        text = (comment.get('text') or '').strip()
+        likes = comment.get('like_count') or 0
+        self.total += 1
+        self.total_length += len(comment.get('text') or '')
+        if likes > 0:
+            self.with_likes += 1
+        self.replies += len((comment.get('replies') or {}).get('data') or [])
+        if text:
+            self.text_count += 1
+            if len(self.texts) < self.text_sample:
+                self.texts.append(_compact(comment))
+        entry = (likes, -self.total, comment)
+        if len(self._top) < self.top_k:
+            heapq.heappush(self._top, entry)
+        elif entry[:2] > self._top[0][:2]:
+            heapq.heapreplace(self._top, entry)
+
+    def result(self):
+        return {
+            'total_comments': self.total,
+            'total_text_comments': self.text_count,
+            'average_length': self.total_length / self.total if self.total else 0,
+            'comments_with_likes': self.with_likes,
+            'replies_count': self.replies,
+            'top_comments': [
+                _compact(comment)
+                for _, _, comment in sorted(self._top, key=lambda entry: entry[:2], reverse=True)
+            ],
+            # comment_texts ilk text_sample metinli yorumdur, tamamı değil
+            'comment_texts': self.texts,
+            'text_count': self.text_count,
+            'comment_texts_sample_size': self.text_sample,
+            'comment_texts_truncated': self.text_count > len(self.texts),
+        }
+
+
+def iter_comment_pages(media_id, page_token, page_size=100, max_pages=None):
+    """Yorum sayfalarını sırayla üretir; hata olursa RuntimeError fırlatır."""
+    if max_pages is None:
+        max_pages = getattr(settings, 'INSTAGRAM_COMMENT_MAX_PAGES', 50)
+    params = {'fields': COMMENT_FIELDS, 'limit': page_size, 'access_token': page_token}
+    for _ in range(max_pages):
+        resp = graph_get(graph_url(f'{media_id}/comments'), params=params, timeout=10)
+        if resp.status_code != 200:
+            raise RuntimeError(f"Yorumlar hatası: {resp.status_code}")
+        body = resp.json()
+        yield body.get('data', [])
+        paging = body.get('paging') or {}
+        after = (paging.get('cursors') or {}).get('after')
+        if not paging.get('next') or not after:
+            return
+        params = dict(params, after=after)
+
+
+def ingest_comments(media_id, page_token):
+    """
+    Medyanın tüm yorumlarını sayfa sayfa tabloya yazar ve özetini döner.
+    İlk sayfa alınamazsa None; sonraki bir sayfada hata olursa o ana kadarki özet döner.
+    """
+    stats = CommentStats()
+    analyzer = CommentAnalyzer()
+    pages = 0
+    try:
+        for comments in iter_comment_pages(media_id, page_token):
+            pages += 1
+            InstagramDataSaver.save_comments(media_id, comments)
+            for comment in comments:
+                stats.add(comment)
+            analyzer.add_texts([comment.get('text') for comment in comments])
+    except Exception as e:
+        print(f"❌ {media_id} yorumları: {e}")
+        if not pages:
+            return None
+    print(f"✅ {stats.total} yorum analiz edildi ({pages} sayfa), {stats.text_count} metin")
+    result = stats.result()
+    result['text_analytics'] = analyzer.summary(TEXT_ANALYTICS_LIMIT)
+    return result
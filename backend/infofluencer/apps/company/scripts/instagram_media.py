@@ -0,0 +1,199 @@
+"""
+Instagram medyalarını artımlı aktaran modül.
+Hesap başına bir kontrol noktası (en yeni medyanın zamanı ve id'si) tutulur; her
+yenilemede yalnızca bu noktadan yeni medyalar ile insights'ı hâlâ değişen yakın
+tarihli medyalar (INSTAGRAM_MEDIA_RESCAN_DAYS) çekilir. Eski geçmiş, paging
+imleciyle kaldığı yerden devam eden bir backfill ile bir kez aktarılır.
+"""
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from apps.company.helpers import stored_number
+from apps.company.models import InstagramMedia, InstagramMediaCursor
+from apps.company.scripts.data_savers import InstagramDataSaver
+from apps.company.scripts.graph_client import graph_get, graph_url
+
+MEDIA_FIELDS = 'id,caption,media_type,media_url,permalink,thumbnail_url,timestamp,children,like_count,comments_count'
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def fetch_media_page(ig_id, page_token, after=None, limit=None):
+    """
+    Medya listesinin bir sayfası (en yeniden eskiye).
+    Dönüş: (medyalar, sonraki sayfanın after imleci, sonraki sayfa var mı); hata olursa (None, None, False)
+    """
+    params = {
+        'fields': MEDIA_FIELDS,
+        'limit': limit or _setting('INSTAGRAM_MEDIA_PAGE_SIZE', 50),
+        'access_token': page_token,
+    }
+    if after:
+        params['after'] = after
+    resp = graph_get(graph_url(f'{ig_id}/media'), params=params, timeout=15)
+    if resp.status_code != 200:
+        print(f"❌ Medya listesi hatası: {resp.status_code}")
+        return None, None, False
+    body = resp.json()
+    paging = body.get('paging') or {}
+    next_after = (paging.get('cursors') or {}).get('after')
+    return body.get('data', []), next_after, bool(paging.get('next') and next_after)
+
+
+def _enrich(medias, ig_id, page_token):
+    """Medyalara insights (tek batch) ve yorum analizini ekler."""
+    from apps.company.scripts.instagram_reports import get_media_comments, get_media_insights_batch
+
+    if not medias:
+        return
+    insights_by_media = get_media_insights_batch(medias, page_token, ig_id)
+    for media in medias:
+        media_insights = insights_by_media.get(media['id'])
+        if media_insights:
+            media['insights'] = media_insights
+        if media.get('comments_count', 0) > 0:
+            comments_data = get_media_comments(media['id'], page_token)
+            if comments_data:
+                media['comments_analysis'] = comments_data
+
+
+def _backfill(cursor, ig_id, page_token, max_pages, stats):
+    """Kaldığı after imlecinden en fazla max_pages sayfa eski medya aktarır."""
+    while not cursor.backfill_complete and cursor.backfill_after and max_pages > 0:
+        medias, next_after, has_next = fetch_media_page(ig_id, page_token, after=cursor.backfill_after)
+        if medias is None:
+            return
+        max_pages -= 1
+        stats['pages'] += 1
+        known = set(
+            InstagramMedia.objects.filter(media_id__in=[m['id'] for m in medias]).values_list(
+                'media_id', flat=True
+            )
+        )
+        missing = [media for media in medias if media['id'] not in known]
+        _enrich(missing, ig_id, page_token)
+        InstagramDataSaver.save_media(ig_id, missing)
+        stats['backfilled'] += len(missing)
+        # İlerleme her sayfada kaydedilir; kesilirse bir sonraki çalıştırma buradan sürer
+        cursor.backfill_after = next_after if has_next else ''
+        cursor.backfill_complete = not has_next
+        cursor.save(update_fields=['backfill_after', 'backfill_complete', 'updated_at'])
+
+
+def ingest_media(ig_id, page_token, rescan_days=None, backfill_pages=None):
+    """
+    Hesabın medyalarını artımlı aktarır.
+
+    1. Medya listesi en yeniden başlayarak sayfalanır; kontrol noktasından yeni ya da
+       yeniden tarama penceresindeki medyalar insights/yorumlarıyla güncellenir, ilk
+       eski medyada durulur.
+    2. Geçmiş henüz tamamlanmadıysa backfill kaldığı sayfadan en fazla backfill_pages
+       sayfa devam eder.
+
+    Sayfalama yarıda kesilirse kontrol noktası ilerletilmez; bir sonraki çalıştırma
+    aynı noktadan yeniden başlar.
+
+    Dönüş: {'new', 'rescanned', 'backfilled', 'pages'} sayaçları; medya listesi
+    alınamazsa None.
+    """
+    if rescan_days is None:
+        rescan_days = _setting('INSTAGRAM_MEDIA_RESCAN_DAYS', 7)
+    if backfill_pages is None:
+        backfill_pages = _setting('INSTAGRAM_MEDIA_BACKFILL_PAGES', 5)
+
+    cursor, _ = InstagramMediaCursor.objects.get_or_create(ig_account_id=ig_id)
+    high_water = cursor.last_media_timestamp
+    rescan_cutoff = timezone.now() - timedelta(days=rescan_days)
+    backfill_started = cursor.backfill_complete or bool(cursor.backfill_after)
+    stats = {'new': 0, 'rescanned': 0, 'backfilled': 0, 'pages': 0}
+    newest = (high_water, cursor.last_media_id)
+
+    after = None
+    # Kontrol noktası yalnızca sayfalama eski medyaya ya da listenin sonuna ulaştıysa
+    # ilerler; arada bir sayfa alınamazsa o sayfalardaki yeni medyalar kaybolmasın
+    reached_end = False
+    while True:
+        medias, next_after, has_next = fetch_media_page(ig_id, page_token, after=after)
+        if medias is None:
+            if stats['pages'] == 0:
+                return None
+            break
+        stats['pages'] += 1
+
+        fresh = []
+        older = []
+        for media in medias:
+            timestamp = parse_datetime(media.get('timestamp') or '')
+            if timestamp and (newest[0] is None or timestamp > newest[0]):
+                newest = (timestamp, media['id'])
+            if timestamp and high_water and timestamp > high_water:
+                fresh.append(media)
+                stats['new'] += 1
+            elif timestamp and timestamp >= rescan_cutoff:
+                fresh.append(media)
+                stats['new' if high_water is None else 'rescanned'] += 1
+            else:
+                older.append(media)
+
+        if older and not backfill_started:
+            # İlk çalıştırma: bu sayfanın geri kalanı backfill'in ilk adımıdır
+            stats['backfilled'] += len(older)
+            fresh.extend(older)
+        _enrich(fresh, ig_id, page_token)
+        InstagramDataSaver.save_media(ig_id, fresh)
+
+        if older or not has_next:
+            reached_end = True
+            if not backfill_started:
+                cursor.backfill_after = next_after if has_next else ''
+                cursor.backfill_complete = not has_next
+            break
+        after = next_after
+
+    if reached_end:
+        cursor.last_media_timestamp, cursor.last_media_id = newest[0], newest[1] or ''
+    else:
+        print(f"⚠️ {ig_id} medya listesi yarıda kesildi, kontrol noktası korunuyor")
+    cursor.last_run_at = timezone.now()
+    cursor.save()
+
+    _backfill(cursor, ig_id, page_token, backfill_pages, stats)
+    print(
+        f"✅ Medya aktarımı: {stats['new']} yeni, {stats['rescanned']} yeniden taranan, "
+        f"{stats['backfilled']} backfill ({stats['pages']} sayfa)"
+    )
+    return stats
+
+
+def media_payload(ig_id, limit=5):
+    """
+    Son medyaları InstagramReport.media_data biçiminde döner ({'data': [...]}).
+    Medyalar ve metrikleri iki indeksli sorguyla okunur; insights Graph yanıt
+    biçiminde ({metric: {'data': [{'name', 'period', 'values'}]}}) yeniden kurulur.
+    """
+    queryset = (
+        InstagramMedia.objects.filter(ig_account_id=ig_id)
+        .order_by('-timestamp')
+        .prefetch_related('metrics')[:limit]
+    )
+    medias = []
+    for media in queryset:
+        item = dict(media.data)
+        insights = {
+            metric.metric: {
+                'data': [{'name': metric.metric, 'period': 'lifetime', 'values': [{'value': stored_number(metric.value)}]}]
+            }
+            for metric in media.metrics.all()
+        }
+        if insights:
+            item['insights'] = insights
+        if media.comments_analysis:
+            item['comments_analysis'] = media.comments_analysis
+        medias.append(item)
+    return {'data': medias}
@@ -0,0 +1,292 @@
+"""
+Instagram hesap metrikleri (calculated_metrics) hesaplama motoru.
+Hesapların tüm medya geçmişi ve günlük insights satırları tablo başına tek
+sorguyla kolon bazlı NumPy dizilerine okunur; her satır bir hesap indeksi taşır.
+Etkileşim oranı, takipçi büyümesi, paylaşım sıklığı ile 7/30/90 günlük kayan
+pencerelerdeki ortalama, medyan ve yüzdelikler tüm hesaplar için birlikte,
+bincount ve sıralı grup indeksleriyle hesaplanır; hesap başına Python döngüsü yoktur.
+"""
+
+from datetime import date
+
+import numpy as np
+from django.utils import timezone
+
+from apps.company.models import (
+    InstagramAccountDailyMetric,
+    InstagramMedia,
+    InstagramMediaMetric,
+)
+from apps.company.scripts.data_savers import InstagramDataSaver
+
+WINDOWS = (("7d", 7), ("30d", 30), ("90d", 90))
+
+PERCENTILES = (25, 50, 75, 90)
+
+# Medya başına likes/comments dışındaki etkileşimler ve erişim
+MEDIA_METRICS = ("reach", "saved", "shares")
+
+# Hesap metrikleri: reach ve total_interactions son 28 günlük toplam (period='total'),
+# follower_count günlük yeni takipçi serisi (period='day')
+DAILY_METRICS = ("reach", "total_interactions", "follower_count")
+
+_DAY_SECONDS = 86400
+_EPOCH = date(1970, 1, 1)
+
+
+def _day_number(value):
+    return (value - _EPOCH).days
+
+
+class MetricsFrame:
+    """Bir ya da daha çok hesabın medya ve günlük metrik kolonları."""
+
+    def __init__(self, ig_ids):
+        self.ig_ids = list(ig_ids)
+        self.index = {ig_id: i for i, ig_id in enumerate(self.ig_ids)}
+        self.set_media([])
+        self.set_daily([])
+
+    def set_media(self, rows):
+        """rows: (hesap, epoch saniye, likes, comments, reach, saved, shares)"""
+        data = np.array(rows, dtype=np.float64).reshape(-1, 7)
+        self.media_account = data[:, 0].astype(np.int64)
+        self.media_time = data[:, 1]
+        self.likes, self.comments, self.reach, self.saved, self.shares = data[:, 2:].T
+
+    def set_daily(self, rows):
+        """rows: (hesap, metrik kodu, total mı, gün numarası, değer)"""
+        data = np.array(rows, dtype=np.float64).reshape(-1, 5)
+        self.daily_account = data[:, 0].astype(np.int64)
+        self.daily_metric = data[:, 1].astype(np.int64)
+        self.daily_total = data[:, 2].astype(bool)
+        self.daily_day = data[:, 3].astype(np.int64)
+        self.daily_value = data[:, 4]
+
+    @classmethod
+    def load(cls, ig_ids):
+        """Hesapların tüm medyası ve günlük metrikleri; tablo başına bir sorgu."""
+        frame = cls(ig_ids)
+        frame.load_media()
+        frame.load_daily()
+        return frame
+
+    def load_media(self):
+        medias = InstagramMedia.objects.filter(
+            ig_account_id__in=self.ig_ids, timestamp__isnull=False
+        ).values_list("id", "ig_account_id", "timestamp", "like_count", "comments_count")
+        positions = {}
+        rows = []
+        for pk, ig_id, timestamp, likes, comments in medias.iterator(chunk_size=10000):
+            positions[pk] = len(rows)
+            rows.append([self.index[ig_id], timestamp.timestamp(), likes, comments, np.nan, 0, 0])
+        metrics = InstagramMediaMetric.objects.filter(
+            media__ig_account_id__in=self.ig_ids, metric__in=MEDIA_METRICS
+        ).values_list("media_id", "metric", "value")
+        for media_pk, metric, value in metrics.iterator(chunk_size=10000):
+            position = positions.get(media_pk)
+            if position is not None:
+                rows[position][4 + MEDIA_METRICS.index(metric)] = value
+        self.set_media(rows)
+
+    def load_daily(self):
+        metrics = InstagramAccountDailyMetric.objects.filter(
+            ig_account_id__in=self.ig_ids, metric__in=DAILY_METRICS
+        ).values_list("ig_account_id", "metric", "period", "date", "value")
+        self.set_daily(
+            [
+                (
+                    self.index[ig_id],
+                    DAILY_METRICS.index(metric),
+                    period == InstagramAccountDailyMetric.PERIOD_TOTAL,
+                    _day_number(day),
+                    value,
+                )
+                for ig_id, metric, period, day, value in metrics.iterator(chunk_size=10000)
+            ]
+        )
+
+    def use_user_insights(self, ig_id, user_insights):
+        """Hesabın günlük metriklerini tablo yerine henüz kaydedilmemiş Graph yanıtından alır."""
+        account = self.index[ig_id]
+        rows = InstagramDataSaver.user_insight_rows(user_insights)
+        self.set_daily(
+            [
+                (
+                    account,
+                    DAILY_METRICS.index(metric),
+                    period == InstagramAccountDailyMetric.PERIOD_TOTAL,
+                    _day_number(day),
+                    value,
+                )
+                for (metric, period, day), value in rows.items()
+                if metric in DAILY_METRICS
+            ]
+        )
+
+
+def _group_percentiles(groups, values, size, percents):
+    """
+    Grup başına yüzdelikler (np.percentile 'linear' yöntemiyle aynı).
+    Değerler (grup, değer) sırasına dizilir; her grubun başlangıcı ve uzunluğundan
+    yüzdelik konumları tek seferde hesaplanır. Boş gruplar NaN olur.
+    """
+    result = np.full((len(percents), size), np.nan)
+    counts = np.bincount(groups, minlength=size)
+    filled = counts > 0
+    if not filled.any():
+        return result
+    values = values[np.lexsort((values, groups))]
+    starts = (np.cumsum(counts) - counts)[filled]
+    last = counts[filled] - 1
+    for row, percent in enumerate(percents):
+        position = starts + last * (percent / 100)
+        low = np.floor(position).astype(np.int64)
+        high = np.ceil(position).astype(np.int64)
+        result[row, filled] = values[low] + (values[high] - values[low]) * (position - low)
+    return result
+
+
+def _group_mean(groups, values, counts, size):
+    sums = np.bincount(groups, weights=values, minlength=size)
+    return np.divide(sums, counts, out=np.full(size, np.nan), where=counts > 0)
+
+
+def _latest(frame, metric, total, size):
+    """Hesap başına metriğin en son günlük değeri; satır yoksa NaN."""
+    mask = (frame.daily_metric == DAILY_METRICS.index(metric)) & (frame.daily_total == total)
+    accounts = frame.daily_account[mask]
+    result = np.full(size, np.nan)
+    if accounts.size:
+        # Hesap ve gün sırasına dizilince her hesabın son satırı en güncel değerdir
+        order = np.lexsort((frame.daily_day[mask], accounts))
+        accounts = accounts[order]
+        last = np.r_[accounts[1:] != accounts[:-1], True]
+        result[accounts[last]] = frame.daily_value[mask][order][last]
+    return result
+
+
+def _window_sum(frame, metric, since_day, size):
+    """Hesap başına günlük (period='day') serinin since_day'den itibaren toplamı."""
+    mask = (
+        (frame.daily_metric == DAILY_METRICS.index(metric))
+        & ~frame.daily_total
+        & (frame.daily_day > since_day)
+    )
+    sums = np.bincount(frame.daily_account[mask], weights=frame.daily_value[mask], minlength=size)
+    has_rows = np.bincount(frame.daily_account[mask], minlength=size) > 0
+    return np.where(has_rows, sums, np.nan)
+
+
+def _number(value):
+    value = float(value)
+    if np.isnan(value):
+        return None
+    return round(value, 4)
+
+
+def compute_metrics(frame, followers=None, now=None):
+    """
+    MetricsFrame'deki tüm hesapların metrikleri: {ig_id: calculated_metrics}.
+    followers ({ig_id: takipçi sayısı}) verilirse takipçi büyümesi ve influencer skoru da hesaplanır.
+    Medya başına etkileşim oranı (likes+comments+saved+shares)/reach*100'dür; reach'i
+    olmayan medyalar yüzdeliklere katılmaz.
+    """
+    now = now or timezone.now()
+    size = len(frame.ig_ids)
+    followers = followers or {}
+    follower_counts = np.array(
+        [float(followers.get(ig_id) or np.nan) for ig_id in frame.ig_ids], dtype=np.float64
+    ).reshape(size)
+    today = _day_number(timezone.localdate(now))
+
+    interactions = frame.likes + frame.comments + frame.saved + frame.shares
+    has_reach = frame.reach > 0
+    post_rate = np.divide(
+        interactions, frame.reach, out=np.full(interactions.shape, np.nan), where=has_reach
+    ) * 100
+    age_days = (now.timestamp() - frame.media_time) / _DAY_SECONDS
+
+    windows = {}
+    for name, days in WINDOWS:
+        in_window = (age_days >= 0) & (age_days < days)
+        accounts = frame.media_account[in_window]
+        posts = np.bincount(accounts, minlength=size)
+        rated = in_window & has_reach
+        rated_accounts = frame.media_account[rated]
+        rated_posts = np.bincount(rated_accounts, minlength=size)
+        windows[name] = {
+            "posts": posts,
+            "posting_frequency": posts / days,
+            "avg_likes": _group_mean(accounts, frame.likes[in_window], posts, size),
+            "avg_comments": _group_mean(accounts, frame.comments[in_window], posts, size),
+            "avg_engagement_rate": _group_mean(rated_accounts, post_rate[rated], rated_posts, size),
+            "percentiles": _group_percentiles(rated_accounts, post_rate[rated], size, PERCENTILES),
+            "follower_gain": _window_sum(frame, "follower_count", today - days, size),
+        }
+
+    media_counts = np.bincount(frame.media_account, minlength=size)
+    reach = _latest(frame, "reach", True, size)
+    total_interactions = _latest(frame, "total_interactions", True, size)
+    engagement_rate = np.divide(
+        total_interactions, reach, out=np.full(size, np.nan), where=reach > 0
+    ) * 100
+    gain = windows["30d"]["follower_gain"]
+    previous_followers = follower_counts - gain
+    followers_growth_rate = np.divide(
+        gain, previous_followers, out=np.full(size, np.nan), where=previous_followers > 0
+    ) * 100
+    influencer_score = follower_counts / 1000 * engagement_rate
+
+    results = {}
+    for i, ig_id in enumerate(frame.ig_ids):
+        calculated = {
+            "engagement_rate": _number(engagement_rate[i]),
+            "followers_growth_rate": _number(followers_growth_rate[i]),
+            "posting_frequency": _number(windows["30d"]["posting_frequency"][i]),
+            "influencer_score": _number(influencer_score[i]),
+        }
+        calculated = {key: value for key, value in calculated.items() if value is not None}
+        calculated["media_count"] = int(media_counts[i])
+        calculated["windows"] = {
+            name: {
+                "posts": int(window["posts"][i]),
+                "posting_frequency": _number(window["posting_frequency"][i]),
+                "avg_likes": _number(window["avg_likes"][i]),
+                "avg_comments": _number(window["avg_comments"][i]),
+                "avg_engagement_rate": _number(window["avg_engagement_rate"][i]),
+                "median_engagement_rate": _number(window["percentiles"][PERCENTILES.index(50), i]),
+                **{
+                    f"p{percent}_engagement_rate": _number(window["percentiles"][row, i])
+                    for row, percent in enumerate(PERCENTILES)
+                    if percent != 50
+                },
+                "follower_gain": _number(window["follower_gain"][i]),
+            }
+            for name, window in windows.items()
+        }
+        results[ig_id] = calculated
+    return results
+
+
+def story_exit_rate(story_insights):
+    """Story'lerin toplam exits / impressions oranı (%); impressions yoksa None."""
+    pairs = np.array(
+        [
+            (
+                InstagramDataSaver.insight_value(story.get("insights", {}).get("impressions")) or 0,
+                InstagramDataSaver.insight_value(story.get("insights", {}).get("exits")) or 0,
+            )
+            for story in story_insights or []
+        ],
+        dtype=np.float64,
+    ).reshape(-1, 2)
+    impressions, exits = pairs.sum(axis=0)
+    if impressions <= 0:
+        return None
+    return round(float(exits / impressions * 100), 4)
+
+
+def score_accounts(ig_ids, followers=None, now=None):
+    """Birçok hesabın metriklerini tablolardan toplu hesaplar (tablo başına bir sorgu)."""
+    return compute_metrics(MetricsFrame.load(ig_ids), followers, now)
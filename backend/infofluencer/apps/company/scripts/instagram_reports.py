@@ -6,55 +6,169 @@ Instagram Graph API v22.0 ile kapsamlı analiz modülü
 Django projesi için uyarlanmış versiyon
 """
 
-import requests
 import json
+import threading
+import weakref
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime, timedelta
 from django.conf import settings
-from apps.company.models import InstagramToken
+from django.db import connections
+from apps.company.models import InstagramMetricCapability, InstagramToken
+from apps.company.scripts.graph_batch import graph_batch_get
+from apps.company.scripts.graph_client import graph_get, graph_url
+from apps.company.scripts.instagram_comments import ingest_comments
+from apps.company.scripts.metric_capabilities import MetricCapabilities
 from apps.accounts.models import CompanyProfile
 from django.utils import timezone
 
 
-def get_comprehensive_instagram_data(ig_id, page_token):
-    """Tablodaki tüm verileri almak için kapsamlı Instagram analizi"""
+# Hesap başına aynı anda çalışabilecek en fazla bölüm (her bölüm kendi Graph çağrılarını sırayla yapar)
+DEFAULT_FETCH_MAX_WORKERS = 4
+
+# Semaforlar yalnızca bir yenileme onları kullanırken yaşar; uzun süren worker
+# süreçlerinde her hesap için kalıcı kayıt birikmez
+class _AccountSlots:
+    """
+    Limiti yerinde değiştirilebilen semafor. Limit değişince yeni bir semafor
+    kurulmaz; o anda slot tutan thread'ler aynı sayaca dahil kalır ve limit aşılmaz.
+    """
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.in_use = 0
+        self._condition = threading.Condition()
+
+    def resize(self, limit):
+        with self._condition:
+            self.limit = limit
+            self._condition.notify_all()
+
+    def __enter__(self):
+        with self._condition:
+            while self.in_use >= self.limit:
+                self._condition.wait()
+            self.in_use += 1
+        return self
+
+    def __exit__(self, *exc_info):
+        with self._condition:
+            self.in_use -= 1
+            self._condition.notify()
+
+
+_account_slots = weakref.WeakValueDictionary()
+_account_slots_lock = threading.Lock()
+
+
+def _account_semaphore(ig_id, limit):
+    """Aynı hesap için paralel yenilemelerin toplamda limiti aşmamasını sağlayan semafor"""
+    with _account_slots_lock:
+        slots = _account_slots.get(ig_id)
+        if slots is None:
+            slots = _account_slots[ig_id] = _AccountSlots(limit)
+        elif slots.limit != limit:
+            slots.resize(limit)
+        return slots
+
+
+def _run_section(semaphore, func, ig_id, page_token):
+    try:
+        with semaphore:
+            return func(ig_id, page_token)
+    finally:
+        # Havuz thread'inde açılan veritabanı bağlantısını bırak
+        connections.close_all()
+
+
+# get_comprehensive_instagram_data'nın ilerleme bildirdiği bölümler
+SECTION_KEYS = (
+    'basic_info',
+    'media_data',
+    'demographics',
+    'user_insights',
+    'story_insights',
+    'calculated_metrics',
+)
+
+
+def _notify(progress_callback, key, status):
+    """İlerleme bildirimi; callback hatası veri çekmeyi durdurmaz."""
+    if progress_callback is None:
+        return
+    try:
+        progress_callback(key, status)
+    except Exception as e:
+        print(f"Progress callback exception: {e}")
+
+
+def get_comprehensive_instagram_data(ig_id, page_token, concurrent=None, max_workers=None, progress_callback=None):
+    """Tablodaki tüm verileri almak için kapsamlı Instagram analizi
+
+    Birbirinden bağımsız bölümler (temel bilgiler, medya, demografi, insights, story)
+    varsayılan olarak sınırlı bir thread havuzunda paralel çekilir; toplam süre en
+    yavaş bölüme yaklaşır. Hesap başına eşzamanlılık INSTAGRAM_FETCH_MAX_WORKERS ile
+    sınırlandırılır. concurrent=False eski sıralı davranışı kullanır.
+
+    progress_callback(section, status): her bölüm bittiğinde çağıran thread'de çağrılır;
+    status 'done', 'empty' (veri yok) ya da 'failed' olur.
+    """
     results = {}
-    
+
+    if concurrent is None:
+        concurrent = getattr(settings, 'INSTAGRAM_CONCURRENT_FETCH', True)
+    if max_workers is None:
+        max_workers = getattr(settings, 'INSTAGRAM_FETCH_MAX_WORKERS', DEFAULT_FETCH_MAX_WORKERS)
+    max_workers = max(1, int(max_workers))
+
+    # Sonuç sözlüğündeki anahtar sırası sıralı moddakiyle aynı kalsın diye liste
+    sections = [
+        ('basic_info', get_instagram_basic_info),           # 1. HESAP TEMEL BİLGİLERİ
+        ('media_data', get_media_comprehensive),            # 2. MEDYA LİSTESİ VE DETAYLARI
+        ('demographics', get_demographics_comprehensive),   # 3. DEMOGRAFİK VERİLER
+        ('user_insights', get_user_insights_comprehensive), # 4. ENGAGEMENT VE REACH METRİKLERİ
+        ('story_insights', get_story_insights),             # 5. STORY ANALİZLERİ
+    ]
+
     try:
         print("🚀 Kapsamlı analiz başlıyor...")
-        
-        # 1. HESAP TEMEL BİLGİLERİ
-        basic_info = get_instagram_basic_info(ig_id, page_token)
-        if basic_info:
-            results['basic_info'] = basic_info
-        
-        # 2. MEDYA LİSTESİ VE DETAYLARI
-        media_data = get_media_comprehensive(ig_id, page_token)
-        if media_data:
-            results['media_data'] = media_data
-        
-        # 3. DEMOGRAFİK VERİLER
-        demographics = get_demographics_comprehensive(ig_id, page_token)
-        if demographics:
-            results['demographics'] = demographics
-        
-        # 4. ENGAGEMENT VE REACH METRİKLERİ
-        insights = get_user_insights_comprehensive(ig_id, page_token)
-        if insights:
-            results['user_insights'] = insights
-        
-        # 5. STORY ANALİZLERİ
-        story_insights = get_story_insights(ig_id, page_token)
-        if story_insights:
-            results['story_insights'] = story_insights
-        
+
+        if concurrent:
+            semaphore = _account_semaphore(ig_id, max_workers)
+            collected = {}
+            with ThreadPoolExecutor(max_workers=min(max_workers, len(sections))) as executor:
+                futures = {
+                    executor.submit(_run_section, semaphore, func, ig_id, page_token): key
+                    for key, func in sections
+                }
+                # İlerleme bölümler bittikçe bildirilir
+                for future in as_completed(futures):
+                    key = futures[future]
+                    try:
+                        collected[key] = future.result()
+                    except Exception as e:
+                        print(f"{key} exception: {e}")
+                        _notify(progress_callback, key, 'failed')
+                        continue
+                    _notify(progress_callback, key, 'done' if collected[key] else 'empty')
+            for key, _ in sections:
+                if collected.get(key):
+                    results[key] = collected[key]
+        else:
+            for key, func in sections:
+                data = func(ig_id, page_token)
+                _notify(progress_callback, key, 'done' if data else 'empty')
+                if data:
+                    results[key] = data
+
         # 6. HESAPLANMIŞ METRİKLER
-        calculated_metrics = calculate_advanced_metrics(results)
+        calculated_metrics = calculate_advanced_metrics(results, ig_id)
         if calculated_metrics:
             results['calculated_metrics'] = calculated_metrics
-        
+        _notify(progress_callback, 'calculated_metrics', 'done' if calculated_metrics else 'empty')
+
         print(f"✅ Kapsamlı analiz tamamlandı. {len(results)} kategori toplandı.")
         return results
-    
+
     except Exception as e:
         print(f"Comprehensive data exception: {e}")
         return results
@@ -69,8 +183,8 @@ def get_instagram_basic_info(ig_id, page_token):
             'website', 'followers_count', 'follows_count', 'media_count'
         ]
         
-        resp = requests.get(
-            f'https://graph.facebook.com/v22.0/{ig_id}',
+        resp = graph_get(
+            graph_url(f'{ig_id}'),
             params={
                 'fields': ','.join(fields),
                 'access_token': page_token
@@ -92,42 +206,19 @@ def get_instagram_basic_info(ig_id, page_token):
 
 
 def get_media_comprehensive(ig_id, page_token):
-    """Medya listesi ve detaylı insights - Tablo 2-4'teki veriler"""
+    """Medya listesi ve detaylı insights - Tablo 2-4'teki veriler
+
+    Medyalar artımlı aktarılır (bkz. instagram_media.ingest_media); yalnızca yeni ve
+    yakın tarihli medyalar yeniden çekilir, sonuç son 5 medya olarak tablodan döner.
+    """
+    from apps.company.scripts.instagram_media import ingest_media, media_payload
+
     try:
-        # Önce medya listesini al
-        media_resp = requests.get(
-            f'https://graph.facebook.com/v22.0/{ig_id}/media',
-            params={
-                'fields': 'id,caption,media_type,media_url,permalink,thumbnail_url,timestamp,children,like_count,comments_count',
-                'limit': 5,
-                'access_token': page_token
-            },
-            timeout=15
-        )
-        
-        if media_resp.status_code != 200:
-            print(f"❌ Medya listesi hatası: {media_resp.status_code}")
+        if ingest_media(ig_id, page_token) is None:
             return None
-        
-        media_data = media_resp.json()
-        print(f"✅ {len(media_data.get('data', []))} medya bulundu")
-        
-        # Her medya için detaylı insights al
-        for media in media_data.get('data', [])[:5]:  # Son 5 medya
-            media_id = media['id']
-            media_type = media.get('media_type', 'UNKNOWN')
-            
-            # Medya insights - Tablo 3'teki metrikler
-            media_insights = get_media_insights_detailed(media_id, media_type, page_token)
-            if media_insights:
-                media['insights'] = media_insights
-            
-            # Comments ve text analysis - Tablo 4 için
-            if media.get('comments_count', 0) > 0:
-                comments_data = get_media_comments(media_id, page_token)
-                if comments_data:
-                    media['comments_analysis'] = comments_data
-        
+
+        media_data = media_payload(ig_id, limit=5)  # Son 5 medya
+        print(f"✅ {len(media_data['data'])} medya bulundu")
         return media_data
     
     except Exception as e:
@@ -135,100 +226,67 @@ def get_media_comprehensive(ig_id, page_token):
         return None
 
 
-def get_media_insights_detailed(media_id, media_type, page_token):
-    """Detaylı medya insights - Tablo 3"""
+def _media_insight_metrics(media_type):
+    """Medya tipine göre istenecek metrikler"""
+    if media_type == 'IMAGE':
+        return ['impressions', 'reach', 'engagement', 'saved', 'likes', 'comments', 'shares']
+    elif media_type == 'VIDEO':
+        return ['impressions', 'reach', 'engagement', 'saved', 'likes', 'comments', 'shares', 'video_views']
+    elif media_type == 'CAROUSEL_ALBUM':
+        return ['impressions', 'reach', 'engagement', 'saved', 'likes', 'comments', 'shares']
+    return ['impressions', 'reach', 'engagement']
+
+
+def get_media_insights_batch(medias, page_token, ig_id=None):
+    """
+    Birden fazla medyanın metrik bazlı insights'ını batch ile çeker: {media_id: {metric: data}}
+    ig_id verilirse medya tipi için desteklenmediği bilinen metrikler istenmez.
+    """
     try:
-        # Medya tipine göre metrikler
-        if media_type == 'IMAGE':
-            metrics = ['impressions', 'reach', 'engagement', 'saved', 'likes', 'comments', 'shares']
-        elif media_type == 'VIDEO':
-            metrics = ['impressions', 'reach', 'engagement', 'saved', 'likes', 'comments', 'shares', 'video_views']
-        elif media_type == 'CAROUSEL_ALBUM':
-            metrics = ['impressions', 'reach', 'engagement', 'saved', 'likes', 'comments', 'shares']
-        else:
-            metrics = ['impressions', 'reach', 'engagement']
-        
+        capabilities = None
+        if ig_id:
+            capabilities = MetricCapabilities.load(
+                ig_id, {media.get('media_type', 'UNKNOWN') for media in medias}
+            )
+        keys = []
+        sub_requests = []
+        for media in medias:
+            media_type = media.get('media_type', 'UNKNOWN')
+            metrics = _media_insight_metrics(media_type)
+            if capabilities:
+                metrics = capabilities.requestable(media_type, metrics)
+            for metric in metrics:
+                keys.append((media['id'], media_type, metric))
+                sub_requests.append((f"{media['id']}/insights", {'metric': metric}))
+
         results = {}
-        
-        # Her metriği tek tek dene
-        for metric in metrics:
-            try:
-                resp = requests.get(
-                    f'https://graph.facebook.com/v22.0/{media_id}/insights',
-                    params={
-                        'metric': metric,
-                        'access_token': page_token
-                    },
-                    timeout=10
-                )
-                
-                if resp.status_code == 200:
-                    data = resp.json()
-                    results[metric] = data
-                    print(f"✅ Media insight {metric} başarılı")
-                else:
-                    print(f"❌ Media insight {metric} hatası: {resp.status_code}")
-            
-            except Exception as e:
-                print(f"Media insight {metric} exception: {e}")
-        
-        return results if results else None
-    
+        for (media_id, media_type, metric), (status, data) in zip(keys, graph_batch_get(sub_requests, page_token)):
+            if capabilities:
+                capabilities.record(media_type, metric, status, data)
+            if status == 200:
+                results.setdefault(media_id, {})[metric] = data
+                print(f"✅ Media insight {metric} başarılı")
+            else:
+                print(f"❌ Media insight {metric} hatası: {status}")
+
+        if capabilities:
+            capabilities.save()
+        return results
+
     except Exception as e:
-        print(f"Media insights detailed exception: {e}")
-        return None
+        print(f"Media insights batch exception: {e}")
+        return {}
+
+
+def get_media_insights_detailed(media_id, media_type, page_token, ig_id=None):
+    """Detaylı medya insights - Tablo 3"""
+    results = get_media_insights_batch([{'id': media_id, 'media_type': media_type}], page_token, ig_id)
+    return results.get(media_id) or None
 
 
 def get_media_comments(media_id, page_token):
-    """Medya yorumları analizi - Tablo 4"""
-    try:
-        resp = requests.get(
-            f'https://graph.facebook.com/v22.0/{media_id}/comments',
-            params={
-                'fields': 'text,username,timestamp,like_count,replies',
-                'limit': 100,
-                'access_token': page_token
-            },
-            timeout=10
-        )
-        
-        if resp.status_code == 200:
-            comments_data = resp.json()
-            comments = comments_data.get('data', [])
-            
-            # Yorum metinlerini çıkar
-            comment_texts = []
-            for comment in comments:
-                text = comment.get('text', '').strip()
-                if text:  # Boş olmayan yorumları ekle
-                    comment_texts.append({
-                        'text': text,
-                        'username': comment.get('username', ''),
-                        'timestamp': comment.get('timestamp', ''),
-                        'like_count': comment.get('like_count', 0)
-                    })
-            
-            # Yorum analizi
-            analysis = {
-                'total_comments': len(comments),
-                'total_text_comments': len(comment_texts),
-                'average_length': sum(len(c.get('text', '')) for c in comments) / len(comments) if comments else 0,
-                'comments_with_likes': len([c for c in comments if c.get('like_count', 0) > 0]),
-                'top_comments': sorted(comments, key=lambda x: x.get('like_count', 0), reverse=True)[:5],
-                'recent_comments': comments[:10],
-                'comment_texts': comment_texts,  # Yorum metinleri
-                'all_texts': [c['text'] for c in comment_texts]  # Sadece metinler
-            }
-            
-            print(f"✅ {len(comments)} yorum analiz edildi, {len(comment_texts)} metin çıkarıldı")
-            return analysis
-        else:
-            print(f"❌ Yorumlar hatası: {resp.status_code}")
-            return None
-    
-    except Exception as e:
-        print(f"Comments exception: {e}")
-        return None
+    """Medya yorumları analizi - Tablo 4 (tüm sayfalar; bkz. instagram_comments)"""
+    return ingest_comments(media_id, page_token)
 
 
 def get_demographics_comprehensive(ig_id, page_token):
@@ -240,8 +298,8 @@ def get_demographics_comprehensive(ig_id, page_token):
         breakdown_options = ['age', 'city', 'country', 'gender']
         
         for breakdown in breakdown_options:
-            resp = requests.get(
-                f'https://graph.facebook.com/v22.0/{ig_id}/insights',
+            resp = graph_get(
+                graph_url(f'{ig_id}/insights'),
                 params={
                     'metric': 'follower_demographics',
                     'period': 'lifetime',
@@ -258,8 +316,8 @@ def get_demographics_comprehensive(ig_id, page_token):
                 print(f"✅ Demografik {breakdown} başarılı")
         
         # Online followers - çevrimiçi saatler
-        resp = requests.get(
-            f'https://graph.facebook.com/v22.0/{ig_id}/insights',
+        resp = graph_get(
+            graph_url(f'{ig_id}/insights'),
             params={
                 'metric': 'online_followers',
                 'period': 'lifetime',
@@ -301,56 +359,49 @@ def get_user_insights_comprehensive(ig_id, page_token):
         ]
         
         results = {}
-        
-        # Çalışan metrikleri al
-        for metric in working_metrics:
-            try:
-                resp = requests.get(
-                    f'https://graph.facebook.com/v22.0/{ig_id}/insights',
-                    params={
-                        'metric': metric,
-                        'period': 'day',
-                        'since': since_date,
-                        'until': until_date,
-                        'metric_type': 'total_value',
-                        'access_token': page_token
-                    },
-                    timeout=15
-                )
-                
-                if resp.status_code == 200:
-                    data = resp.json()
-                    results[metric] = data
-                    print(f"✅ User insight {metric} başarılı")
-            
-            except Exception as e:
-                print(f"User insight {metric} exception: {e}")
-        
-        # Ek metrikleri test et
-        for metric in additional_metrics:
-            try:
-                resp = requests.get(
-                    f'https://graph.facebook.com/v22.0/{ig_id}/insights',
-                    params={
-                        'metric': metric,
-                        'period': 'day',
-                        'since': since_date,
-                        'until': until_date,
-                        'access_token': page_token
-                    },
-                    timeout=15
-                )
-                
-                if resp.status_code == 200:
-                    data = resp.json()
-                    results[metric] = data
-                    print(f"🆕 Ek metrik {metric} başarılı!")
-                else:
-                    print(f"❌ Ek metrik {metric} hatası: {resp.status_code}")
-            
-            except Exception as e:
-                print(f"Ek metrik {metric} exception: {e}")
-        
+
+        # Bu hesapta desteklenmediği bilinen metrikler yeniden deneme zamanına kadar istenmez
+        scope = InstagramMetricCapability.SCOPE_USER
+        capabilities = MetricCapabilities.load(ig_id, [scope])
+        working_metrics = capabilities.requestable(scope, working_metrics)
+        additional_metrics = capabilities.requestable(scope, additional_metrics)
+
+        # Çalışan ve ek metrikler tek batch isteğinde; ek metrikler metric_type almaz
+        sub_requests = [
+            (f'{ig_id}/insights', {
+                'metric': metric,
+                'period': 'day',
+                'since': since_date,
+                'until': until_date,
+                'metric_type': 'total_value',
+            })
+            for metric in working_metrics
+        ] + [
+            (f'{ig_id}/insights', {
+                'metric': metric,
+                'period': 'day',
+                'since': since_date,
+                'until': until_date,
+            })
+            for metric in additional_metrics
+        ]
+        responses = graph_batch_get(sub_requests, page_token)
+
+        for metric, (status, data) in zip(working_metrics, responses[:len(working_metrics)]):
+            capabilities.record(scope, metric, status, data)
+            if status == 200:
+                results[metric] = data
+                print(f"✅ User insight {metric} başarılı")
+
+        for metric, (status, data) in zip(additional_metrics, responses[len(working_metrics):]):
+            capabilities.record(scope, metric, status, data)
+            if status == 200:
+                results[metric] = data
+                print(f"🆕 Ek metrik {metric} başarılı!")
+            else:
+                print(f"❌ Ek metrik {metric} hatası: {status}")
+
+        capabilities.save()
         return results
     
     except Exception as e:
@@ -366,8 +417,8 @@ def get_story_insights(ig_id, page_token):
         until_date = datetime.now().strftime('%Y-%m-%d')
         
         # Story medyalarını al
-        resp = requests.get(
-            f'https://graph.facebook.com/v22.0/{ig_id}/media',
+        resp = graph_get(
+            graph_url(f'{ig_id}/media'),
             params={
                 'fields': 'id,media_type,timestamp',
                 'since': since_date,
@@ -388,41 +439,37 @@ def get_story_insights(ig_id, page_token):
             print("ℹ️ Aktif story bulunamadı")
             return None
         
+        # Story metrikleri (desteklenmediği bilinenler hariç)
+        capabilities = MetricCapabilities.load(ig_id, ['STORY'])
+        story_metrics = capabilities.requestable(
+            'STORY', ['impressions', 'reach', 'taps_forward', 'taps_back', 'exits', 'replies']
+        )
+
+        # Tüm story'lerin metrikleri tek batch isteğinde
+        sub_requests = [
+            (f"{story['id']}/insights", {'metric': metric})
+            for story in stories
+            for metric in story_metrics
+        ]
+        responses = iter(graph_batch_get(sub_requests, page_token))
+
         story_insights = []
-        
-        # Her story için insights
         for story in stories:
-            story_id = story['id']
-            
-            # Story metrikleri
-            story_metrics = ['impressions', 'reach', 'taps_forward', 'taps_back', 'exits', 'replies']
-            
             insights = {}
             for metric in story_metrics:
-                try:
-                    resp = requests.get(
-                        f'https://graph.facebook.com/v22.0/{story_id}/insights',
-                        params={
-                            'metric': metric,
-                            'access_token': page_token
-                        },
-                        timeout=10
-                    )
-                    
-                    if resp.status_code == 200:
-                        data = resp.json()
-                        insights[metric] = data
-                
-                except Exception as e:
-                    print(f"Story insight {metric} exception: {e}")
+                status, data = next(responses)
+                capabilities.record('STORY', metric, status, data)
+                if status == 200:
+                    insights[metric] = data
             
             if insights:
                 story_insights.append({
-                    'story_id': story_id,
+                    'story_id': story['id'],
                     'timestamp': story['timestamp'],
                     'insights': insights
                 })
         
+        capabilities.save()
         print(f"✅ {len(story_insights)} story analiz edildi")
         return story_insights
     
@@ -431,82 +478,36 @@ def get_story_insights(ig_id, page_token):
         return None
 
 
-def calculate_advanced_metrics(results):
-    """Tablo 8'deki hesaplanmış metrikler"""
+def calculate_advanced_metrics(results, ig_id=None):
+    """Tablo 8'deki hesaplanmış metrikler
+
+    Medya metrikleri tablodaki tüm medya geçmişinden, hesap metrikleri bu yenilemede
+    çekilen user_insights'tan instagram_metrics motoruyla hesaplanır.
+    """
+    from apps.company.scripts.instagram_metrics import (
+        MetricsFrame,
+        compute_metrics,
+        story_exit_rate,
+    )
+
     try:
-        calculated = {}
-        
-        # Temel veriler
         basic_info = results.get('basic_info', {})
-        user_insights = results.get('user_insights', {})
-        media_data = results.get('media_data', {})
-        
-        followers_count = basic_info.get('followers_count', 1)
-        
-        # Engagement Rate hesapla
-        if 'total_interactions' in user_insights and 'reach' in user_insights:
-            total_interactions_data = user_insights['total_interactions'].get('data', [])
-            reach_data = user_insights['reach'].get('data', [])
-            
-            if total_interactions_data and reach_data:
-                total_interactions = sum(d.get('value', 0) for d in total_interactions_data)
-                total_reach = sum(d.get('value', 0) for d in reach_data)
-                
-                if total_reach > 0:
-                    calculated['engagement_rate'] = (total_interactions / total_reach) * 100
-        
-        # Story Exit Rate
-        story_insights = results.get('story_insights', [])
-        if story_insights:
-            total_impressions = 0
-            total_exits = 0
-            
-            for story in story_insights:
-                insights = story.get('insights', {})
-                if 'impressions' in insights and 'exits' in insights:
-                    impressions_data = insights['impressions'].get('data', [])
-                    exits_data = insights['exits'].get('data', [])
-                    
-                    if impressions_data:
-                        total_impressions += impressions_data[0].get('value', 0)
-                    if exits_data:
-                        total_exits += exits_data[0].get('value', 0)
-            
-            if total_impressions > 0:
-                calculated['story_exit_rate'] = (total_exits / total_impressions) * 100
-        
-        # Followers Growth Rate
-        if 'follower_count' in user_insights:
-            follower_data = user_insights['follower_count'].get('data', [])
-            if len(follower_data) > 1:
-                oldest = follower_data[-1].get('value', 0)
-                newest = follower_data[0].get('value', 0)
-                
-                if oldest > 0:
-                    calculated['followers_growth_rate'] = ((newest - oldest) / oldest) * 100
-        
-        # Ad Saturation (posting frequency)
-        if media_data and 'data' in media_data:
-            medias = media_data['data']
-            if len(medias) > 1:
-                # Son 30 günde kaç post
-                thirty_days_ago = datetime.now() - timedelta(days=30)
-                recent_posts = []
-                for m in medias:
-                    try:
-                        post_time = datetime.fromisoformat(m.get('timestamp', '').replace('Z', '+00:00')).replace(tzinfo=None)
-                        if post_time > thirty_days_ago:
-                            recent_posts.append(m)
-                    except:
-                        continue
-                calculated['posting_frequency'] = len(recent_posts) / 30  # Günlük ortalama
-        
-        # Influencer Score (basit hesaplama)
-        if followers_count > 0 and 'engagement_rate' in calculated:
-            # Basit skor: (followers/1000) * engagement_rate
-            calculated['influencer_score'] = (followers_count / 1000) * calculated['engagement_rate']
-        
-        print(f"✅ {len(calculated)} hesaplanmış metrik oluşturuldu")
+        ig_id = ig_id or basic_info.get('id')
+        if not ig_id:
+            return None
+
+        frame = MetricsFrame(ig_ids=[ig_id])
+        frame.load_media()
+        frame.use_user_insights(ig_id, results.get('user_insights', {}))
+        calculated = compute_metrics(
+            frame, followers={ig_id: basic_info.get('followers_count')}
+        )[ig_id]
+
+        exit_rate = story_exit_rate(results.get('story_insights', []))
+        if exit_rate is not None:
+            calculated['story_exit_rate'] = exit_rate
+
+        print(f"✅ {len(calculated)} hesaplanmış metrik oluşturuldu ({calculated['media_count']} medya)")
         return calculated
     
     except Exception as e:
@@ -522,30 +523,9 @@ def get_instagram_analytics_for_company(company_profile):
         if not token:
             return {"error": "Instagram token bulunamadı"}
         
-        # Token süresi dolmuşsa otomatik yenile
+        # Token'lar istek sırasında yenilenmez; renew_instagram_tokens komutu süresi dolmadan yeniler
         if token.token_expiry and token.token_expiry <= timezone.now():
-            # Token'ı yenile
-            resp = requests.get(
-                "https://graph.instagram.com/refresh_access_token",
-                params={
-                    "grant_type": "ig_refresh_token",
-                    "access_token": token.access_token
-                },
-                timeout=10
-            )
-            print("INSTAGRAM REFRESH TOKEN RESPONSE (auto):", resp.status_code, resp.text)
-            if resp.status_code == 200:
-                data = resp.json()
-                token.access_token = data.get("access_token", token.access_token)
-                expires_in = data.get("expires_in", 3600)
-                token.token_expiry = timezone.now() + timezone.timedelta(seconds=expires_in)
-                token.save()
-                # Token yenilendi bilgisini response'a ekle
-                token_was_refreshed = True
-            else:
-                return {"error": "Instagram token süresi dolmuş ve yenileme başarısız", "details": resp.text}
-        else:
-            token_was_refreshed = False
+            return {"error": "Instagram token süresi dolmuş, hesabı yeniden bağlayın"}
         
         # Instagram business account ID'sini kontrol et
         if not token.instagram_business_account_id:
@@ -559,11 +539,7 @@ def get_instagram_analytics_for_company(company_profile):
         
         # Son güncelleme zamanını kaydet
         token.last_data_fetch = timezone.now()
-        token.save()
-        
-        # Eğer token yenilendiyse, response'a ekle
-        if token_was_refreshed:
-            comprehensive_data['details'] = 'token yenilendi'
+        token.save(update_fields=["last_data_fetch"])
         return comprehensive_data
     
     except Exception as e:
@@ -0,0 +1,93 @@
+"""
+Instagram (Facebook Login) token'larının süresi dolmadan toplu yenilenmesi.
+Süresi INSTAGRAM_TOKEN_RENEW_WITHIN_DAYS içinde dolacak token'lar token_expiry
+indeksiyle seçilir, fb_exchange_token ile sınırlı eşzamanlılıkta yenilenir ve
+sonuçlar tek bulk_update ile yazılır. Kullanıcı istekleri token yenilemez;
+renew_instagram_tokens komutu cron ile (ör. günlük) çalıştırılır. OAuth callback'i
+kısa ömürlü token'ı kaydetmeden önce exchange_token ile uzun ömürlüye çevirir;
+süresi dolmuş token'lar yenilenemez, hesabın yeniden bağlanması gerekir.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from apps.company.models import InstagramToken
+from apps.company.scripts.graph_client import graph_get, graph_url
+
+OAUTH_API_VERSION = "v20.0"
+
+_UPDATE_BATCH_SIZE = 500
+
+
+def expiring_tokens(within=None, limit=None):
+    """Süresi henüz dolmamış ama within içinde dolacak token'lar (en yakın bitenden başlayarak)."""
+    if within is None:
+        within = timedelta(days=getattr(settings, "INSTAGRAM_TOKEN_RENEW_WITHIN_DAYS", 7))
+    now = timezone.now()
+    tokens = (
+        InstagramToken.objects.filter(token_expiry__gt=now, token_expiry__lte=now + within)
+        .only("id", "company_id", "access_token", "token_expiry")
+        .order_by("token_expiry")
+    )
+    return list(tokens[:limit] if limit else tokens)
+
+
+def exchange_token(access_token):
+    """Geçerli bir token'ı yeni uzun ömürlü token'la değiştirir: (access_token, expires_in)."""
+    resp = graph_get(
+        graph_url("oauth/access_token", OAUTH_API_VERSION),
+        params={
+            "grant_type": "fb_exchange_token",
+            "client_id": getattr(settings, "INSTAGRAM_APP_ID", None),
+            "client_secret": getattr(settings, "INSTAGRAM_APP_SECRET", None),
+            "fb_exchange_token": access_token,
+        },
+        timeout=10,
+        retry=False,
+    )
+    if resp.status_code != 200:
+        raise RuntimeError(f"{resp.status_code} {resp.text}")
+    data = resp.json()
+    # Facebook uzun ömürlü token'larda expires_in dönmeyebilir; ömrü 60 gündür
+    return data["access_token"], data.get("expires_in") or 60 * 24 * 3600
+
+
+def _exchange(access_token):
+    try:
+        return exchange_token(access_token), None
+    except Exception as e:
+        return None, e
+
+
+def renew_tokens(tokens, max_workers=None):
+    """
+    Token'ları paralel yeniler (yalnızca HTTP; DB'ye dokunulmaz), başarılı olanları
+    tek bulk_update ile yazar. Dönüş: (yenilenen sayısı, [(company_id, hata), ...]).
+    """
+    if not tokens:
+        return 0, []
+    max_workers = max_workers or getattr(settings, "INSTAGRAM_TOKEN_RENEW_CONCURRENCY", 4)
+    with ThreadPoolExecutor(
+        max_workers=min(max_workers, len(tokens)), thread_name_prefix="ig-token"
+    ) as executor:
+        results = list(executor.map(_exchange, [token.access_token for token in tokens]))
+
+    now = timezone.now()
+    renewed = []
+    errors = []
+    for token, (result, error) in zip(tokens, results):
+        if error is not None:
+            errors.append((token.company_id, error))
+            continue
+        token.access_token, expires_in = result
+        token.token_expiry = now + timedelta(seconds=expires_in)
+        # bulk_update auto_now alanlarını kendisi güncellemez
+        token.updated_at = now
+        renewed.append(token)
+    InstagramToken.objects.bulk_update(
+        renewed, ["access_token", "token_expiry", "updated_at"], batch_size=_UPDATE_BATCH_SIZE
+    )
+    return len(renewed), errors
@@ -0,0 +1,97 @@
+"""
+Instagram insights metrik uygunluğu önbelleği.
+Hesap ve kapsam (USER ya da medya tipi) başına her metriğin API tarafından kabul
+edilip edilmediği InstagramMetricCapability'de tutulur. Desteklenmediği bilinen
+metrikler istenmez; INSTAGRAM_CAPABILITY_REPROBE_DAYS geçince bir kez yeniden
+denenir. Yalnızca "geçersiz metrik" (#100) hataları desteklenmiyor sayılır;
+zaman aşımı ve hız sınırı gibi geçici hatalar kaydı değiştirmez.
+"""
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from apps.company.models import InstagramMetricCapability
+
+# Graph API'nin geçersiz parametre/metrik hata kodu
+UNSUPPORTED_METRIC_ERROR_CODE = 100
+
+
+def _error(body):
+    if not isinstance(body, dict):
+        return {}
+    return body.get("error") or {}
+
+
+def is_unsupported(status, body):
+    """Batch alt yanıtı, metriğin bu hesap/medya tipi için desteklenmediğini mi söylüyor."""
+    return status == 400 and _error(body).get("code") == UNSUPPORTED_METRIC_ERROR_CODE
+
+
+class MetricCapabilities:
+    """Tek bir hesabın metrik uygunluğu; load() ile bir kez okunur, save() ile değişenler yazılır."""
+
+    def __init__(self, ig_id):
+        self.ig_id = ig_id
+        self._known = {}
+        self._changed = {}
+        self.now = timezone.now()
+
+    @classmethod
+    def load(cls, ig_id, scopes):
+        capabilities = cls(ig_id)
+        for scope, metric, supported, checked_at in InstagramMetricCapability.objects.filter(
+            ig_account_id=ig_id, scope__in=list(scopes)
+        ).values_list("scope", "metric", "supported", "checked_at"):
+            capabilities._known[(scope, metric)] = (supported, checked_at)
+        return capabilities
+
+    def requestable(self, scope, metrics):
+        """Desteklenmediği bilinen ve yeniden deneme zamanı gelmemiş metrikleri çıkarır."""
+        reprobe_after = self.now - timedelta(
+            days=getattr(settings, "INSTAGRAM_CAPABILITY_REPROBE_DAYS", 7)
+        )
+        requestable = []
+        for metric in metrics:
+            known = self._known.get((scope, metric))
+            if known and not known[0] and known[1] > reprobe_after:
+                continue
+            requestable.append(metric)
+        return requestable
+
+    def record(self, scope, metric, status, body):
+        """Alt yanıt sonucunu işler; geçici hatalar (None, 5xx, hız sınırı) yok sayılır."""
+        if status == 200:
+            supported = True
+        elif is_unsupported(status, body):
+            supported = False
+        else:
+            return
+        known = self._known.get((scope, metric))
+        # Desteklenen metrikler her yenilemede yeniden yazılmaz; yalnızca durum değişince ya da
+        # desteklenmeyen bir metrik yeniden denendiğinde kayıt güncellenir
+        if known and known[0] and supported:
+            return
+        self._known[(scope, metric)] = (supported, self.now)
+        self._changed[(scope, metric)] = InstagramMetricCapability(
+            ig_account_id=self.ig_id,
+            scope=scope,
+            metric=metric,
+            supported=supported,
+            error_message="" if supported else str(_error(body).get("message", ""))[:255],
+            checked_at=self.now,
+        )
+
+    def save(self):
+        if not self._changed:
+            return 0
+        InstagramMetricCapability.objects.bulk_create(
+            list(self._changed.values()),
+            update_conflicts=True,
+            unique_fields=["ig_account_id", "scope", "metric"],
+            update_fields=["supported", "error_message", "checked_at"],
+        )
+        saved = len(self._changed)
+        self._changed = {}
+        return saved
@@ -0,0 +1,182 @@
+"""
+RefreshJob kuyruğu: web isteği işi kuyruğa alıp hemen döner, run_refresh_jobs
+worker'ı işleri sırayla alıp çalıştırır ve bölüm bazında ilerlemeyi kaydeder.
+Aynı şirket/sağlayıcı için aktif bir iş varsa yeni istek o işe bağlanır.
+refresh_stale_accounts zamanlayıcısı da yenilemelerini start_job ile iş olarak
+çalıştırır; böylece worker ve zamanlayıcı aynı şirketi aynı anda yenilemez.
+"""
+
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from apps.accounts.models import CompanyProfile
+from apps.company.models import RefreshJob
+from apps.company.scripts.instagram_reports import SECTION_KEYS
+from apps.company.scripts.refresh_scheduler import refresh_company
+
+# İş oluşturulurken 'pending' olarak işaretlenen bölümler
+INITIAL_SECTIONS = {
+    "ga4": ("report", "daily"),
+    "youtube": ("report",),
+    "instagram": SECTION_KEYS,
+}
+
+
+def fail_stale_jobs():
+    """
+    Worker çökmesi vb. nedenle REFRESH_JOB_TIMEOUT_MINUTES'tan uzun süredir 'running'
+    kalan işleri ve hiçbir worker'ın almadığı, REFRESH_JOB_PENDING_TIMEOUT_MINUTES'tan
+    eski 'pending' işleri başarısız sayar; böylece yeni istekler ölü bir işe bağlanmaz
+    ve zamanlayıcı şirketi yeniden yenileyebilir.
+    """
+    now = timezone.now()
+    running_cutoff = now - timedelta(minutes=getattr(settings, "REFRESH_JOB_TIMEOUT_MINUTES", 30))
+    pending_cutoff = now - timedelta(
+        minutes=getattr(settings, "REFRESH_JOB_PENDING_TIMEOUT_MINUTES", 15)
+    )
+    running = RefreshJob.objects.filter(
+        status=RefreshJob.STATUS_RUNNING, started_at__lt=running_cutoff
+    ).update(status=RefreshJob.STATUS_FAILED, error="İş zaman aşımına uğradı.", finished_at=now)
+    pending = RefreshJob.objects.filter(
+        status=RefreshJob.STATUS_PENDING, created_at__lt=pending_cutoff
+    ).update(
+        status=RefreshJob.STATUS_FAILED,
+        error="İş kuyrukta beklerken zaman aşımına uğradı.",
+        finished_at=now,
+    )
+    return running + pending
+
+
+def _active_job(company, provider):
+    return RefreshJob.objects.filter(
+        company=company, provider=provider, status__in=RefreshJob.ACTIVE_STATUSES
+    ).first()
+
+
+def has_recent_job(company, provider):
+    """
+    Okuma endpointleri için tek sorguluk kontrol: aktif bir iş ya da son
+    REFRESH_ON_READ_THROTTLE_MINUTES içinde açılmış bir iş varsa True.
+    """
+    since = timezone.now() - timedelta(
+        minutes=getattr(settings, "REFRESH_ON_READ_THROTTLE_MINUTES", 5)
+    )
+    return RefreshJob.objects.filter(
+        Q(status__in=RefreshJob.ACTIVE_STATUSES) | Q(created_at__gte=since),
+        company=company,
+        provider=provider,
+    ).exists()
+
+
+def enqueue_refresh_job(company, provider):
+    """
+    Yenileme işini kuyruğa alır. Dönüş: (job, created); aktif bir iş varsa
+    created=False ile o iş döner.
+    """
+    fail_stale_jobs()
+    job = _active_job(company, provider)
+    if job:
+        return job, False
+    try:
+        with transaction.atomic():
+            job = RefreshJob.objects.create(
+                company=company,
+                provider=provider,
+                progress=dict.fromkeys(INITIAL_SECTIONS[provider], "pending"),
+            )
+        return job, True
+    except IntegrityError:
+        # Aynı anda gelen başka bir istek işi oluşturdu
+        job = _active_job(company, provider)
+        if job is None:
+            raise
+        return job, False
+
+
+def start_job(company_id, provider):
+    """
+    Zamanlayıcı için: şirketin aktif işi yoksa yeni bir iş oluşturup doğrudan
+    'running' durumuna alır. Aktif iş varsa ya da iş worker tarafından kapıldıysa None.
+    """
+    job, created = enqueue_refresh_job(CompanyProfile.objects.get(id=company_id), provider)
+    if not created:
+        return None
+    claimed = RefreshJob.objects.filter(id=job.id, status=RefreshJob.STATUS_PENDING).update(
+        status=RefreshJob.STATUS_RUNNING, started_at=timezone.now()
+    )
+    return job if claimed else None
+
+
+def claim_next_job():
+    """Sıradaki bekleyen işi 'running' durumuna alır; başka worker aldıysa sonrakine geçer."""
+    candidates = RefreshJob.objects.filter(status=RefreshJob.STATUS_PENDING).values_list(
+        "id", flat=True
+    )[:10]
+    for job_id in candidates:
+        claimed = RefreshJob.objects.filter(
+            id=job_id, status=RefreshJob.STATUS_PENDING
+        ).update(status=RefreshJob.STATUS_RUNNING, started_at=timezone.now())
+        if claimed:
+            return RefreshJob.objects.get(id=job_id)
+    return None
+
+
+def run_job(job):
+    """İşi çalıştırır; ilerleme her bölümde veritabanına yazılır. Dönüş: hata mesajı ya da None."""
+    progress = dict(job.progress or {})
+    lock = threading.Lock()
+
+    def on_progress(section, status):
+        with lock:
+            progress[section] = status
+            snapshot = dict(progress)
+        RefreshJob.objects.filter(id=job.id).update(progress=snapshot)
+
+    try:
+        refresh_company(job.provider, job.company_id, progress_callback=on_progress)
+    except Exception as e:
+        RefreshJob.objects.filter(id=job.id).update(
+            status=RefreshJob.STATUS_FAILED, error=str(e), finished_at=timezone.now()
+        )
+        return str(e)
+    RefreshJob.objects.filter(id=job.id).update(
+        status=RefreshJob.STATUS_SUCCEEDED, finished_at=timezone.now()
+    )
+    return None
+
+
+def work(stop_event=None, poll_interval=5):
+    """
+    Bir worker thread'inin döngüsü. stop_event verilmezse kuyruk boşalınca döner;
+    verilirse boş kuyrukta poll_interval saniye bekleyip event set edilene kadar devam eder.
+    Dönüş: (başarılı, başarısız) iş sayıları.
+    """
+    succeeded = failed = 0
+    while True:
+        job = claim_next_job()
+        if job is None:
+            if stop_event is None or stop_event.wait(poll_interval):
+                return succeeded, failed
+            continue
+        if run_job(job) is None:
+            succeeded += 1
+        else:
+            failed += 1
+
+
+def serialize_job(job):
+    return {
+        "job_id": job.id,
+        "provider": job.provider,
+        "status": job.status,
+        "progress": job.progress,
+        "error": job.error or None,
+        "created_at": job.created_at,
+        "started_at": job.started_at,
+        "finished_at": job.finished_at,
+    }
@@ -0,0 +1,297 @@
+"""
+Bağlı GA4/YouTube/Instagram hesapları için arka plan yenileme zamanlayıcısı.
+Token tabloları last_data_fetch'e göre taranır, eskimiş şirketler kuyruğa alınır ve
+yenilemeler sağlayıcı başına eşzamanlılık sınırı olan bir iş havuzunda çalıştırılır.
+Her yenileme bir RefreshJob olarak çalışır: aktif işi olan (kullanıcı isteği ya da
+run_refresh_jobs worker'ı) şirketler atlanır, böylece aynı şirket/sağlayıcı iki yoldan
+aynı anda yenilenmez. Art arda başarısız olan şirketler üstel bekleme süresince atlanır.
+Web istekleri yalnızca burada üretilen snapshot'ları (GA4Report, YouTubeReport,
+InstagramReport) okur.
+"""
+
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connections
+from django.db.models import F, Max, Q
+from django.utils import timezone
+
+from apps.accounts.models import CompanyProfile
+from apps.company.models import (
+    GA4Report,
+    GA4Token,
+    InstagramReport,
+    InstagramToken,
+    RefreshJob,
+    YouTubeToken,
+)
+from apps.company.scripts.data_savers import InstagramDataSaver
+from apps.company.scripts.ga4_daily import ingest_ga4_daily
+from apps.company.scripts.ga4_reports import GA4ReportEngine
+from apps.company.scripts.instagram_reports import SECTION_KEYS, get_comprehensive_instagram_data
+from apps.company.scripts.youtube_reports import fetch_youtube_reports_for_company
+
+PROVIDERS = ("ga4", "youtube", "instagram")
+
+# Bağlı sayılmak için dolu olması gereken token alanları
+_TOKEN_MODELS = {
+    "ga4": (GA4Token, ("access_token", "property_id")),
+    "youtube": (YouTubeToken, ("access_token",)),
+    "instagram": (InstagramToken, ("access_token", "instagram_business_account_id")),
+}
+
+
+class RefreshError(Exception):
+    """Bir sağlayıcının verisi yenilenemediğinde fırlatılır."""
+
+
+def _connected_tokens(provider):
+    model, required = _TOKEN_MODELS[provider]
+    tokens = model.objects.all()
+    for field in required:
+        tokens = tokens.exclude(**{f"{field}__isnull": True}).exclude(**{field: ""})
+    return tokens
+
+
+def find_stale_companies(provider, max_age, limit=None):
+    """
+    Verisi max_age'den eski (veya hiç çekilmemiş) bağlı şirketlerin id'leri;
+    en eski last_data_fetch önce gelir. Hata sonrası bekleme süresindeki ve aktif
+    yenileme işi olan şirketler dahil edilmez.
+    """
+    now = timezone.now()
+    cutoff = now - max_age
+    active_jobs = RefreshJob.objects.filter(
+        provider=provider, status__in=RefreshJob.ACTIVE_STATUSES
+    ).values("company_id")
+    company_ids = (
+        _connected_tokens(provider)
+        .filter(Q(last_data_fetch__isnull=True) | Q(last_data_fetch__lt=cutoff))
+        .filter(Q(next_refresh_after__isnull=True) | Q(next_refresh_after__lte=now))
+        .exclude(company_id__in=active_jobs)
+        .order_by(F("last_data_fetch").asc(nulls_first=True))
+        .values_list("company_id", flat=True)
+    )
+    # Aynı şirkete ait birden çok token olabilir
+    company_ids = list(dict.fromkeys(company_ids))
+    return company_ids[:limit] if limit else company_ids
+
+
+def request_refresh(provider, company):
+    """Şirketi bir sonraki zamanlayıcı turunda öne alır (hata sonrası beklemeyi de kaldırır)."""
+    model, _ = _TOKEN_MODELS[provider]
+    return (
+        model.objects.filter(company=company).update(last_data_fetch=None, next_refresh_after=None)
+        > 0
+    )
+
+
+def is_connected(provider, company):
+    return _connected_tokens(provider).filter(company=company).exists()
+
+
+def _mark_fetched(provider, company):
+    model, _ = _TOKEN_MODELS[provider]
+    model.objects.filter(company=company).update(
+        last_data_fetch=timezone.now(), refresh_failures=0, next_refresh_after=None
+    )
+
+
+def failure_backoff(failures):
+    """n. art arda hatadan sonra beklenecek süre: taban süre * 2^(n-1), üst sınırlı."""
+    base = getattr(settings, "REFRESH_FAILURE_BACKOFF_MINUTES", 15)
+    ceiling = getattr(settings, "REFRESH_FAILURE_BACKOFF_MAX_MINUTES", 1440)
+    return timedelta(minutes=min(base * 2 ** min(failures - 1, 16), ceiling))
+
+
+def _mark_failed(provider, company):
+    model, _ = _TOKEN_MODELS[provider]
+    tokens = model.objects.filter(company=company)
+    failures = (tokens.aggregate(failures=Max("refresh_failures"))["failures"] or 0) + 1
+    tokens.update(
+        refresh_failures=failures,
+        next_refresh_after=timezone.now() + failure_backoff(failures),
+    )
+
+
+def build_ga4_report_data(company_profile, token, client_id, client_secret):
+    """GA4 snapshot'ının report_data JSON'unu üretir (tek batchRunReports çağrısı)."""
+    engine = GA4ReportEngine.for_company(company_profile, token.property_id, client_id, client_secret)
+    reports = engine.run(["userAcquisitionSource", "deviceCategory", "country", "age", "userGender"])
+    summary = reports["userAcquisitionSource"]
+    return {
+        "summary": {
+            "total_users": sum([item.get("new_users", 0) for item in summary]),
+            "conversions": sum([item.get("conversions", 0) for item in summary]),
+            "conversion_rate": 0,  # Eklenebilir
+            "avg_session_duration": 0,  # Eklenebilir
+        },
+        "traffic_sources": reports["userAcquisitionSource"],
+        "device_categories": reports["deviceCategory"],
+        "geo": reports["country"],
+        "daily": [],  # Günlük kullanıcı için ek fonksiyon eklenebilir
+        "demographics": {
+            "age": reports["age"],
+            "gender": reports["userGender"],
+        },
+    }
+
+
+def refresh_ga4(company_profile, progress_callback=None):
+    token = _connected_tokens("ga4").filter(company=company_profile).first()
+    if not token:
+        raise RefreshError("GA4 bağlantısı veya property ID eksik.")
+    client_id = getattr(settings, "GOOGLE_CLIENT_ID", None)
+    client_secret = getattr(settings, "GOOGLE_CLIENT_SECRET", None)
+    if not client_id or not client_secret:
+        raise RefreshError("GA4 client ID veya secret eksik.")
+    report_data = build_ga4_report_data(company_profile, token, client_id, client_secret)
+    GA4Report.objects.create(company=company_profile, report_data=report_data)
+    if progress_callback:
+        progress_callback("report", "done")
+
+    # Günlük fact'ler snapshot'tan bağımsızdır; hata olursa bir sonraki yenilemede
+    # aynı günden devam edilir
+    try:
+        ingest_ga4_daily(
+            company_profile,
+            GA4ReportEngine.for_company(company_profile, token.property_id, client_id, client_secret),
+        )
+        status = "done"
+    except Exception as e:
+        print(f"❌ GA4 günlük veri hatası: {e}")
+        status = "failed"
+    if progress_callback:
+        progress_callback("daily", status)
+
+
+def refresh_youtube(company_profile, progress_callback=None):
+    success, errors = fetch_youtube_reports_for_company(company_profile)
+    if not success:
+        raise RefreshError("; ".join(errors))
+    if progress_callback:
+        progress_callback("report", "done")
+
+
+def save_instagram_report(company_profile, data):
+    return InstagramReport.objects.create(
+        company=company_profile,
+        basic_info=data.get("basic_info", {}),
+        media_data=data.get("media_data", {}),
+        # Kırılımlar InstagramDemographic tablosunda; snapshot'ta yalnızca kalan alanlar tutulur
+        demographics={
+            key: value
+            for key, value in (data.get("demographics") or {}).items()
+            if not key.startswith("follower_demographics_")
+        },
+        user_insights=data.get("user_insights", {}),
+        calculated_metrics=data.get("calculated_metrics", {}),
+        story_insights=data.get("story_insights") or [],
+    )
+
+
+def refresh_instagram(company_profile, progress_callback=None):
+    token = _connected_tokens("instagram").filter(company=company_profile).first()
+    if not token:
+        raise RefreshError("Instagram hesabı bağlı değil veya token eksik.")
+    data = get_comprehensive_instagram_data(
+        token.instagram_business_account_id,
+        token.access_token,
+        progress_callback=progress_callback,
+    )
+    # Bölüm hataları içeride yutulur (ör. süresi dolmuş token); boş snapshot
+    # kaydedilirse okuyucular onu görür ve şirket taze sayılıp yeniden denenmez
+    if not data.get("basic_info") or not any(data.get(key) for key in SECTION_KEYS):
+        raise RefreshError("Instagram verisi alınamadı (temel bilgiler boş).")
+    InstagramDataSaver.save_comprehensive(token.instagram_business_account_id, data)
+    save_instagram_report(company_profile, data)
+
+
+REFRESHERS = {
+    "ga4": refresh_ga4,
+    "youtube": refresh_youtube,
+    "instagram": refresh_instagram,
+}
+
+
+def provider_limits():
+    """Sağlayıcı başına eşzamanlı yenileme sınırı."""
+    limits = getattr(settings, "REFRESH_PROVIDER_CONCURRENCY", {})
+    return {provider: max(int(limits.get(provider, 2)), 1) for provider in PROVIDERS}
+
+
+def refresh_company(provider, company_id, progress_callback=None):
+    """
+    Tek bir şirket/sağlayıcı yenilemesi; başarılıysa last_data_fetch güncellenir,
+    başarısızsa şirket failure_backoff süresince zamanlayıcıda atlanır.
+    progress_callback(section, status) bölüm bazında ilerleme bildirir.
+    """
+    company_profile = CompanyProfile.objects.get(id=company_id)
+    try:
+        REFRESHERS[provider](company_profile, progress_callback=progress_callback)
+    except Exception:
+        _mark_failed(provider, company_profile)
+        raise
+    _mark_fetched(provider, company_profile)
+
+
+def _run_task(provider, company_id):
+    """Görevi RefreshJob olarak çalıştırır; şirketin aktif bir işi varsa atlar."""
+    from apps.company.scripts.refresh_jobs import run_job, start_job
+
+    try:
+        job = start_job(company_id, provider)
+        if job is None:
+            print(f"ℹ️ {provider} company={company_id}: aktif yenileme işi var, atlandı")
+            return None
+        return run_job(job)
+    except Exception as e:
+        return str(e)
+    finally:
+        # İş parçacığına ait veritabanı bağlantısını bırak
+        connections.close_all()
+
+
+def run_refreshes(tasks, limits=None):
+    """
+    (provider, company_id) görevlerini çalıştırır. Her sağlayıcının kendi iş havuzu
+    vardır; aynı anda en fazla limits[provider] görev çalışır ve yavaş bir sağlayıcı
+    diğerlerini bekletmez.
+    Dönüş: [(provider, company_id, hata mesajı ya da None), ...]
+    """
+    limits = limits or provider_limits()
+    executors = {}
+    futures = {}
+    try:
+        for provider, company_id in tasks:
+            if provider not in executors:
+                executors[provider] = ThreadPoolExecutor(
+                    max_workers=limits.get(provider, 1),
+                    thread_name_prefix=f"refresh-{provider}",
+                )
+            future = executors[provider].submit(_run_task, provider, company_id)
+            futures[future] = (provider, company_id)
+        results = []
+        for future in as_completed(futures):
+            provider, company_id = futures[future]
+            results.append((provider, company_id, future.result()))
+        return results
+    finally:
+        for executor in executors.values():
+            executor.shutdown(wait=True)
+
+
+def collect_stale_tasks(providers=PROVIDERS, max_age=None, limit=None):
+    """Seçilen sağlayıcılar için eskimiş (provider, company_id) görevleri."""
+    from apps.company.scripts.refresh_jobs import fail_stale_jobs
+
+    # Zaman aşımına uğramış işler şirketi seçimden dışlamasın
+    fail_stale_jobs()
+    if max_age is None:
+        max_age = timedelta(minutes=getattr(settings, "REFRESH_STALE_AFTER_MINUTES", 60))
+    return [
+        (provider, company_id)
+        for provider in providers
+        for company_id in find_stale_companies(provider, max_age, limit)
+    ]
@@ -0,0 +1,140 @@
+"""
+Rapor snapshot geçmişi (GA4Report, YouTubeReport, InstagramReport).
+Her yenileme yeni bir 'raw' snapshot ekler. prune_snapshots komutu eski
+snapshot'ları indirger:
+- SNAPSHOT_RAW_DAYS'ten eski olanlar şirket başına haftada bire ('week') iner.
+- SNAPSHOT_WEEKLY_DAYS'ten eski olanlar ayda bire ('month') iner.
+- SNAPSHOT_RETENTION_DAYS'ten eski olanlar silinir; şirketin en yeni snapshot'ı
+  ne kadar eski olursa olsun tutulur.
+Her dönemde o dönemin en son snapshot'ı tutulur. Snapshot'lar anlık durum
+olduğu için dönem sonu değeri, o dönemin temsilcisidir.
+"""
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from apps.company.models import GA4Report, InstagramReport, YouTubeReport
+
+SNAPSHOT_MODELS = {
+    "ga4": GA4Report,
+    "youtube": YouTubeReport,
+    "instagram": InstagramReport,
+}
+
+_DELETE_BATCH_SIZE = 500
+
+
+def _week_bucket(fetched_at):
+    year, week, _ = timezone.localtime(fetched_at).isocalendar()
+    return (year, week)
+
+
+def _month_bucket(fetched_at):
+    local = timezone.localtime(fetched_at)
+    return (local.year, local.month)
+
+
+def _collapse(model, rows, bucket, granularity, dry_run):
+    """
+    (id, company_id, fetched_at, granularity) satırlarını şirket + dönem bazında
+    gruplar. Her grubun en yeni satırını granularity olarak işaretler, diğerlerini siler.
+    Dönüş: (işaretlenen, silinen) sayıları.
+    """
+    keepers = {}
+    doomed = []
+    for row_id, company_id, fetched_at, current in rows:
+        key = (company_id, bucket(fetched_at))
+        kept = keepers.get(key)
+        if kept is None or fetched_at > kept[1]:
+            if kept is not None:
+                doomed.append(kept[0])
+            keepers[key] = (row_id, fetched_at, current)
+        else:
+            doomed.append(row_id)
+
+    promote = [row_id for row_id, _, current in keepers.values() if current != granularity]
+    if not dry_run:
+        with transaction.atomic():
+            model.objects.filter(id__in=promote).update(granularity=granularity)
+            _delete_ids(model, doomed)
+    return len(promote), len(doomed)
+
+
+def _delete_ids(model, ids):
+    # post_delete sinyalleri için yalnızca id ve company_id yüklenir, JSON kolonları okunmaz
+    for start in range(0, len(ids), _DELETE_BATCH_SIZE):
+        model.objects.filter(id__in=ids[start:start + _DELETE_BATCH_SIZE]).only(
+            "id", "company_id"
+        ).delete()
+
+
+def _rows(model, **filters):
+    return (
+        model.objects.filter(**filters)
+        .order_by()
+        .values_list("id", "company_id", "fetched_at", "granularity")
+        .iterator()
+    )
+
+
+def compact_snapshots(model, now=None, dry_run=False):
+    """
+    Tek bir rapor modelinin snapshot geçmişini indirger.
+    Dönüş: {'week', 'month', 'deleted'} sayaçları. 'deleted', indirgeme ve
+    saklama süresi nedeniyle silinen snapshot'ların toplamıdır.
+    """
+    now = now or timezone.now()
+    raw_cutoff = now - timedelta(days=getattr(settings, "SNAPSHOT_RAW_DAYS", 14))
+    weekly_cutoff = now - timedelta(days=getattr(settings, "SNAPSHOT_WEEKLY_DAYS", 180))
+    retention_cutoff = now - timedelta(days=getattr(settings, "SNAPSHOT_RETENTION_DAYS", 730))
+    stats = {"week": 0, "month": 0, "deleted": 0}
+
+    # Okuyucular .first() ile en yeni snapshot'ı bekler; şirketin tek/son snapshot'ı silinmez
+    newer = model.objects.filter(company=OuterRef("company"), fetched_at__gt=OuterRef("fetched_at"))
+    expired = list(
+        model.objects.filter(fetched_at__lt=retention_cutoff)
+        .filter(Exists(newer))
+        .values_list("id", flat=True)
+    )
+    if not dry_run:
+        _delete_ids(model, expired)
+    stats["deleted"] += len(expired)
+
+    promoted, deleted = _collapse(
+        model,
+        _rows(
+            model,
+            fetched_at__gte=weekly_cutoff,
+            fetched_at__lt=raw_cutoff,
+            granularity__in=["raw", "week"],
+        ),
+        _week_bucket,
+        "week",
+        dry_run,
+    )
+    stats["week"] += promoted
+    stats["deleted"] += deleted
+
+    promoted, deleted = _collapse(
+        model,
+        _rows(model, fetched_at__gte=retention_cutoff, fetched_at__lt=weekly_cutoff),
+        _month_bucket,
+        "month",
+        dry_run,
+    )
+    stats["month"] += promoted
+    stats["deleted"] += deleted
+    return stats
+
+
+def snapshot_history(model, company, since, *columns):
+    """Şirketin since'ten itibaren snapshot'ları (eskiden yeniye), yalnızca istenen kolonlarla."""
+    return (
+        model.objects.filter(company=company, fetched_at__gte=since)
+        .order_by("fetched_at")
+        .values("fetched_at", "granularity", *columns)
+    )
@@ -1,62 +1,383 @@
 """
-YouTube API'den rapor verisi çekmek için modern ve sade fonksiyonlar.
+YouTube Analytics API'den rapor verisi çeken fonksiyonlar.
+trafficSource ve deviceType raporları 'day' kırılımında, YOUTUBE_WINDOW_DAYS'lik
+pencerelerle ve startIndex sayfalamasıyla çekilip YouTubeDailyMetric'e yazılır;
+sonraki çalıştırmalar yalnızca son başarılı pencereden sonraki günleri ister.
+Snapshot'taki bölümler bu fact'lerin son YOUTUBE_REPORT_WINDOW_DAYS günlük
+toplamından üretilir. ageGroup yüzdeleri günlere bölünemediğinden pencere
+toplamı olarak çekilir.
+
+Discovery dokümanı süreç başına bir kez okunur, servis nesnesi şirket başına
+önbelleğe alınır ve tüm rapor tiplerinde kullanılır.
 """
 
+from collections import defaultdict, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from functools import lru_cache
+import json
+import sys
+import threading
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Sum
+from django.utils import timezone
 from google.oauth2.credentials import Credentials
-from googleapiclient.discovery import build
+from google_auth_httplib2 import AuthorizedHttp
+from googleapiclient.discovery import build, build_from_document
+from googleapiclient.discovery_cache import get_static_doc
 from googleapiclient.errors import HttpError
-import json
+from googleapiclient.http import build_http
 
-def get_youtube_report(report_type, access_token, refresh_token, client_id, client_secret):
-    """YouTube Analytics API'den ilgili raporu çeker."""
-    try:
+from apps.company.credentials import credential_provider
+from apps.company.models import (
+    YouTubeDailyMetric,
+    YouTubeIngestState,
+    YouTubeReport,
+)
+
+YOUTUBE_TOKEN_URI = "https://oauth2.googleapis.com/token"
+
+# report_type -> boyut(lar), metrikler, snapshot'taki bölüm ve gün kırılımında çekilip çekilmediği
+YOUTUBE_REPORTS = {
+    "trafficSource": {
+        "dimensions": "insightTrafficSourceType",
+        "metrics": ("views", "estimatedMinutesWatched"),
+        "section": "traffic_sources",
+        "daily": True,
+    },
+    "ageGroup": {
+        "dimensions": "ageGroup,gender",
+        "metrics": ("viewerPercentage",),
+        "section": "age_groups",
+        "daily": False,
+    },
+    "deviceType": {
+        "dimensions": "deviceType",
+        "metrics": ("views", "estimatedMinutesWatched"),
+        "section": "device_types",
+        "daily": True,
+    },
+}
+
+YOUTUBE_REPORT_TYPES = list(YOUTUBE_REPORTS)
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+YouTubeClient = namedtuple("YouTubeClient", ["service", "credentials"])
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+@lru_cache(maxsize=None)
+def _discovery_document(api, version):
+    """google-api-python-client ile gelen statik discovery dokümanı (süreç başına bir kez okunur)."""
+    return get_static_doc(api, version)
+
+
+def get_youtube_client(cache_key, access_token, refresh_token, client_id, client_secret):
+    """
+    cache_key (ör. şirket id) başına tek bir youtubeAnalytics servisi tutar.
+    Token'lar credential_provider'dan gelir; yenilenen token farklı olduğu için
+    servis yeniden oluşturulur.
+    """
+    fingerprint = (access_token, refresh_token, client_id)
+    with _clients_lock:
+        cached = _clients.get(cache_key)
+        if cached and cached[0] == fingerprint:
+            return cached[1]
         creds = Credentials(
             token=access_token,
             refresh_token=refresh_token,
-            token_uri="https://oauth2.googleapis.com/token",
+            token_uri=YOUTUBE_TOKEN_URI,
             client_id=client_id,
             client_secret=client_secret,
         )
-        service = build("youtubeAnalytics", "v2", credentials=creds)
-        if report_type == "trafficSource":
-            response = service.reports().query(
-                ids="channel==MINE",
-                startDate="2025-01-01",
-                endDate="2025-06-01",
-                dimensions="insightTrafficSourceType",
-                metrics="views,averageViewDuration,estimatedMinutesWatched",
-                sort="-views",
-                maxResults=25,
-            ).execute()
-        elif report_type == "ageGroup":
-            response = service.reports().query(
-                ids="channel==MINE",
-                startDate="2025-01-01",
-                endDate="2025-06-01",
-                dimensions="ageGroup,gender",
-                metrics="viewerPercentage",
-                sort="-viewerPercentage",
-                maxResults=25,
-            ).execute()
-        elif report_type == "deviceType":
-            response = service.reports().query(
-                ids="channel==MINE",
-                startDate="2025-01-01",
-                endDate="2025-06-01",
-                dimensions="deviceType",
-                metrics="views,averageViewDuration,estimatedMinutesWatched",
-                sort="-views",
-                maxResults=25,
-            ).execute()
+        document = _discovery_document("youtubeAnalytics", "v2")
+        if document:
+            service = build_from_document(document, credentials=creds)
         else:
-            return []
+            service = build("youtubeAnalytics", "v2", credentials=creds)
+        client = YouTubeClient(service, creds)
+        _clients[cache_key] = (fingerprint, client)
+        return client
+
+
+def _thread_http(credentials):
+    """
+    Servisin httplib2 bağlantısı thread-safe olmadığından paralel sorgular kendi
+    yetkili bağlantılarıyla çalışır.
+    """
+    if credentials is None:
+        return None
+    return AuthorizedHttp(credentials, http=build_http())
+
+
+def http_error_message(error):
+    try:
+        return json.loads(error.content.decode("utf-8")).get("error", {}).get("message", str(error))
+    except Exception:
+        return str(error)
+
+
+def query_report(service, report_type, start_date, end_date, daily=False, page_size=None, http=None):
+    """
+    Raporun tüm sayfalarını startIndex ile çeker: [satır dict, ...].
+    daily=True ise ilk boyut 'day' olur ve satırlar gün sırasıyla gelir.
+    http verilirse istekler servisin kendi bağlantısı yerine onunla gönderilir.
+    """
+    spec = YOUTUBE_REPORTS[report_type]
+    page_size = page_size or _setting("YOUTUBE_PAGE_SIZE", 200)
+    params = {
+        "ids": "channel==MINE",
+        "startDate": start_date,
+        "endDate": end_date,
+        "dimensions": f"day,{spec['dimensions']}" if daily else spec["dimensions"],
+        "metrics": ",".join(spec["metrics"]),
+        "sort": "day" if daily else f"-{spec['metrics'][0]}",
+        "maxResults": page_size,
+    }
+    rows = []
+    start_index = 1
+    while True:
+        response = service.reports().query(startIndex=start_index, **params).execute(http=http)
         headers = [h["name"] for h in response.get("columnHeaders", [])]
-        return [dict(zip(headers, row)) for row in response.get("rows", [])]
-    except HttpError as e:
+        page = [dict(zip(headers, row)) for row in response.get("rows", [])]
+        rows.extend(page)
+        if len(page) < page_size:
+            return rows
+        start_index += page_size
+
+
+def _windows(start, end, size):
+    """[start, end] aralığını en fazla size günlük (başlangıç, bitiş) pencerelere böler."""
+    while start <= end:
+        window_end = min(start + timedelta(days=size - 1), end)
+        yield start, window_end
+        start = window_end + timedelta(days=1)
+
+
+def _store_window(company, report_type, rows, window_start, window_end):
+    """Penceredeki günlük satırları fact tablosuna yazar ve pencereyi başarılı olarak işaretler."""
+    spec = YOUTUBE_REPORTS[report_type]
+    dimension = spec["dimensions"]
+    facts = {}
+    for row in rows:
+        day = datetime.strptime(row["day"], "%Y-%m-%d").date()
+        dimension_value = str(row[dimension])[:255]
+        for metric in spec["metrics"]:
+            facts[(dimension_value, day, metric)] = YouTubeDailyMetric(
+                company=company,
+                report_type=report_type,
+                dimension_value=dimension_value,
+                date=day,
+                metric=metric,
+                value=row.get(metric) or 0,
+            )
+    with transaction.atomic():
+        YouTubeDailyMetric.objects.filter(
+            company=company, report_type=report_type, date__range=(window_start, window_end)
+        ).delete()
+        YouTubeDailyMetric.objects.bulk_create(list(facts.values()), batch_size=1000)
+        YouTubeIngestState.objects.update_or_create(
+            company=company,
+            report_type=report_type,
+            defaults={"last_window_end": window_end},
+        )
+    return len(facts)
+
+
+def _ingest_start(company, report_type, today):
+    """Son başarılı pencereden YOUTUBE_RESTATE_DAYS geriye; hiç çekilmediyse YOUTUBE_BACKFILL_DAYS geriye."""
+    last = (
+        YouTubeIngestState.objects.filter(company=company, report_type=report_type)
+        .values_list("last_window_end", flat=True)
+        .first()
+    )
+    if last:
+        return last - timedelta(days=_setting("YOUTUBE_RESTATE_DAYS", 3))
+    return today - timedelta(days=_setting("YOUTUBE_BACKFILL_DAYS", 90))
+
+
+def _fetch(client, report_type, start, end, parallel=False):
+    """
+    Rapor tipinin verisini API'den çeker; veritabanına dokunmadığı için havuz
+    thread'inde çalışabilir. Günlük raporlarda (pencereler, hata) döner ve hata
+    olursa o ana kadar çekilen pencereler korunur; diğerlerinde (satırlar, hata).
+    """
+    http = _thread_http(client.credentials) if parallel else None
+    if not YOUTUBE_REPORTS[report_type]["daily"]:
+        try:
+            rows = query_report(
+                client.service, report_type, start.isoformat(), end.isoformat(), http=http
+            )
+        except Exception as e:
+            return None, e
+        return rows, None
+
+    windows = []
+    for window_start, window_end in _windows(start, end, _setting("YOUTUBE_WINDOW_DAYS", 30)):
+        try:
+            rows = query_report(
+                client.service,
+                report_type,
+                window_start.isoformat(),
+                window_end.isoformat(),
+                daily=True,
+                http=http,
+            )
+        except Exception as e:
+            return windows, e
+        windows.append((window_start, window_end, rows))
+    return windows, None
+
+
+def section_rows(company, report_type, since):
+    """
+    Fact'lerden snapshot bölümü üretir; satırlar API yanıtıyla aynı anahtarları
+    taşır. averageViewDuration günlere toplanamadığından izlenme süresinden hesaplanır.
+    """
+    dimension = YOUTUBE_REPORTS[report_type]["dimensions"]
+    totals = defaultdict(dict)
+    for row in (
+        YouTubeDailyMetric.objects.filter(company=company, report_type=report_type, date__gte=since)
+        .values("dimension_value", "metric")
+        .annotate(total=Sum("value"))
+        .order_by()
+    ):
+        totals[row["dimension_value"]][row["metric"]] = row["total"]
+
+    rows = []
+    for value, metrics in totals.items():
+        views = int(metrics.get("views", 0))
+        minutes = metrics.get("estimatedMinutesWatched", 0)
+        rows.append(
+            {
+                dimension: value,
+                "views": views,
+                "averageViewDuration": round(minutes * 60 / views) if views else 0,
+                "estimatedMinutesWatched": int(minutes),
+            }
+        )
+    rows.sort(key=lambda row: row["views"], reverse=True)
+    return rows
+
+
+def daily_rows(company, since):
+    """Kanalın gün bazında izlenme ve izlenme süresi toplamları (trafik kaynağı fact'lerinden)."""
+    days = defaultdict(dict)
+    for row in (
+        YouTubeDailyMetric.objects.filter(company=company, report_type="trafficSource", date__gte=since)
+        .values("date", "metric")
+        .annotate(total=Sum("value"))
+        .order_by("date")
+    ):
+        days[row["date"]][row["metric"]] = int(row["total"])
+    return [
+        {
+            "day": day.isoformat(),
+            "views": metrics.get("views", 0),
+            "estimatedMinutesWatched": metrics.get("estimatedMinutesWatched", 0),
+        }
+        for day, metrics in days.items()
+    ]
+
+
+def fetch_youtube_reports_for_company(company_profile, service=None):
+    """
+    Şirketin YouTube raporlarını çekip yeni bir YouTubeReport snapshot'ında birleştirir.
+    YOUTUBE_QUERY_CONCURRENCY > 1 ise rapor tipleri paralel sorgulanır; yazımlar
+    her durumda bu thread'de yapılır. Dışarıdan verilen service'in kimlik bilgisi
+    olmadığından thread başına bağlantı kurulamaz; bu durumda sorgular sıralıdır.
+    """
+    # Token credential_provider'dan alınır; süresi dolmak üzereyse bir kez yenilenip kaydedilir
+    credentials = credential_provider.get(company_profile.id, "youtube")
+    if credentials is None:
+        print('[YouTubeReport][DEBUG] YouTube bağlantısı yok.', file=sys.stderr)
+        return False, ['YouTube bağlantısı yok.']
+    if service is None:
+        client = get_youtube_client(
+            company_profile.id,
+            credentials.access_token,
+            credentials.refresh_token,
+            settings.YOUTUBE_CLIENT_ID,
+            settings.YOUTUBE_CLIENT_SECRET,
+        )
+    else:
+        client = YouTubeClient(service, None)
+
+    today = timezone.localdate()
+    since = today - timedelta(days=_setting("YOUTUBE_REPORT_WINDOW_DAYS", 90))
+    starts = {
+        report_type: _ingest_start(company_profile, report_type, today) if spec["daily"] else since
+        for report_type, spec in YOUTUBE_REPORTS.items()
+    }
+    concurrency = min(_setting("YOUTUBE_QUERY_CONCURRENCY", 1), len(YOUTUBE_REPORTS))
+    # Paylaşılan servisin httplib2 bağlantısı thread-safe değil
+    if concurrency > 1 and client.credentials is not None:
+        with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="youtube") as executor:
+            futures = {
+                report_type: executor.submit(_fetch, client, report_type, start, today, True)
+                for report_type, start in starts.items()
+            }
+            fetched = {report_type: future.result() for report_type, future in futures.items()}
+    else:
+        fetched = {
+            report_type: _fetch(client, report_type, start, today)
+            for report_type, start in starts.items()
+        }
+
+    successful = 0
+    failed = 0
+    errors = []
+    # Tüm raporları tek bir JSON'da biriktir
+    combined_report_data = {}
+    for report_type, spec in YOUTUBE_REPORTS.items():
+        data, error = fetched[report_type]
         try:
-            error = json.loads(e.content.decode("utf-8"))
-            return [{"error": error.get("error", {}).get("message", str(e))}]
-        except:
-            return [{"error": str(e)}]
-    except Exception as e:
-        return [{"error": str(e)}]
+            if spec["daily"]:
+                # Hata olsa bile başarıyla çekilen pencereler kaydedilir
+                stored = sum(
+                    _store_window(company_profile, report_type, rows, window_start, window_end)
+                    for window_start, window_end, rows in data
+                )
+                print(
+                    f'[YouTubeReport][DEBUG] {report_type}: {starts[report_type]} - {today}, {stored} fact',
+                    file=sys.stderr,
+                )
+            if error is not None:
+                raise error
+            if spec["daily"]:
+                data = section_rows(company_profile, report_type, since)
+            combined_report_data[spec["section"]] = data
+            successful += 1
+        except HttpError as e:
+            failed += 1
+            message = http_error_message(e)
+            print(f'[YouTubeReport][ERROR] {report_type} hatası: {message}', file=sys.stderr)
+            errors.append(f"{report_type}: {message}")
+        except Exception as e:
+            failed += 1
+            print(f'[YouTubeReport][ERROR] {report_type} hatası: {e}', file=sys.stderr)
+            errors.append(f"{report_type}: {str(e)}")
+    # Eğer en az bir rapor çekildiyse, kaydet
+    if successful > 0:
+        if "traffic_sources" in combined_report_data:
+            combined_report_data["daily"] = daily_rows(company_profile, since)
+        # Her yenileme geçmişe yeni bir snapshot ekler; çekilemeyen bölümler son snapshot'tan taşınır
+        report_data = (
+            YouTubeReport.objects.filter(company=company_profile)
+            .values_list('report_data', flat=True)
+            .first()
+        ) or {}
+        report_data.update(combined_report_data)
+        YouTubeReport.objects.create(company=company_profile, report_data=report_data)
+        print(f'[YouTubeReport][DEBUG] Tüm raporlar YouTubeReport tablosuna kaydedildi.', file=sys.stderr)
+        return True, []
+    print(f'[YouTubeReport][DEBUG] Sonuç: {successful} başarılı, {failed} başarısız', file=sys.stderr)
+    return False, errors
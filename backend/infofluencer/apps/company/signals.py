@@ -0,0 +1,33 @@
+"""
+Rapor modelleri yazıldığında şirketin dashboard önbelleğini, token'lar
+değiştiğinde credential önbelleğini geçersiz kılan sinyaller.
+"""
+
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .cache import bump_company_data_version_on_commit
+from .credentials import credential_provider
+from .models import GA4Report, GA4Token, InstagramReport, YouTubeReport, YouTubeToken
+
+
+@receiver(post_save, sender=GA4Report)
+@receiver(post_save, sender=YouTubeReport)
+@receiver(post_save, sender=InstagramReport)
+@receiver(post_delete, sender=GA4Report)
+@receiver(post_delete, sender=YouTubeReport)
+@receiver(post_delete, sender=InstagramReport)
+def invalidate_company_dashboard_cache(sender, instance, **kwargs):
+    bump_company_data_version_on_commit(instance.company_id)
+
+
+@receiver(post_save, sender=GA4Token)
+@receiver(post_delete, sender=GA4Token)
+def invalidate_ga4_credentials(sender, instance, **kwargs):
+    credential_provider.invalidate(instance.company_id, "ga4")
+
+
+@receiver(post_save, sender=YouTubeToken)
+@receiver(post_delete, sender=YouTubeToken)
+def invalidate_youtube_credentials(sender, instance, **kwargs):
+    credential_provider.invalidate(instance.company_id, "youtube")
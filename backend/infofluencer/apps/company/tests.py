@@ -1,3 +1,1768 @@
-from django.test import TestCase
+import json
+import threading
+import time
+from datetime import datetime, timedelta
+from unittest import mock
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
 
-# Create your tests here.
+import numpy as np
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from apps.accounts.models import CompanyProfile
+from apps.company.credentials import credential_provider
+from apps.company.helpers import instagram_breakdown
+from apps.company.models import (
+    CompanyDataVersion,
+    GA4AgeData,
+    GA4CountryData,
+    GA4DailyMetric,
+    GA4DeviceCategoryData,
+    GA4MetricRollup,
+    GA4OperatingSystemData,
+    GA4Report,
+    GA4SessionSourceMediumData,
+    GA4Token,
+    GA4UserAcquisitionSourceData,
+    GA4UserGenderData,
+    InstagramAccountDailyMetric,
+    InstagramComment,
+    InstagramDemographic,
+    InstagramMedia,
+    InstagramMediaCursor,
+    InstagramMediaMetric,
+    InstagramMetricCapability,
+    InstagramReport,
+    InstagramToken,
+    OAuthState,
+    RefreshJob,
+    YouTubeAgeGroupData,
+    YouTubeDailyMetric,
+    YouTubeIngestState,
+    YouTubeReport,
+    YouTubeToken,
+    YouTubeTopSubscribersData,
+)
+from apps.company.cache import (
+    bump_company_data_version,
+    dashboard_cache_timeout,
+    get_company_data_version,
+)
+from apps.company.scripts.comment_analytics import analyze_comment_texts
+from apps.company.scripts.data_savers import GA4DataSaver, InstagramDataSaver, YouTubeDataSaver
+from apps.company.scripts import graph_rate, instagram_media, refresh_jobs, refresh_scheduler
+from apps.company.scripts.ga4_daily import ingest_ga4_daily
+from apps.company.scripts.graph_batch import GRAPH_BATCH_LIMIT, graph_batch_get
+from apps.company.scripts.graph_client import graph_get, graph_url, reset_graph_session
+from apps.company.scripts.graph_rate import GraphRateGovernor
+from apps.company.scripts.instagram_comments import ingest_comments
+from apps.company.scripts.instagram_media import ingest_media, media_payload
+from apps.company.scripts.instagram_metrics import score_accounts
+from apps.company.scripts.instagram_tokens import expiring_tokens, renew_tokens
+from apps.company.scripts.snapshot_history import compact_snapshots
+from apps.company.scripts.ga4_reports import GA4ReportEngine
+from apps.company.scripts.youtube_reports import (
+    YouTubeClient,
+    fetch_youtube_reports_for_company,
+    get_youtube_client,
+)
+from apps.company.scripts import instagram_reports
+from apps.company.scripts.instagram_reports import (
+    calculate_advanced_metrics,
+    get_media_insights_batch,
+    get_user_insights_comprehensive,
+)
+
+
+class FakeGraphHandler(BaseHTTPRequestHandler):
+    """Graph API batch uç noktasını taklit eden sahte sunucu."""
+
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        form = parse_qs(self.rfile.read(length).decode("utf-8"))
+        batch = json.loads(form["batch"][0])
+        self.server.batches.append(
+            {"access_token": form["access_token"][0], "items": batch}
+        )
+        if len(batch) > GRAPH_BATCH_LIMIT:
+            self._send(400, {"error": {"message": "Too many requests in batch"}})
+            return
+        self._send(200, [self._answer(item) for item in batch])
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        params = {k: v[0] for k, v in parse_qs(url.query).items()}
+        if url.path.endswith("/oauth/access_token"):
+            # Kod değişimi: her deneme sayılır, sunucu hep 5xx döner
+            self.server.oauth_requests.append(params)
+            self._send(502, {"error": {"message": "bad gateway"}})
+            return
+        if url.path.endswith("/comments"):
+            self._send(200, self._comments_page(params))
+            return
+        if not url.path.endswith("/media"):
+            self._send(404, {"error": {"message": "unknown path"}})
+            return
+        # Medya listesi: en yeniden eskiye, imleç son medyanın id'si
+        self.server.media_requests.append(params)
+        media = self.server.media
+        start = 0
+        if params.get("after"):
+            start = [m["id"] for m in media].index(params["after"]) + 1
+        page = media[start:start + int(params["limit"])]
+        body = {"data": page, "paging": {"cursors": {"after": page[-1]["id"] if page else None}}}
+        if start + len(page) < len(media):
+            body["paging"]["next"] = f"{self.path}&after={page[-1]['id']}"
+        self._send(200, body)
+
+    def _comments_page(self, params):
+        # Yorumlar: imleç sayfadaki son yorumun sırası
+        self.server.comment_requests.append(params)
+        start = int(params.get("after", 0))
+        page = self.server.comments[start:start + int(params["limit"])]
+        body = {"data": page, "paging": {"cursors": {"after": str(start + len(page))}}}
+        if start + len(page) < len(self.server.comments):
+            body["paging"]["next"] = "next"
+        return body
+
+    def _answer(self, item):
+        url = urlsplit(item["relative_url"])
+        params = {k: v[0] for k, v in parse_qs(url.query).items()}
+        metric = params.get("metric", "")
+        if metric == "timeout":
+            return None
+        if metric in ("impressions", "website_clicks"):
+            body = {"error": {"message": f"metric {metric} not supported", "code": 100}}
+            return {"code": 400, "body": json.dumps(body)}
+        body = {"data": [{"name": metric, "path": url.path, "value": len(metric)}]}
+        return {"code": 200, "body": json.dumps(body)}
+
+    def _send(self, status, payload):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class GraphBatchTransportTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), FakeGraphHandler)
+        cls.server.batches = []
+        cls.server.oauth_requests = []
+        cls.thread = threading.Thread(target=cls.server.serve_forever, daemon=True)
+        cls.thread.start()
+        cls.base_url = f"http://127.0.0.1:{cls.server.server_address[1]}"
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+    def setUp(self):
+        self.server.batches.clear()
+        override = override_settings(GRAPH_API_BASE_URL=self.base_url)
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def test_responses_are_unbatched_in_request_order(self):
+        sub_requests = [("1/insights", {"metric": f"m{i}"}) for i in range(120)]
+        results = graph_batch_get(sub_requests, "token")
+
+        self.assertEqual([len(b["items"]) for b in self.server.batches], [50, 50, 20])
+        self.assertEqual(self.server.batches[0]["access_token"], "token")
+        self.assertEqual(len(results), 120)
+        for i, (status, body) in enumerate(results):
+            self.assertEqual(status, 200)
+            self.assertEqual(body["data"][0]["name"], f"m{i}")
+            self.assertEqual(body["data"][0]["path"], "v22.0/1/insights")
+
+    def test_per_item_errors_do_not_affect_siblings(self):
+        results = graph_batch_get(
+            [
+                ("1/insights", {"metric": "reach"}),
+                ("1/insights", {"metric": "impressions"}),
+                ("1/insights", {"metric": "timeout"}),
+                ("1/insights", {"metric": "likes"}),
+            ],
+            "token",
+        )
+        self.assertEqual(results[0][0], 200)
+        self.assertEqual(results[1][0], 400)
+        self.assertIn("error", results[1][1])
+        self.assertEqual(results[2], (None, None))
+        self.assertEqual(results[3][1]["data"][0]["name"], "likes")
+
+    @override_settings(GRAPH_API_MAX_RETRIES=2, GRAPH_API_BACKOFF_FACTOR=0)
+    def test_token_exchange_is_not_retried_on_5xx(self):
+        reset_graph_session()
+        self.addCleanup(reset_graph_session)
+        self.server.oauth_requests.clear()
+        url = graph_url("oauth/access_token", "v20.0")
+
+        resp = graph_get(url, params={"code": "tek-kullanimlik"}, retry=False)
+        self.assertEqual(resp.status_code, 502)
+        self.assertEqual(len(self.server.oauth_requests), 1)
+
+        # Tekrarı güvenli GET'ler 5xx'te yeniden denenmeye devam eder
+        graph_get(url, params={"code": "x"})
+        self.assertEqual(len(self.server.oauth_requests), 1 + 3)
+
+    def test_media_insights_fan_out_to_per_metric_dicts(self):
+        medias = [
+            {"id": "10", "media_type": "IMAGE"},
+            {"id": "11", "media_type": "VIDEO"},
+            {"id": "12", "media_type": "STORY"},
+        ]
+        results = get_media_insights_batch(medias, "token")
+
+        self.assertEqual(len(self.server.batches), 1)
+        self.assertEqual(len(self.server.batches[0]["items"]), 7 + 8 + 3)
+        self.assertNotIn("impressions", results["10"])
+        self.assertIn("video_views", results["11"])
+        self.assertEqual(results["12"]["reach"]["data"][0]["path"], "v22.0/12/insights")
+
+    def test_user_insights_keep_existing_shape(self):
+        results = get_user_insights_comprehensive("99", "token")
+
+        self.assertEqual(len(self.server.batches), 1)
+        self.assertEqual(len(self.server.batches[0]["items"]), 17)
+        self.assertIn("reach", results)
+        self.assertIn("profile_views", results)
+        self.assertNotIn("impressions", results)
+        self.assertNotIn("website_clicks", results)
+        self.assertEqual(results["reach"]["data"][0]["value"], len("reach"))
+
+    def test_unsupported_metrics_skipped_until_reprobe(self):
+        get_user_insights_comprehensive("99", "token")
+        self.assertEqual(
+            set(
+                InstagramMetricCapability.objects.filter(ig_account_id="99", supported=False).values_list(
+                    "metric", flat=True
+                )
+            ),
+            {"impressions", "website_clicks"},
+        )
+
+        self.server.batches.clear()
+        results = get_user_insights_comprehensive("99", "token")
+        self.assertEqual(len(self.server.batches[0]["items"]), 15)
+        self.assertIn("profile_views", results)
+
+        # Yeniden deneme zamanı gelince metrik bir kez daha istenir
+        InstagramMetricCapability.objects.filter(ig_account_id="99").update(
+            checked_at=timezone.now() - timedelta(days=8)
+        )
+        self.server.batches.clear()
+        get_user_insights_comprehensive("99", "token")
+        self.assertEqual(len(self.server.batches[0]["items"]), 17)
+
+
+class DashboardQueryCountTests(TestCase):
+    """Dashboard endpointleri satır sayısından bağımsız, sabit sayıda sorgu çalıştırmalı."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="company", password="x")
+        cls.company = CompanyProfile.objects.create(
+            user=cls.user,
+            work_email="company@example.com",
+            first_name="Test",
+            last_name="Company",
+        )
+        for i in range(25):
+            GA4UserAcquisitionSourceData.objects.create(
+                company=cls.company,
+                acquisition_source=f"source-{i}",
+                new_users=i,
+                sessions=2 * i,
+                engagement_rate=0.5,
+                user_engagement_duration=10.0,
+                conversions=1,
+            )
+            GA4SessionSourceMediumData.objects.create(
+                company=cls.company,
+                session_source_medium=f"source-{i} / medium",
+                sessions=i,
+                conversions=1,
+                engagement_rate=0.4,
+                event_count=3,
+                bounce_rate=0.3,
+            )
+            GA4DeviceCategoryData.objects.create(
+                company=cls.company,
+                device_category=f"device-{i}",
+                active_users=i,
+                engaged_sessions=i,
+                user_engagement_duration=1.0,
+                event_count=1.0,
+                bounce_rate=0.2,
+            )
+            GA4OperatingSystemData.objects.create(
+                company=cls.company,
+                operating_system=f"os-{i}",
+                active_users=i,
+                engaged_sessions=i,
+                engagement_rate=0.1,
+                user_engagement_duration=1.0,
+                event_count=1.0,
+                bounce_rate=0.2,
+            )
+            GA4AgeData.objects.create(
+                company=cls.company,
+                age=f"age-{i}",
+                active_users=i,
+                sessions=i,
+                user_engagement_duration=1.0,
+                event_count=1.0,
+                conversions=0.0,
+            )
+            GA4CountryData.objects.create(
+                company=cls.company,
+                country=f"country-{i}",
+                active_users=i,
+                new_users=i,
+                sessions=i,
+                user_engagement_duration=1.0,
+                event_count=1.0,
+                engagement_rate=0.1,
+                conversions=0.0,
+                bounce_rate=0.2,
+            )
+        for gender in ("male", "female"):
+            GA4UserGenderData.objects.create(
+                company=cls.company,
+                gender=gender,
+                sessions=10,
+                engagement_rate=1,
+                user_engagement_duration=1.0,
+                event_count=1.0,
+            )
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_dashboard_overview_query_count(self):
+        # şirket profili + tek aggregate + büyüme için rollup sorgusu
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse("dashboard_overview"))
+        data = response.json()["data"]
+        self.assertEqual(data["totalSessions"], sum(2 * i for i in range(25)))
+        self.assertEqual(data["activeUsers"], sum(range(25)))
+        self.assertEqual(data["engagementRate"], 0.5)
+
+    def test_overview_growth_comes_from_daily_rollups(self):
+        today = timezone.localdate()
+        yesterday = today - timedelta(days=1)
+        rows = [
+            {
+                "date": (today - timedelta(days=offset)).strftime("%Y%m%d"),
+                "acquisition_source": source,
+                # önceki hafta günde 10+10, son hafta günde 20+10 oturum; bugün yarım gün
+                "sessions": (
+                    (1 if offset == 0 else 10 if offset >= 8 else 20) if source == "google" else 10
+                ),
+                "new_users": 5,
+                "engagement_rate": 0.5,
+                "user_engagement_duration": 1.0,
+                "conversions": 0,
+            }
+            for offset in range(15)
+            for source in ("google", "direct")
+        ]
+        requested = []
+
+        device_rows = [
+            {
+                "date": (today - timedelta(days=offset)).strftime("%Y%m%d"),
+                "device_category": "mobile",
+                "active_users": 100,
+                "engaged_sessions": 10,
+                "user_engagement_duration": 1.0,
+                "event_count": 1.0,
+                "bounce_rate": 0.2,
+            }
+            for offset in range(1, 15)
+        ]
+
+        class FakeDailyEngine:
+            def run(self, report_types, start_date, end_date, daily=False):
+                requested.append((start_date, end_date))
+                return {"userAcquisitionSource": rows, "deviceCategory": device_rows}
+
+        # Eski bir aktarımdan kalmış, tamamlanmamış bugüne ait pencere
+        GA4MetricRollup.objects.create(
+            company=self.company,
+            report_type="userAcquisitionSource",
+            metric="sessions",
+            window="7d",
+            date=today,
+            value=1,
+        )
+        ingest_ga4_daily(self.company, FakeDailyEngine())
+        # Pencere son tamamlanmış günde (dün) biter; bugünün satırları yazılmaz
+        self.assertEqual(requested[0][1], yesterday.isoformat())
+        self.assertFalse(GA4DailyMetric.objects.filter(date=today).exists())
+        self.assertFalse(GA4MetricRollup.objects.filter(date=today, window="7d").exists())
+        latest = GA4MetricRollup.objects.get(
+            company=self.company, metric="sessions", window="7d", date=yesterday
+        )
+        self.assertEqual(latest.value, 7 * 30)
+        self.assertEqual(
+            GA4MetricRollup.objects.get(
+                company=self.company, metric="sessions", window="month", date=yesterday.replace(day=1)
+            ).value,
+            sum(
+                row["sessions"]
+                for row in rows
+                if row["date"][:6] == yesterday.strftime("%Y%m")
+                and row["date"] != today.strftime("%Y%m%d")
+            ),
+        )
+        self.assertFalse(
+            GA4MetricRollup.objects.filter(metric="engagement_rate").exists()
+        )
+        # Tekil kullanıcılar günler arasında toplanamaz: günlük fact var, rollup yok
+        self.assertTrue(GA4DailyMetric.objects.filter(metric="active_users").exists())
+        self.assertFalse(GA4MetricRollup.objects.filter(metric="active_users").exists())
+        self.assertEqual(
+            GA4MetricRollup.objects.get(
+                report_type="deviceCategory", metric="engaged_sessions", window="7d", date=yesterday
+            ).value,
+            70,
+        )
+
+        data = self.client.get(reverse("dashboard_overview")).json()["data"]
+        self.assertEqual(data["sessionGrowth"], 50.0)
+        self.assertEqual(data["userGrowth"], 0.0)
+
+        # Yarım kalmış bugünün penceresi büyüme hesabına girmez
+        GA4MetricRollup.objects.create(
+            company=self.company,
+            report_type="userAcquisitionSource",
+            metric="sessions",
+            window="7d",
+            date=today,
+            value=1,
+        )
+        data = self.client.get(reverse("dashboard_overview")).json()["data"]
+        self.assertEqual(data["sessionGrowth"], 50.0)
+
+    def test_traffic_analysis_query_count(self):
+        # şirket profili + veri sürümü + edinme + oturum kaynağı + cihaz + işletim sistemi
+        with self.assertNumQueries(6):
+            response = self.client.get(reverse("traffic_analysis"))
+        data = response.json()["data"]
+        self.assertEqual(len(data["acquisition_channels"]), 25)
+        self.assertEqual(data["acquisition_channels"][0]["source"], "source-24")
+        self.assertEqual(len(data["technology_breakdown"]["operating_systems"]), 10)
+
+    def test_audience_insights_query_count(self):
+        # şirket profili + veri sürümü + yaş + cinsiyet + ülke
+        with self.assertNumQueries(5):
+            response = self.client.get(reverse("audience_insights"))
+        data = response.json()["data"]
+        self.assertEqual(data["age_distribution"][0]["age_group"], "age-24")
+        self.assertEqual(len(data["gender_distribution"]), 2)
+        self.assertEqual(len(data["geographic_distribution"]), 25)
+
+    def test_audience_insights_combined_merges_sources_once(self):
+        GA4AgeData.objects.create(
+            company=self.company,
+            age="18-24",
+            active_users=100,
+            sessions=100,
+            user_engagement_duration=1.0,
+            event_count=1.0,
+            conversions=0.0,
+        )
+        for gender in ("male", "female"):
+            YouTubeAgeGroupData.objects.create(
+                company=self.company,
+                age_group="age18-24",
+                gender=gender,
+                viewer_percentage=25.0,
+            )
+        # şirket profili + veri sürümü + GA4 yaş + YouTube + Instagram raporu ve demografi
+        # tablosu + GA4 cinsiyet + ülke + şehir
+        with self.assertNumQueries(9):
+            response = self.client.get(reverse("audience_insights_combined"))
+        data = response.json()["data"]
+        age_groups = [row["age_group"] for row in data["age_distribution"]]
+        # YouTube 'age18-24' etiketi GA4 '18-24' ile birleşir
+        self.assertEqual(age_groups.count("18-24"), 1)
+        self.assertNotIn("age18-24", age_groups)
+        self.assertEqual(len(data["geographic_distribution"]), 5)
+        self.assertEqual(data["geographic_distribution"][0]["country"], "country-24")
+
+    def test_audience_insights_keeps_raw_ga4_labels(self):
+        GA4UserGenderData.objects.create(
+            company=self.company,
+            gender="unknown",
+            sessions=5,
+            engagement_rate=1,
+            user_engagement_duration=1.0,
+            event_count=1.0,
+        )
+        data = self.client.get(reverse("audience_insights")).json()["data"]
+        # Tek kaynaklı uç nokta etiketleri normalize etmez, bilinmeyenleri elemez
+        self.assertIn("unknown", [row["gender"] for row in data["gender_distribution"]])
+
+        response = self.client.get(reverse("audience_insights_combined")).json()
+        genders = [row["gender"] for row in response["data"]["gender_distribution"]]
+        self.assertNotIn("unknown", genders)
+        self.assertIn("Instagram", response["note"])
+
+    def test_traffic_analysis_cached_until_saver_writes(self):
+        self.client.get(reverse("traffic_analysis"))
+        # önbellekten: yalnızca şirket profili + veri sürümü
+        with self.assertNumQueries(2):
+            self.client.get(reverse("traffic_analysis"))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            GA4DataSaver.save_device_category_data(
+                self.company.id,
+                [
+                    {
+                        "device_category": "tablet",
+                        "active_users": 1,
+                        "engaged_sessions": 1,
+                        "user_engagement_duration": 1.0,
+                        "event_count": 1.0,
+                        "bounce_rate": 0.2,
+                    }
+                ],
+            )
+        with self.assertNumQueries(6):
+            response = self.client.get(reverse("traffic_analysis"))
+        devices = response.json()["data"]["technology_breakdown"]["devices"]
+        self.assertEqual([d["category"] for d in devices], ["tablet"])
+
+    def test_version_bumped_by_another_process_invalidates_cache(self):
+        self.client.get(reverse("traffic_analysis"))
+        # Zamanlayıcı/job worker süreci yalnızca veritabanındaki sürümü artırır;
+        # bu sürecin önbelleğine dokunmaz
+        GA4DeviceCategoryData.objects.filter(company=self.company).delete()
+        bump_company_data_version(self.company.id)
+        self.assertEqual(CompanyDataVersion.objects.get(company=self.company).version, 1)
+        response = self.client.get(reverse("traffic_analysis"))
+        self.assertEqual(response.json()["data"]["technology_breakdown"]["devices"], [])
+
+    def test_locmem_cache_never_stores_without_timeout(self):
+        with override_settings(DASHBOARD_CACHE_TIMEOUT=None, DASHBOARD_LOCAL_CACHE_TIMEOUT=60):
+            self.assertEqual(dashboard_cache_timeout(), 60)
+        with override_settings(
+            DASHBOARD_CACHE_TIMEOUT=None,
+            CACHES={"default": {"BACKEND": "django.core.cache.backends.redis.RedisCache"}},
+        ):
+            self.assertIsNone(dashboard_cache_timeout())
+
+
+class RefreshJobTests(TestCase):
+    """Yenileme isteği kuyruğa alınır, tekrar eden istekler aynı işe bağlanır."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="company", password="x")
+        cls.company = CompanyProfile.objects.create(
+            user=cls.user,
+            work_email="company@example.com",
+            first_name="Test",
+            last_name="Company",
+        )
+        InstagramToken.objects.create(
+            company=cls.company, access_token="token", instagram_business_account_id="17841"
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_duplicate_refresh_requests_coalesce(self):
+        first = self.client.post(reverse("refresh_instagram_data"))
+        second = self.client.post(reverse("refresh_instagram_data"))
+        self.assertEqual(first.status_code, 202)
+        self.assertFalse(first.json()["coalesced"])
+        self.assertTrue(second.json()["coalesced"])
+        self.assertEqual(first.json()["data"]["job_id"], second.json()["data"]["job_id"])
+        self.assertEqual(RefreshJob.objects.count(), 1)
+
+    def test_worker_runs_job_and_records_progress(self):
+        job_id = self.client.post(reverse("refresh_instagram_data")).json()["data"]["job_id"]
+
+        def fake_refresh(company_profile, progress_callback=None):
+            progress_callback("basic_info", "done")
+            progress_callback("story_insights", "empty")
+
+        with mock.patch.dict(refresh_scheduler.REFRESHERS, instagram=fake_refresh):
+            self.assertEqual(refresh_jobs.work(), (1, 0))
+
+        data = self.client.get(reverse("refresh_job_status", args=[job_id])).json()["data"]
+        self.assertEqual(data["status"], "succeeded")
+        self.assertEqual(data["progress"]["basic_info"], "done")
+        self.assertEqual(data["progress"]["story_insights"], "empty")
+        self.assertEqual(data["progress"]["media_data"], "pending")
+        # Biten işten sonra gelen istek yeni iş açar
+        again = self.client.post(reverse("refresh_instagram_data")).json()
+        self.assertFalse(again["coalesced"])
+
+    def test_scheduler_skips_company_with_active_job(self):
+        self.assertEqual(
+            refresh_scheduler.collect_stale_tasks(["instagram"]), [("instagram", self.company.id)]
+        )
+        self.client.post(reverse("refresh_instagram_data"))
+        self.assertEqual(refresh_scheduler.collect_stale_tasks(["instagram"]), [])
+        self.assertIsNone(refresh_jobs.start_job(self.company.id, "instagram"))
+
+    def test_unclaimed_pending_job_expires_and_unblocks_scheduler(self):
+        job_id = self.client.post(reverse("refresh_instagram_data")).json()["data"]["job_id"]
+        self.assertEqual(refresh_scheduler.collect_stale_tasks(["instagram"]), [])
+
+        # Worker çalışmıyor: iş kuyrukta zaman aşımını geçti
+        RefreshJob.objects.filter(id=job_id).update(
+            created_at=timezone.now() - timedelta(minutes=16)
+        )
+        self.assertEqual(
+            refresh_scheduler.collect_stale_tasks(["instagram"]), [("instagram", self.company.id)]
+        )
+        job = RefreshJob.objects.get(id=job_id)
+        self.assertEqual(job.status, RefreshJob.STATUS_FAILED)
+        self.assertIn("kuyrukta", job.error)
+
+    def test_empty_instagram_fetch_fails_instead_of_saving_snapshot(self):
+        for data in ({}, {"media_data": {"data": []}, "calculated_metrics": {"media_count": 0}}):
+            with mock.patch(
+                "apps.company.scripts.refresh_scheduler.get_comprehensive_instagram_data",
+                return_value=data,
+            ), self.assertRaises(refresh_scheduler.RefreshError):
+                refresh_scheduler.refresh_company("instagram", self.company.id)
+        self.assertFalse(InstagramReport.objects.exists())
+        token = InstagramToken.objects.get(company=self.company)
+        self.assertIsNone(token.last_data_fetch)
+        self.assertEqual(token.refresh_failures, 2)
+
+    @mock.patch("apps.company.scripts.refresh_scheduler.connections")
+    def test_scheduler_refresh_runs_as_job(self, connections):
+        def fake_refresh(company_profile, progress_callback=None):
+            # Zamanlayıcının işi çalışırken gelen kullanıcı isteği bu işe bağlanır
+            self.assertTrue(self.client.post(reverse("refresh_instagram_data")).json()["coalesced"])
+            progress_callback("basic_info", "done")
+
+        with mock.patch.dict(refresh_scheduler.REFRESHERS, instagram=fake_refresh):
+            self.assertIsNone(refresh_scheduler._run_task("instagram", self.company.id))
+
+        job = RefreshJob.objects.get()
+        self.assertEqual(job.status, RefreshJob.STATUS_SUCCEEDED)
+        self.assertEqual(job.progress["basic_info"], "done")
+        self.assertIsNone(refresh_jobs.claim_next_job())
+        self.assertIsNotNone(InstagramToken.objects.get(company=self.company).last_data_fetch)
+
+    @mock.patch("apps.company.scripts.refresh_scheduler.connections")
+    def test_failing_company_backs_off_exponentially(self, connections):
+        def failing_refresh(company_profile, progress_callback=None):
+            raise RuntimeError("Graph kapalı")
+
+        with mock.patch.dict(refresh_scheduler.REFRESHERS, instagram=failing_refresh):
+            self.assertEqual(refresh_scheduler._run_task("instagram", self.company.id), "Graph kapalı")
+            token = InstagramToken.objects.get(company=self.company)
+            self.assertEqual(token.refresh_failures, 1)
+            self.assertAlmostEqual(
+                (token.next_refresh_after - timezone.now()).total_seconds(), 15 * 60, delta=5
+            )
+            self.assertEqual(refresh_scheduler.collect_stale_tasks(["instagram"]), [])
+
+            InstagramToken.objects.update(next_refresh_after=timezone.now())
+            self.assertEqual(refresh_scheduler._run_task("instagram", self.company.id), "Graph kapalı")
+            token.refresh_from_db()
+            self.assertEqual(token.refresh_failures, 2)
+            self.assertAlmostEqual(
+                (token.next_refresh_after - timezone.now()).total_seconds(), 30 * 60, delta=5
+            )
+        self.assertEqual(RefreshJob.objects.filter(status=RefreshJob.STATUS_FAILED).count(), 2)
+
+        # Kullanıcı isteği beklemeyi kaldırır; başarılı yenileme sayacı sıfırlar
+        refresh_scheduler.request_refresh("instagram", self.company)
+        self.assertEqual(
+            refresh_scheduler.collect_stale_tasks(["instagram"]), [("instagram", self.company.id)]
+        )
+
+        def fake_refresh(company_profile, progress_callback=None):
+            pass
+
+        with mock.patch.dict(refresh_scheduler.REFRESHERS, instagram=fake_refresh):
+            self.assertIsNone(refresh_scheduler._run_task("instagram", self.company.id))
+        token.refresh_from_db()
+        self.assertEqual((token.refresh_failures, token.next_refresh_after), (0, None))
+
+
+
+class RefreshSchedulerTests(TestCase):
+    """Eskimiş şirket seçimi ve sağlayıcı başına eşzamanlılık sınırları."""
+
+    @classmethod
+    def setUpTestData(cls):
+        now = timezone.now()
+        cls.companies = {}
+        # (ad, access_token, last_data_fetch)
+        for name, access_token, fetched in [
+            ("fresh", "t", now - timedelta(minutes=5)),
+            ("stale", "t", now - timedelta(hours=3)),
+            ("staler", "t", now - timedelta(days=1)),
+            ("never", "t", None),
+            ("disconnected", "", None),
+        ]:
+            user = User.objects.create_user(username=name, password="x")
+            company = CompanyProfile.objects.create(
+                user=user, work_email=f"{name}@example.com", first_name=name, last_name="Co"
+            )
+            YouTubeToken.objects.create(
+                company=company, access_token=access_token, last_data_fetch=fetched
+            )
+            cls.companies[name] = company.id
+        # Aynı şirkete ait ikinci token şirketi iki kez kuyruğa almaz
+        YouTubeToken.objects.create(
+            company_id=cls.companies["stale"],
+            access_token="t2",
+            last_data_fetch=now - timedelta(hours=2),
+        )
+
+    def test_stale_companies_oldest_first(self):
+        ids = refresh_scheduler.find_stale_companies("youtube", timedelta(hours=1))
+        self.assertEqual(ids, [self.companies[name] for name in ("never", "staler", "stale")])
+        self.assertEqual(
+            refresh_scheduler.find_stale_companies("youtube", timedelta(hours=1), limit=2),
+            [self.companies["never"], self.companies["staler"]],
+        )
+        self.assertEqual(refresh_scheduler.find_stale_companies("ga4", timedelta(hours=1)), [])
+
+    def test_provider_pools_respect_limits_and_report_errors(self):
+        lock = threading.Lock()
+        running = {"ga4": 0, "instagram": 0}
+        peak = {"ga4": 0, "instagram": 0}
+
+        def fake_run_task(provider, company_id):
+            with lock:
+                running[provider] += 1
+                peak[provider] = max(peak[provider], running[provider])
+            time.sleep(0.05)
+            with lock:
+                running[provider] -= 1
+            return "Graph kapalı" if company_id == 3 else None
+
+        tasks = [("ga4", i) for i in range(3)] + [("instagram", i) for i in range(4)]
+        with mock.patch.object(refresh_scheduler, "_run_task", side_effect=fake_run_task):
+            results = refresh_scheduler.run_refreshes(tasks, {"ga4": 1, "instagram": 2})
+
+        self.assertEqual(peak, {"ga4": 1, "instagram": 2})
+        self.assertEqual(len(results), len(tasks))
+        errors = [result for result in results if result[2]]
+        self.assertEqual(errors, [("instagram", 3, "Graph kapalı")])
+
+    @mock.patch("apps.company.scripts.refresh_scheduler.connections")
+    def test_refresh_error_is_returned_not_raised(self, connections):
+        company_id = self.companies["stale"]
+        failing = mock.Mock(side_effect=RuntimeError("kota"))
+        with mock.patch.dict(refresh_scheduler.REFRESHERS, youtube=failing):
+            error = refresh_scheduler._run_task("youtube", company_id)
+        self.assertEqual(error, "kota")
+        job = RefreshJob.objects.get(company_id=company_id)
+        self.assertEqual((job.status, job.error), (RefreshJob.STATUS_FAILED, "kota"))
+        self.assertNotIn(
+            company_id, refresh_scheduler.find_stale_companies("youtube", timedelta(hours=1))
+        )
+
+@override_settings(INSTAGRAM_MEDIA_PAGE_SIZE=5)
+class InstagramMediaIngestTests(TestCase):
+    """Medyalar kontrol noktasından itibaren artımlı, geçmiş ise bir kez aktarılır."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), FakeGraphHandler)
+        cls.server.batches = []
+        cls.server.media_requests = []
+        cls.server.comment_requests = []
+        cls.server.comments = []
+        cls.thread = threading.Thread(target=cls.server.serve_forever, daemon=True)
+        cls.thread.start()
+        cls.base_url = f"http://127.0.0.1:{cls.server.server_address[1]}"
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+    def setUp(self):
+        self.server.media_requests.clear()
+        override = override_settings(GRAPH_API_BASE_URL=self.base_url)
+        override.enable()
+        self.addCleanup(override.disable)
+        now = timezone.now()
+        self.server.media = [self._media(str(i), now - timedelta(days=i, hours=1)) for i in range(12)]
+
+    def _media(self, media_id, timestamp):
+        return {
+            "id": media_id,
+            "media_type": "IMAGE",
+            "timestamp": timestamp.strftime("%Y-%m-%dT%H:%M:%S+0000"),
+            "like_count": 1,
+            "comments_count": 0,
+        }
+
+    def test_incremental_runs_fetch_only_new_and_recent_media(self):
+        first = ingest_media("17841", "token", rescan_days=3, backfill_pages=1)
+        # 3 medya pencerede, ilk sayfanın kalanı + bir backfill sayfası geçmiş
+        self.assertEqual(first, {"new": 3, "rescanned": 0, "backfilled": 7, "pages": 2})
+        self.assertEqual(InstagramMedia.objects.count(), 10)
+
+        self.server.media.insert(0, self._media("new", timezone.now()))
+        second = ingest_media("17841", "token", rescan_days=3, backfill_pages=1)
+        self.assertEqual(second, {"new": 1, "rescanned": 3, "backfilled": 2, "pages": 2})
+        self.assertTrue(InstagramMediaCursor.objects.get(ig_account_id="17841").backfill_complete)
+        self.assertEqual(InstagramMedia.objects.count(), 13)
+
+        self.server.media_requests.clear()
+        third = ingest_media("17841", "token", rescan_days=3, backfill_pages=1)
+        self.assertEqual(third, {"new": 0, "rescanned": 4, "backfilled": 0, "pages": 1})
+        self.assertEqual(len(self.server.media_requests), 1)
+
+        latest = media_payload("17841")["data"]
+        self.assertEqual([m["id"] for m in latest], ["new", "0", "1", "2", "3"])
+        self.assertIn("reach", latest[0]["insights"])
+
+    def test_interrupted_paging_keeps_previous_checkpoint(self):
+        ingest_media("17841", "token", rescan_days=0, backfill_pages=0)
+        cursor = InstagramMediaCursor.objects.get(ig_account_id="17841")
+        self.assertEqual(cursor.last_media_id, "0")
+
+        now = timezone.now()
+        for i in range(7):
+            self.server.media.insert(0, self._media(f"n{i}", now - timedelta(minutes=7 - i)))
+        real_fetch = instagram_media.fetch_media_page
+
+        def failing_second_page(ig_id, page_token, after=None, limit=None):
+            if after:
+                return None, None, False
+            return real_fetch(ig_id, page_token, after=after, limit=limit)
+
+        with mock.patch.object(instagram_media, "fetch_media_page", side_effect=failing_second_page):
+            interrupted = ingest_media("17841", "token", rescan_days=0, backfill_pages=0)
+        self.assertEqual(interrupted["new"], 5)
+        cursor.refresh_from_db()
+        self.assertEqual(cursor.last_media_id, "0")
+
+        # Yarıda kalan sayfadaki yeni medyalar bir sonraki çalıştırmada alınır
+        resumed = ingest_media("17841", "token", rescan_days=0, backfill_pages=0)
+        self.assertEqual(resumed["new"], 7)
+        self.assertTrue(InstagramMedia.objects.filter(media_id__in=["n0", "n1"]).exists())
+        cursor.refresh_from_db()
+        self.assertEqual(cursor.last_media_id, "n6")
+
+    @override_settings(INSTAGRAM_COMMENT_TEXT_SAMPLE=3)
+    def test_comments_follow_paging_into_table_with_bounded_summary(self):
+        self.server.comments = [
+            {"id": f"c{i}", "text": "" if i % 10 == 0 else f"yorum {i}", "username": "u",
+             "timestamp": "2024-01-01T00:00:00+0000", "like_count": i % 37,
+             **({"replies": {"data": [{"id": f"r{i}"}]}} if i % 50 == 0 else {})}
+            for i in range(250)
+        ]
+        self.server.comment_requests.clear()
+        analysis = ingest_comments("m1", "token")
+
+        self.assertEqual(len(self.server.comment_requests), 3)
+        self.assertEqual(InstagramComment.objects.filter(media_id="m1").count(), 250)
+        self.assertEqual(analysis["total_comments"], 250)
+        self.assertEqual(analysis["total_text_comments"], 225)
+        self.assertEqual([c["like_count"] for c in analysis["top_comments"]], [36, 36, 36, 36, 36])
+        self.assertEqual(analysis["top_comments"][0]["text"], "yorum 36")
+        self.assertEqual([c["text"] for c in analysis["comment_texts"]], ["yorum 1", "yorum 2", "yorum 3"])
+        self.assertEqual(analysis["text_count"], 225)
+        self.assertEqual(analysis["comment_texts_sample_size"], 3)
+        self.assertTrue(analysis["comment_texts_truncated"])
+        self.assertEqual(analysis["replies_count"], 5)
+        self.assertIn("replies", self.server.comment_requests[0]["fields"])
+        self.assertNotIn("all_texts", analysis)
+        self.assertEqual(analysis["text_analytics"]["top_terms"][0], {"term": "yorum", "count": 225})
+
+
+class InstagramNormalizedStoreTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="company", password="x")
+        cls.company = CompanyProfile.objects.create(
+            user=cls.user,
+            work_email="company@example.com",
+            first_name="Test",
+            last_name="Company",
+        )
+        InstagramToken.objects.create(
+            company=cls.company,
+            access_token="token",
+            instagram_business_account_id="17841",
+            last_data_fetch=timezone.now(),
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def _demographics(self, cities):
+        results = [{"dimension_values": [city], "value": value} for city, value in cities.items()]
+        return {
+            "follower_demographics_city": {
+                "data": [{"total_value": {"breakdowns": [{"results": results}]}}]
+            }
+        }
+
+    def test_comprehensive_output_is_served_from_tables(self):
+        today = timezone.localdate()
+        InstagramDataSaver.save_comprehensive(
+            "17841",
+            {
+                "user_insights": {
+                    "reach": {"data": [{"name": "reach", "total_value": {"value": 420}}]},
+                    "profile_views": {
+                        "data": [
+                            {
+                                "name": "profile_views",
+                                "values": [
+                                    {"value": 3, "end_time": f"{today - timedelta(days=1)}T07:00:00+0000"},
+                                    {"value": 5, "end_time": f"{today}T07:00:00+0000"},
+                                ],
+                            }
+                        ]
+                    },
+                },
+                "demographics": self._demographics({"Istanbul": 10, "Ankara": 4}),
+            },
+        )
+        self.assertEqual(InstagramAccountDailyMetric.objects.count(), 3)
+
+        # şirket profili + hesap id + metrik satırları
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse("instagram_insights"))
+        data = response.json()["data"]
+        self.assertEqual(data["reach"]["data"][0]["total_value"]["value"], 420)
+        self.assertEqual(
+            [point["value"] for point in data["profile_views"]["data"][0]["values"]], [3, 5]
+        )
+
+        # Yeni yanıtta olmayan şehirler silinir, değerler güncellenir
+        InstagramDataSaver.save_demographics("17841", self._demographics({"Istanbul": 12}))
+        self.assertEqual(
+            list(InstagramDemographic.objects.values_list("label", "value")), [("Istanbul", 12)]
+        )
+
+    def test_demographics_are_read_from_table_not_snapshot(self):
+        data = {
+            "basic_info": {"username": "brand"},
+            "demographics": {
+                **self._demographics({"Istanbul": 10, "Ankara": 4}),
+                "online_followers": {"data": [{"name": "online_followers"}]},
+            },
+        }
+        InstagramDataSaver.save_comprehensive("17841", data)
+        refresh_scheduler.save_instagram_report(self.company, data)
+        # Snapshot kırılımların ikinci bir kopyasını tutmaz
+        self.assertEqual(
+            list(InstagramReport.objects.get().demographics), ["online_followers"]
+        )
+
+        demographics = self.client.get(reverse("instagram_demographics")).json()["data"]
+        self.assertEqual(
+            instagram_breakdown(demographics, "city"), [("Istanbul", 10), ("Ankara", 4)]
+        )
+        self.assertIn("online_followers", demographics)
+
+        InstagramDataSaver.save_demographics("17841", self._demographics({"Izmir": 7}))
+        # "instagram_report" adı influencer uygulamasıyla çakışıyor; yol doğrudan kullanılır
+        report = self.client.get("/api/company/reports/instagram/").json()["data"]
+        self.assertEqual(instagram_breakdown(report["demographics"], "city"), [("Izmir", 7)])
+
+    def test_section_endpoints_read_snapshot_and_refresh_when_stale(self):
+        report = InstagramReport.objects.create(
+            company=self.company,
+            basic_info={"username": "brand"},
+            media_data={},
+            demographics={},
+            user_insights={},
+            calculated_metrics={},
+            story_insights=[{"id": "s1"}],
+        )
+        # şirket profili + tek kolonluk snapshot sorgusu
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse("instagram_basic_info"))
+        body = response.json()
+        self.assertEqual(body["data"], {"username": "brand"})
+        self.assertFalse(body["stale"])
+        self.assertEqual(
+            self.client.get(reverse("instagram_stories")).json()["data"], [{"id": "s1"}]
+        )
+
+        InstagramReport.objects.filter(id=report.id).update(
+            fetched_at=timezone.now() - timedelta(hours=2)
+        )
+        response = self.client.get(reverse("instagram_basic_info"), {"max_age": 30})
+        self.assertTrue(response.json()["stale"])
+        self.assertEqual(RefreshJob.objects.filter(company=self.company).count(), 1)
+
+        # Aktif iş varken eski veri okuması yalnızca bir EXISTS sorgusu ekler, yazma yapmaz:
+        # şirket profili + snapshot + iş kontrolü
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse("instagram_basic_info"), {"max_age": 30})
+        self.assertTrue(response.json()["stale"])
+
+        # Yakın zamanda biten (başarısız) iş de her okumada yeni iş açılmasını engeller
+        RefreshJob.objects.update(status=RefreshJob.STATUS_FAILED, finished_at=timezone.now())
+        self.client.get(reverse("instagram_basic_info"), {"max_age": 30})
+        self.assertEqual(RefreshJob.objects.filter(company=self.company).count(), 1)
+        RefreshJob.objects.update(created_at=timezone.now() - timedelta(minutes=6))
+        self.client.get(reverse("instagram_basic_info"), {"max_age": 30})
+        self.assertEqual(RefreshJob.objects.filter(company=self.company).count(), 2)
+
+        response = self.client.get(reverse("instagram_basic_info"), {"max_age": "soon"})
+        self.assertEqual(response.status_code, 400)
+
+    def test_comment_analytics_endpoint_reads_comment_table(self):
+        InstagramMedia.objects.create(ig_account_id="17841", media_id="m1")
+        for i, text in enumerate(["çok güzel 😍", "güzel #yaz", "kötü"]):
+            InstagramComment.objects.create(
+                comment_id=f"c{i}", media_id="m1", text=text, timestamp=timezone.now()
+            )
+        InstagramComment.objects.create(
+            comment_id="old", media_id="m1", text="güzel", timestamp=timezone.now() - timedelta(days=60)
+        )
+        data = self.client.get(reverse("instagram_comment_analytics")).json()["data"]
+        self.assertEqual(data["comments"], 3)
+        self.assertEqual(data["top_terms"][0], {"term": "güzel", "count": 2})
+        self.assertEqual(data["sentiment"]["positive"], 2)
+
+
+@override_settings(SNAPSHOT_RAW_DAYS=14, SNAPSHOT_WEEKLY_DAYS=180, SNAPSHOT_RETENTION_DAYS=730)
+class SnapshotHistoryTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="company", password="x")
+        cls.company = CompanyProfile.objects.create(
+            user=cls.user,
+            work_email="company@example.com",
+            first_name="Test",
+            last_name="Company",
+        )
+
+    def _snapshot(self, fetched_at):
+        report = GA4Report.objects.create(company=self.company, report_data={"at": fetched_at.isoformat()})
+        GA4Report.objects.filter(id=report.id).update(fetched_at=fetched_at)
+
+    def test_old_snapshots_are_downsampled_and_expired(self):
+        now = timezone.make_aware(datetime(2026, 6, 30, 12))
+        for hours in range(0, 72, 12):  # son 3 gün: ham kalır
+            self._snapshot(now - timedelta(hours=hours))
+        for day in range(4, 18):  # iki tam hafta (pazartesi-pazar)
+            self._snapshot(timezone.make_aware(datetime(2026, 5, day, 9)))
+        for day in (1, 10, 20):  # 2025 Ekim: aylık
+            self._snapshot(timezone.make_aware(datetime(2025, 10, day, 9)))
+        self._snapshot(now - timedelta(days=800))  # saklama süresi dışında
+
+        self.assertEqual(
+            compact_snapshots(GA4Report, now=now, dry_run=True),
+            {"week": 2, "month": 1, "deleted": 15},
+        )
+        self.assertEqual(GA4Report.objects.count(), 24)
+
+        stats = compact_snapshots(GA4Report, now=now)
+        self.assertEqual(stats, {"week": 2, "month": 1, "deleted": 15})
+        counts = {
+            granularity: GA4Report.objects.filter(granularity=granularity).count()
+            for granularity in ("raw", "week", "month")
+        }
+        self.assertEqual(counts, {"raw": 6, "week": 2, "month": 1})
+        # Her dönemin son snapshot'ı tutulur
+        self.assertEqual(
+            GA4Report.objects.get(granularity="month").fetched_at.day, 20
+        )
+        # İkinci çalıştırma bir şey değiştirmez
+        self.assertEqual(
+            compact_snapshots(GA4Report, now=now), {"week": 0, "month": 0, "deleted": 0}
+        )
+
+
+    def test_retention_keeps_latest_snapshot_per_company(self):
+        now = timezone.make_aware(datetime(2026, 6, 30, 12))
+        self._snapshot(now - timedelta(days=900))
+        self._snapshot(now - timedelta(days=800))
+        other = CompanyProfile.objects.create(
+            user=User.objects.create_user(username="other", password="x"),
+            work_email="other@example.com",
+            first_name="Other",
+            last_name="Company",
+        )
+        YouTubeReport.objects.create(company=other, report_data={})
+        YouTubeReport.objects.filter(company=other).update(fetched_at=now - timedelta(days=900))
+
+        self.assertEqual(compact_snapshots(GA4Report, now=now)["deleted"], 1)
+        self.assertEqual(
+            GA4Report.objects.get(company=self.company).fetched_at, now - timedelta(days=800)
+        )
+        self.assertEqual(compact_snapshots(YouTubeReport, now=now)["deleted"], 0)
+        self.assertTrue(YouTubeReport.objects.filter(company=other).exists())
+
+    def test_youtube_section_save_appends_snapshot(self):
+        YouTubeDataSaver.save_trafficSource_data(self.company.id, [{"source": "A"}])
+        first = YouTubeReport.objects.get(company=self.company)
+        YouTubeDataSaver.save_ageGroup_data(self.company.id, [{"age": "18-24"}])
+
+        self.assertEqual(YouTubeReport.objects.filter(company=self.company).count(), 2)
+        first.refresh_from_db()
+        self.assertEqual(first.report_data, {"traffic_sources": [{"source": "A"}]})
+        latest = YouTubeReport.objects.filter(company=self.company).first()
+        self.assertEqual(
+            latest.report_data,
+            {"traffic_sources": [{"source": "A"}], "age_groups": [{"age": "18-24"}]},
+        )
+
+
+class FakeYouTubeService:
+    """youtubeAnalytics reports().query() taklidi; her gün her boyut için 1 izlenme döner."""
+
+    def __init__(self):
+        self.queries = []
+        self.threads = set()
+
+    def reports(self):
+        return self
+
+    def query(self, **params):
+        self.queries.append(params)
+        self.threads.add(threading.current_thread().name)
+        return FakeYouTubeRequest(params)
+
+
+class FakeYouTubeRequest:
+    def __init__(self, params):
+        self.params = params
+
+    def execute(self, http=None):
+        params = self.params
+        if params["dimensions"] == "ageGroup,gender":
+            headers = ["ageGroup", "gender", "viewerPercentage"]
+            rows = [["age18-24", "female", 60.0], ["age25-34", "male", 40.0]]
+        else:
+            dimension = params["dimensions"].split(",")[1]
+            headers = ["day", dimension, "views", "estimatedMinutesWatched"]
+            start = datetime.strptime(params["startDate"], "%Y-%m-%d").date()
+            end = datetime.strptime(params["endDate"], "%Y-%m-%d").date()
+            rows = [
+                [(start + timedelta(days=offset)).isoformat(), value, 1, 2]
+                for offset in range((end - start).days + 1)
+                for value in ("A", "B", "C")
+            ]
+        first = params["startIndex"] - 1
+        return {
+            "columnHeaders": [{"name": name} for name in headers],
+            "rows": rows[first:first + params["maxResults"]],
+        }
+
+
+@override_settings(
+    YOUTUBE_WINDOW_DAYS=7,
+    YOUTUBE_BACKFILL_DAYS=20,
+    YOUTUBE_RESTATE_DAYS=2,
+    YOUTUBE_REPORT_WINDOW_DAYS=20,
+    YOUTUBE_PAGE_SIZE=10,
+)
+class YouTubeDailyIngestTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="company", password="x")
+        cls.company = CompanyProfile.objects.create(
+            user=cls.user,
+            work_email="company@example.com",
+            first_name="Test",
+            last_name="Company",
+        )
+        YouTubeToken.objects.create(company=cls.company, access_token="token")
+
+    def test_windows_paginate_and_resume_from_last_window(self):
+        service = FakeYouTubeService()
+        self.assertEqual(fetch_youtube_reports_for_company(self.company, service), (True, []))
+
+        today = timezone.localdate()
+        traffic = [q for q in service.queries if q["dimensions"] == "day,insightTrafficSourceType"]
+        # 21 gün 7 günlük 3 pencereye bölünür; 21 satırlık her pencere 3 sayfa
+        self.assertEqual(
+            [(q["startDate"], q["startIndex"]) for q in traffic][:3],
+            [((today - timedelta(days=20)).isoformat(), index) for index in (1, 11, 21)],
+        )
+        self.assertEqual(len(traffic), 9)
+        self.assertEqual(
+            YouTubeDailyMetric.objects.filter(report_type="trafficSource", metric="views").count(),
+            21 * 3,
+        )
+        self.assertEqual(
+            YouTubeIngestState.objects.get(company=self.company, report_type="deviceType").last_window_end,
+            today,
+        )
+
+        report = YouTubeReport.objects.first().report_data
+        self.assertEqual(
+            report["traffic_sources"][0],
+            {"insightTrafficSourceType": "A", "views": 21, "averageViewDuration": 120, "estimatedMinutesWatched": 42},
+        )
+        self.assertEqual(len(report["daily"]), 21)
+        self.assertEqual(report["age_groups"][0]["viewerPercentage"], 60.0)
+
+        # İkinci çalıştırma yalnızca son pencereden sonraki (ve yeniden işlenen) günleri ister
+        service.queries.clear()
+        fetch_youtube_reports_for_company(self.company, service)
+        traffic = [q for q in service.queries if q["dimensions"] == "day,insightTrafficSourceType"]
+        self.assertEqual(
+            {q["startDate"] for q in traffic}, {(today - timedelta(days=2)).isoformat()}
+        )
+        self.assertEqual(
+            YouTubeDailyMetric.objects.filter(report_type="trafficSource", metric="views").count(),
+            21 * 3,
+        )
+
+    @override_settings(YOUTUBE_QUERY_CONCURRENCY=3)
+    def test_parallel_queries_store_same_facts(self):
+        service = FakeYouTubeService()
+        client = YouTubeClient(service, "credentials")
+        with mock.patch(
+            "apps.company.scripts.youtube_reports.get_youtube_client", return_value=client
+        ), mock.patch(
+            "apps.company.scripts.youtube_reports._thread_http", side_effect=lambda credentials: object()
+        ) as thread_http:
+            self.assertEqual(fetch_youtube_reports_for_company(self.company), (True, []))
+        # Her rapor tipi kendi bağlantısıyla havuz thread'inde sorgulanır
+        self.assertEqual(thread_http.call_count, 3)
+        self.assertTrue(all(name.startswith("youtube") for name in service.threads))
+        self.assertEqual(len(service.queries), 9 + 9 + 1)
+        self.assertEqual(
+            YouTubeDailyMetric.objects.filter(report_type="deviceType", metric="views").count(),
+            21 * 3,
+        )
+        self.assertEqual(
+            set(YouTubeReport.objects.first().report_data),
+            {"traffic_sources", "device_types", "age_groups", "daily"},
+        )
+
+    @override_settings(YOUTUBE_QUERY_CONCURRENCY=3)
+    def test_shared_service_is_queried_sequentially(self):
+        service = FakeYouTubeService()
+        self.assertEqual(fetch_youtube_reports_for_company(self.company, service), (True, []))
+        self.assertEqual(service.threads, {threading.current_thread().name})
+        self.assertEqual(len(service.queries), 9 + 9 + 1)
+
+    def test_client_is_reused_until_token_changes(self):
+        first = get_youtube_client(self.company.id, "token", "refresh", "id", "secret")
+        self.assertIs(get_youtube_client(self.company.id, "token", "refresh", "id", "secret"), first)
+        renewed = get_youtube_client(self.company.id, "token-2", "refresh", "id", "secret")
+        self.assertIsNot(renewed, first)
+        self.assertEqual(renewed.credentials.token, "token-2")
+
+
+class CredentialProviderTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="company", password="x")
+        cls.company = CompanyProfile.objects.create(
+            user=cls.user,
+            work_email="company@example.com",
+            first_name="Test",
+            last_name="Company",
+        )
+
+    def setUp(self):
+        credential_provider.clear()
+        self.token = YouTubeToken.objects.create(
+            company=self.company,
+            access_token="old",
+            refresh_token="refresh",
+            token_expiry=timezone.now() + timedelta(seconds=60),
+        )
+
+    def test_expiring_token_refreshed_once_then_served_from_memory(self):
+        response = mock.Mock(status_code=200)
+        response.json.return_value = {"access_token": "new", "expires_in": 3600}
+        with mock.patch("apps.company.credentials.requests.post", return_value=response) as post:
+            self.assertEqual(credential_provider.get(self.company.id, "youtube").access_token, "new")
+            with self.assertNumQueries(0):
+                for _ in range(5):
+                    self.assertEqual(credential_provider.get(self.company.id, "youtube").access_token, "new")
+        self.assertEqual(post.call_count, 1)
+        self.token.refresh_from_db()
+        self.assertEqual(self.token.access_token, "new")
+
+    def test_token_save_invalidates_cached_entry(self):
+        self.token.token_expiry = timezone.now() + timedelta(hours=1)
+        self.token.save()
+        self.assertEqual(credential_provider.get(self.company.id, "youtube").access_token, "old")
+        YouTubeToken.objects.update_or_create(company=self.company, defaults={"access_token": "reconnected"})
+        self.assertEqual(credential_provider.get(self.company.id, "youtube").access_token, "reconnected")
+        YouTubeToken.objects.filter(company=self.company).delete()
+        self.assertIsNone(credential_provider.get(self.company.id, "youtube"))
+
+    def _token_response(self):
+        response = mock.Mock(status_code=200)
+        response.json.return_value = {"access_token": "new", "expires_in": 3600}
+        return response
+
+    def test_youtube_report_refresh_builds_client_from_provider(self):
+        client = YouTubeClient(FakeYouTubeService(), None)
+        with mock.patch(
+            "apps.company.credentials.requests.post", return_value=self._token_response()
+        ) as post, mock.patch(
+            "apps.company.scripts.youtube_reports.get_youtube_client", return_value=client
+        ) as get_client:
+            self.assertEqual(fetch_youtube_reports_for_company(self.company), (True, []))
+            self.assertEqual(fetch_youtube_reports_for_company(self.company), (True, []))
+        # İki yenilemede tek token isteği; istemci yenilenen token'la kurulur
+        self.assertEqual(post.call_count, 1)
+        self.assertEqual(
+            [call.args[1:3] for call in get_client.call_args_list], [("new", "refresh")] * 2
+        )
+        self.token.refresh_from_db()
+        self.assertEqual(self.token.access_token, "new")
+
+    def test_ga4_engine_uses_refreshed_token(self):
+        GA4Token.objects.create(
+            company=self.company,
+            access_token="old",
+            refresh_token="refresh",
+            token_expiry=timezone.now() + timedelta(seconds=60),
+            property_id="123",
+        )
+        with mock.patch(
+            "apps.company.credentials.requests.post", return_value=self._token_response()
+        ) as post, mock.patch("apps.company.scripts.ga4_reports.get_ga4_client") as get_client:
+            engine = GA4ReportEngine.for_company(self.company, "123", "id", "secret")
+            GA4ReportEngine.for_company(self.company, "123", "id", "secret")
+        self.assertEqual(post.call_count, 1)
+        self.assertEqual(get_client.call_args.args, (self.company.id, "new", "refresh", "id", "secret"))
+        self.assertEqual(engine.property_id, "123")
+        self.assertEqual(GA4Token.objects.get(company=self.company).access_token, "new")
+
+
+class InstagramTokenRenewalTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        now = timezone.now()
+        cls.tokens = {}
+        for name, expiry in (
+            ("soon", now + timedelta(days=2)),
+            ("later", now + timedelta(days=30)),
+            ("expired", now - timedelta(days=1)),
+            ("failing", now + timedelta(days=1)),
+        ):
+            user = User.objects.create_user(username=name, password="x")
+            company = CompanyProfile.objects.create(
+                user=user, work_email=f"{name}@example.com", first_name=name, last_name="Company"
+            )
+            cls.tokens[name] = InstagramToken.objects.create(
+                company=company, access_token=name, token_expiry=expiry
+            )
+
+    def test_expiring_tokens_renewed_in_one_bulk_update(self):
+        def fake_graph_get(url, params=None, timeout=None, retry=True):
+            # Token değişimleri yeniden denenmez
+            self.assertFalse(retry)
+            token = params["fb_exchange_token"]
+            if token == "failing":
+                return mock.Mock(status_code=400, text="invalid token")
+            return mock.Mock(status_code=200, json=lambda: {"access_token": f"{token}-new", "expires_in": 5184000})
+
+        tokens = expiring_tokens(timedelta(days=7))
+        self.assertEqual([t.access_token for t in tokens], ["failing", "soon"])
+        with mock.patch("apps.company.scripts.instagram_tokens.graph_get", side_effect=fake_graph_get):
+            with self.assertNumQueries(1):
+                renewed, errors = renew_tokens(tokens, max_workers=2)
+        self.assertEqual(renewed, 1)
+        self.assertEqual(errors[0][0], self.tokens["failing"].company_id)
+        soon = InstagramToken.objects.get(pk=self.tokens["soon"].pk)
+        self.assertEqual(soon.access_token, "soon-new")
+        self.assertGreater(soon.token_expiry, timezone.now() + timedelta(days=59))
+        self.assertEqual(InstagramToken.objects.get(pk=self.tokens["failing"].pk).access_token, "failing")
+
+    def test_connection_status_keeps_expired_token(self):
+        client = APIClient()
+        client.force_authenticate(self.tokens["expired"].company.user)
+        response = client.get(reverse("get_instagram_connection_status"))
+        self.assertFalse(response.json()["connected"])
+        self.assertTrue(InstagramToken.objects.filter(pk=self.tokens["expired"].pk).exists())
+
+    def test_callback_stores_long_lived_token(self):
+        company = self.tokens["later"].company
+        OAuthState.objects.create(company=company, provider="instagram", state="state-1")
+
+        def fake_graph_get(url, params=None, timeout=None, retry=True):
+            # Token değişimleri yeniden denenmez
+            self.assertFalse(retry)
+            if url.endswith("oauth/access_token"):
+                if "fb_exchange_token" in params:
+                    self.assertEqual(params["fb_exchange_token"], "short")
+                    return mock.Mock(
+                        status_code=200, json=lambda: {"access_token": "long", "expires_in": 5184000}
+                    )
+                return mock.Mock(status_code=200, json=lambda: {"access_token": "short", "expires_in": 3600})
+            # Sayfa listesi uzun ömürlü token'la istenir
+            self.assertEqual(params["access_token"], "long")
+            return mock.Mock(status_code=200, text="{}", json=lambda: {"data": []})
+
+        with mock.patch("apps.company.views_auth.graph_get", side_effect=fake_graph_get), mock.patch(
+            "apps.company.scripts.instagram_tokens.graph_get", side_effect=fake_graph_get
+        ):
+            response = self.client.get(
+                reverse("company_instagram_simple_callback"), {"code": "c", "state": "state-1"}
+            )
+        self.assertEqual(response.status_code, 302)
+        token = InstagramToken.objects.get(company=company)
+        self.assertEqual(token.access_token, "long")
+        self.assertGreater(token.token_expiry, timezone.now() + timedelta(days=59))
+
+    def test_callback_rate_limited_is_retryable(self):
+        company = self.tokens["later"].company
+        OAuthState.objects.create(company=company, provider="instagram", state="state-2")
+        with mock.patch(
+            "apps.company.views_auth.graph_get", side_effect=graph_rate.GraphRateLimited(42.3)
+        ):
+            response = self.client.get(
+                reverse("company_instagram_simple_callback"), {"code": "c", "state": "state-2"}
+            )
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response["Retry-After"], "42")
+        self.assertTrue(response.json()["retryable"])
+
+
+@override_settings(GRAPH_RATE_TARGET_PERCENT=90, GRAPH_RATE_MAX_WAIT_SECONDS=0)
+class GraphRateGovernorTests(SimpleTestCase):
+    def setUp(self):
+        # Testler worker süreci gibi davranır; web isteği davranışı ayrıca test edilir
+        graph_rate.use_worker_waits()
+        self.addCleanup(graph_rate.use_worker_waits, False)
+
+    def _headers(self, app=None, business=None, regain=0):
+        headers = {}
+        if app is not None:
+            headers["X-App-Usage"] = json.dumps({"call_count": app, "total_cputime": 1, "total_time": 1})
+        if business is not None:
+            headers["X-Business-Use-Case-Usage"] = json.dumps(
+                {"1784": [{"type": "instagram", "call_count": business, "total_cputime": 2,
+                           "total_time": 3, "estimated_time_to_regain_access": regain}]}
+            )
+        return headers
+
+    def test_capacity_learned_from_usage_deltas(self):
+        governor = GraphRateGovernor()
+        governor.observe(self._headers(app=10))
+        for _ in range(50):
+            self.assertEqual(governor.acquire(), 0.0)
+        governor.observe(self._headers(app=20))
+
+        app = governor.metrics()["app"]
+        self.assertEqual(app["usage_percent"], 20)
+        # 50 çağrı %10 ettiğine göre saatlik kapasite 500, %90 hedefine 350 çağrı kalır
+        self.assertEqual(app["estimated_hourly_capacity"], 500)
+        self.assertEqual(app["available_calls"], 350)
+        self.assertEqual(governor._app.wait_time(350, time.monotonic()), 0.0)
+        self.assertGreater(governor._app.wait_time(400, time.monotonic()), 0)
+
+        governor.observe(self._headers(app=95))
+        self.assertGreater(governor._app.wait_time(1, time.monotonic()), 0)
+
+    def test_business_usage_blocks_only_that_account(self):
+        governor = GraphRateGovernor()
+        governor.observe(self._headers(app=5, business=100, regain=2), key="a")
+        now = time.monotonic()
+        self.assertGreater(governor._account("a").wait_time(1, now), 60)
+        self.assertEqual(governor._account("b").wait_time(1, now), 0.0)
+        self.assertEqual(governor._app.wait_time(1, now), 0.0)
+
+        # Bekleme süresi GRAPH_RATE_MAX_WAIT_SECONDS ile sınırlı; çağrı sayılır
+        governor.acquire("a")
+        metrics = governor.metrics()
+        self.assertEqual(metrics["calls"], 1)
+        self.assertEqual(metrics["accounts"]["a"]["usage_percent"], 100)
+
+    @override_settings(GRAPH_RATE_BACKOFF_SECONDS=0.05, GRAPH_RATE_MAX_WAIT_SECONDS=30)
+    def test_first_reading_above_target_backs_off_once_per_call(self):
+        # Yeniden başlatma sonrası ilk okuma zaten %95: kapasite bilinmiyor, yanıt da gelmiyor
+        governor = GraphRateGovernor()
+        governor.observe(self._headers(app=95))
+        for _ in range(3):
+            started = time.monotonic()
+            waited = governor.acquire()
+            self.assertGreaterEqual(waited, 0.04)
+            self.assertLess(time.monotonic() - started, 1)
+        self.assertEqual(governor.metrics()["throttled_calls"], 3)
+
+    @override_settings(GRAPH_RATE_BACKOFF_SECONDS=0.05, GRAPH_RATE_REQUEST_MAX_WAIT_SECONDS=1)
+    def test_request_path_fails_fast_instead_of_long_wait(self):
+        graph_rate.use_worker_waits(False)
+        governor = GraphRateGovernor()
+        # Kısa bekleme web isteğinin sınırına sığar
+        governor.observe(self._headers(app=95))
+        self.assertGreaterEqual(governor.acquire(), 0.04)
+
+        governor.observe(self._headers(app=5, business=100, regain=2), key="a")
+        started = time.monotonic()
+        with self.assertRaises(graph_rate.GraphRateLimited) as raised:
+            governor.acquire("a")
+        self.assertLess(time.monotonic() - started, 0.5)
+        self.assertGreater(raised.exception.retry_after, 60)
+        metrics = governor.metrics()
+        self.assertEqual((metrics["calls"], metrics["rejected_calls"]), (1, 1))
+
+    def test_stale_usage_reading_decays(self):
+        governor = GraphRateGovernor()
+        governor.observe(self._headers(app=95))
+        bucket = governor._app
+        now = time.monotonic()
+        self.assertGreater(bucket.wait_time(1, now), 0)
+        # Saatlik pencerenin yarısı kadar yanıt gelmezse kullanım ~%45'e iner
+        bucket.refill(now + 1800)
+        self.assertAlmostEqual(bucket.percent, 45, delta=0.1)
+        self.assertEqual(bucket.wait_time(1, now + 1800), 0.0)
+
+
+class CommentAnalyticsTests(SimpleTestCase):
+    def test_terms_tags_emojis_and_sentiment(self):
+        summary = analyze_comment_texts(
+            [
+                "Harika ürün ❤️ #Kampanya @marka",
+                "harika ama pahalı #kampanya",
+                "Berbat, kötü 😡",
+                "İstanbul teslimat",
+                "",
+            ],
+            batch_size=2,
+        )
+        self.assertEqual(summary["comments"], 4)
+        self.assertEqual(summary["top_terms"][0], {"term": "harika", "count": 2})
+        self.assertNotIn("ama", [t["term"] for t in summary["top_terms"]])
+        self.assertIn({"term": "istanbul", "count": 1}, summary["top_terms"])
+        self.assertEqual(summary["hashtags"], [{"term": "#kampanya", "count": 2}])
+        self.assertEqual(summary["mentions"], [{"term": "@marka", "count": 1}])
+        self.assertEqual([e["term"] for e in summary["emojis"]], ["❤", "😡"])
+        self.assertEqual(
+            summary["sentiment"],
+            {"positive": 1, "neutral": 2, "negative": 1, "average_score": 0.0},
+        )
+
+
+class InstagramMetricsEngineTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.now = timezone.now()
+        # (hesap, kaç gün önce, likes, comments, reach, saved)
+        posts = [
+            ("a", 1, 10, 2, 100, 3),
+            ("a", 5, 20, 4, 200, 0),
+            ("a", 20, 30, 6, 300, 9),
+            ("a", 60, 40, 8, None, 0),
+            ("a", 400, 50, 10, 500, 5),
+            ("b", 2, 7, 1, 70, 0),
+        ]
+        for i, (ig_id, days, likes, comments, reach, saved) in enumerate(posts):
+            media = InstagramMedia.objects.create(
+                ig_account_id=ig_id,
+                media_id=f"m{i}",
+                timestamp=cls.now - timedelta(days=days, hours=1),
+                like_count=likes,
+                comments_count=comments,
+            )
+            metrics = {"saved": saved}
+            if reach is not None:
+                metrics["reach"] = reach
+            InstagramMediaMetric.objects.bulk_create(
+                [InstagramMediaMetric(media=media, metric=k, value=v) for k, v in metrics.items()]
+            )
+        today = timezone.localdate(cls.now)
+        InstagramAccountDailyMetric.objects.bulk_create(
+            [
+                InstagramAccountDailyMetric(
+                    ig_account_id="a", metric="reach", period="total", date=today - timedelta(days=1), value=999
+                ),
+                InstagramAccountDailyMetric(
+                    ig_account_id="a", metric="reach", period="total", date=today, value=1000
+                ),
+                InstagramAccountDailyMetric(
+                    ig_account_id="a", metric="total_interactions", period="total", date=today, value=50
+                ),
+            ]
+            + [
+                InstagramAccountDailyMetric(
+                    ig_account_id="a", metric="follower_count", period="day",
+                    date=today - timedelta(days=day), value=10,
+                )
+                for day in range(40)
+            ]
+        )
+
+    def test_batch_scores_use_full_history_windows(self):
+        # medya + medya metrikleri + günlük metrikler
+        with self.assertNumQueries(3):
+            scores = score_accounts(["a", "b", "c"], followers={"a": 1300}, now=self.now)
+
+        a = scores["a"]
+        self.assertEqual(a["media_count"], 5)
+        self.assertAlmostEqual(a["engagement_rate"], 5.0)
+        self.assertAlmostEqual(a["posting_frequency"], 3 / 30)
+        # 30 günde 300 yeni takipçi: 300 / (1300 - 300)
+        self.assertAlmostEqual(a["followers_growth_rate"], 30.0)
+        self.assertAlmostEqual(a["influencer_score"], 6.5)
+
+        rates = [15.0, 12.0, 15.0]  # (likes+comments+saved)/reach*100, son 30 gün
+        window = a["windows"]["30d"]
+        self.assertEqual(window["posts"], 3)
+        self.assertAlmostEqual(window["avg_likes"], 20)
+        self.assertAlmostEqual(window["median_engagement_rate"], float(np.median(rates)))
+        self.assertAlmostEqual(window["p25_engagement_rate"], float(np.percentile(rates, 25)))
+        self.assertAlmostEqual(window["avg_engagement_rate"], 14.0)
+        self.assertEqual(window["follower_gain"], 300)
+        # reach'i olmayan medya sayılır ama oranlara katılmaz
+        self.assertEqual(a["windows"]["90d"]["posts"], 4)
+        self.assertAlmostEqual(a["windows"]["90d"]["p90_engagement_rate"], float(np.percentile(rates, 90)))
+        self.assertEqual(a["windows"]["7d"]["posts"], 2)
+
+        self.assertAlmostEqual(scores["b"]["windows"]["7d"]["median_engagement_rate"], 8 / 70 * 100, places=4)
+        self.assertNotIn("engagement_rate", scores["b"])
+        self.assertEqual(scores["c"]["media_count"], 0)
+        self.assertIsNone(scores["c"]["windows"]["30d"]["median_engagement_rate"])
+
+    def test_calculate_advanced_metrics_uses_fresh_insights(self):
+        story = {
+            "insights": {
+                "impressions": {"data": [{"name": "impressions", "values": [{"value": 200}]}]},
+                "exits": {"data": [{"name": "exits", "values": [{"value": 30}]}]},
+            }
+        }
+        calculated = calculate_advanced_metrics(
+            {
+                "basic_info": {"id": "a", "followers_count": 2000},
+                "user_insights": {
+                    "reach": {"data": [{"name": "reach", "total_value": {"value": 400}}]},
+                    "total_interactions": {
+                        "data": [{"name": "total_interactions", "total_value": {"value": 40}}]
+                    },
+                },
+                "story_insights": [story, story],
+            }
+        )
+        self.assertAlmostEqual(calculated["engagement_rate"], 10.0)
+        self.assertAlmostEqual(calculated["influencer_score"], 20.0)
+        self.assertAlmostEqual(calculated["story_exit_rate"], 15.0)
+        self.assertEqual(calculated["media_count"], 5)
+        self.assertNotIn("followers_growth_rate", calculated)
+
+
+class AccountSemaphoreTests(SimpleTestCase):
+    def test_semaphores_released_when_no_refresh_holds_them(self):
+        semaphore = instagram_reports._account_semaphore("17841", 2)
+        self.assertIs(instagram_reports._account_semaphore("17841", 2), semaphore)
+        del semaphore
+        self.assertNotIn("17841", instagram_reports._account_slots)
+
+    def test_limit_change_resizes_without_exceeding_it(self):
+        semaphore = instagram_reports._account_semaphore("17841", 2)
+        semaphore.__enter__()
+        semaphore.__enter__()
+        # Limit düşürülünce aynı semafor küçülür; eski tutucular sayılmaya devam eder
+        self.assertIs(instagram_reports._account_semaphore("17841", 1), semaphore)
+        entered = threading.Event()
+
+        def hold():
+            with instagram_reports._account_semaphore("17841", 1):
+                entered.set()
+
+        thread = threading.Thread(target=hold)
+        thread.start()
+        semaphore.__exit__(None, None, None)
+        self.assertFalse(entered.wait(0.1))
+        semaphore.__exit__(None, None, None)
+        self.assertTrue(entered.wait(1))
+        thread.join()
+        self.assertEqual(semaphore.in_use, 0)
+
+
+class BulkReplaceSaverTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create_user(username="saver", password="x")
+        cls.company = CompanyProfile.objects.create(
+            user=user,
+            work_email="saver@example.com",
+            first_name="Test",
+            last_name="Company",
+        )
+
+    def _acquisition(self, source, new_users):
+        return {
+            "acquisition_source": source,
+            "new_users": new_users,
+            "sessions": new_users * 2,
+            "engagement_rate": 0.5,
+            "user_engagement_duration": 10.0,
+            "conversions": 1,
+        }
+
+    def test_second_save_upserts_and_deletes_missing_rows(self):
+        version = get_company_data_version(self.company.id)
+        with self.captureOnCommitCallbacks(execute=True):
+            GA4DataSaver.save_user_acquisition_source_data(
+                self.company.id,
+                [self._acquisition("google", 5), self._acquisition("direct", 3), self._acquisition("email", 1)],
+            )
+        first_version = get_company_data_version(self.company.id)
+        self.assertNotEqual(first_version, version)
+        first_id = GA4UserAcquisitionSourceData.objects.get(acquisition_source="google").id
+
+        with self.captureOnCommitCallbacks(execute=True):
+            GA4DataSaver.save_user_acquisition_source_data(
+                self.company.id, [self._acquisition("google", 8)]
+            )
+        self.assertEqual(
+            list(
+                GA4UserAcquisitionSourceData.objects.filter(company=self.company).values_list(
+                    "id", "acquisition_source", "new_users"
+                )
+            ),
+            [(first_id, "google", 8)],
+        )
+        self.assertNotEqual(get_company_data_version(self.company.id), first_version)
+
+    def test_youtube_rows_use_field_map_and_empty_save_clears(self):
+        rows = [
+            {"video": "v1", "subscribersGained": 4, "subscribersLost": 1, "views": 100},
+            {"video": "v2", "subscribersGained": 2, "subscribersLost": 0, "views": 50},
+        ]
+        with self.captureOnCommitCallbacks(execute=True):
+            YouTubeDataSaver.save_top_subscribers_data(self.company.id, rows)
+        self.assertEqual(
+            sorted(YouTubeTopSubscribersData.objects.values_list("video_id", "subscribers_gained")),
+            [("v1", 4), ("v2", 2)],
+        )
+        version = get_company_data_version(self.company.id)
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            YouTubeDataSaver.save_top_subscribers_data(self.company.id, [])
+        self.assertEqual(len(callbacks), 1)
+        self.assertFalse(YouTubeTopSubscribersData.objects.exists())
+        self.assertNotEqual(get_company_data_version(self.company.id), version)
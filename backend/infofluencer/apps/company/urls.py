@@ -36,8 +36,11 @@ from .views_data import (
     instagram_insights, 
     instagram_stories, 
     instagram_calculated_metrics, 
+    instagram_history,
+    instagram_comment_analytics,
     instagram_analysis_web, 
     refresh_instagram_data,
+    refresh_job_status,
     ga4_report,
     youtube_report
 )
@@ -91,7 +94,10 @@ urlpatterns += [
     path('analytics/instagram/insights/', instagram_insights, name='instagram_insights'),
     path('analytics/instagram/stories/', instagram_stories, name='instagram_stories'),
     path('analytics/instagram/calculated/', instagram_calculated_metrics, name='instagram_calculated_metrics'),
+    path('analytics/instagram/history/', instagram_history, name='instagram_history'),
+    path('analytics/instagram/comments/', instagram_comment_analytics, name='instagram_comment_analytics'),
     path('analytics/instagram/refresh/', refresh_instagram_data, name='refresh_instagram_data'),
+    path('analytics/refresh-jobs/<int:job_id>/', refresh_job_status, name='refresh_job_status'),
     path('analytics/instagram/web/', instagram_analysis_web, name='instagram_analysis_web'),
     path('analytics/connections/', api_connections, name='analytics_connections'),
     path('auth/instagram/simple-connect/', company_instagram_connect, name='company_instagram_simple_connect'),
@@ -19,10 +19,13 @@ from django.db import transaction
 import requests
 from django.urls import reverse
 from urllib.parse import urlencode
+from .credentials import GOOGLE_TOKEN_URI, credential_provider
 from .helpers import is_known, percent_distribution, top_n
+from .scripts.graph_client import graph_get, graph_url
+from .scripts.graph_rate import GraphRateLimited
+from .scripts.instagram_tokens import exchange_token
 import logging
 from google.oauth2.credentials import Credentials
-from google.auth.transport.requests import Request
 from uuid import uuid4
 from apps.company.models import OAuthState
 
@@ -233,72 +236,27 @@ def get_youtube_connection_status(request):
 
 
 def refresh_ga4_token(company_profile):
-    token = (
-        GA4Token.objects.filter(company=company_profile).order_by("-created_at").first()
-    )
-    if not token or not token.refresh_token:
-        return None
-    data = {
-        "client_id": settings.GOOGLE_CLIENT_ID,
-        "client_secret": settings.GOOGLE_CLIENT_SECRET,
-        "refresh_token": token.refresh_token,
-        "grant_type": "refresh_token",
-    }
-    resp = requests.post("https://oauth2.googleapis.com/token", data=data)
-    if resp.status_code == 200:
-        token_data = resp.json()
-        token.access_token = token_data["access_token"]
-        token.token_expiry = timezone.now() + timezone.timedelta(
-            seconds=token_data.get("expires_in", 3600)
-        )
-        token.save()
-        return token
-    return None
+    """GA4 token'ını hemen yeniler; güncel token (access_token, token_expiry) ya da None döner."""
+    return credential_provider.get(company_profile.id, "ga4", force_refresh=True)
+
 
 def get_fresh_ga4_credentials(company_profile):
-    token = GA4Token.objects.filter(company=company_profile).order_by("-created_at").first()
-    if not token or not token.access_token or not token.refresh_token:
+    cached = credential_provider.get(company_profile.id, "ga4")
+    if not cached or not cached.refresh_token:
         return None
-    creds = Credentials(
-        token=token.access_token,
-        refresh_token=token.refresh_token,
-        token_uri="https://oauth2.googleapis.com/token",
+    return Credentials(
+        token=cached.access_token,
+        refresh_token=cached.refresh_token,
+        token_uri=GOOGLE_TOKEN_URI,
         client_id=settings.GOOGLE_CLIENT_ID,
         client_secret=settings.GOOGLE_CLIENT_SECRET,
     )
-    if creds.expired and creds.refresh_token:
-        creds.refresh(Request())
-        token.access_token = creds.token
-        token.token_expiry = timezone.now() + timezone.timedelta(seconds=3600)
-        token.save()
-    return creds
+
 
 def get_fresh_youtube_credentials(company_profile):
-    """YouTube token'ını yeniler ve taze credentials döner."""
-    try:
-        token = YouTubeToken.objects.get(company=company_profile)
-        if token.token_expiry and token.token_expiry <= timezone.now():
-            # Token'ı yenile
-            data = {
-                "client_id": settings.YOUTUBE_CLIENT_ID,
-                "client_secret": settings.YOUTUBE_CLIENT_SECRET,
-                "refresh_token": token.refresh_token,
-                "grant_type": "refresh_token",
-            }
-            resp = requests.post("https://oauth2.googleapis.com/token", data=data)
-            if resp.status_code == 200:
-                token_data = resp.json()
-                token.access_token = token_data["access_token"]
-                token.token_expiry = timezone.now() + timezone.timedelta(
-                    seconds=token_data.get("expires_in", 3600)
-                )
-                token.save()
-        return token.access_token
-    except YouTubeToken.DoesNotExist:
-        return None
-    except Exception as e:
-        logging.error(f"YouTube token refresh error: {e}")
-        return None
+    """YouTube token'ını (gerekirse yenileyerek) döner."""
+    cached = credential_provider.get(company_profile.id, "youtube")
+    return cached.access_token if cached else None
 
 
 # ===== INSTAGRAM OAUTH FUNCTIONS =====
@@ -330,11 +288,10 @@ def get_instagram_connection_status(request):
         print(f"[DEBUG] Instagram connection: token={token}")
         
         if token:
-            # Token'ın geçerliliğini kontrol et
+            # Token'ın geçerliliğini kontrol et (yenileme renew_instagram_tokens komutunda yapılır;
+            # süresi dolan token silinmez, yeniden bağlanınca üzerine yazılır)
             if token.token_expiry and token.token_expiry <= timezone.now():
                 print(f"[DEBUG] Instagram connection: token expired at {token.token_expiry}, now={timezone.now()}")
-                # Token süresi dolmuş, sil
-                token.delete()
                 return Response({"connected": False, "message": "Token expired"})
             print(f"[DEBUG] Instagram connection: valid token, instagram_account_id={token.instagram_business_account_id}, facebook_page_id={token.facebook_page_id}")
             return Response({
@@ -370,8 +327,8 @@ def get_instagram_account_details(request):
             return Response({"success": False, "error": "Bağlı Instagram hesabı bulunamadı."}, status=404)
         ig_id = token.instagram_business_account_id
         access_token = token.access_token
-        resp = requests.get(
-            f'https://graph.facebook.com/v17.0/{ig_id}',
+        resp = graph_get(
+            graph_url(f'{ig_id}', 'v17.0'),
             params={
                 'fields': 'username,profile_picture_url,name',
                 'access_token': access_token
@@ -420,6 +377,13 @@ def company_instagram_connect(request):
     )
     return JsonResponse({'auth_url': META_OAUTH_URL})
 
+def _rate_limited_response(error):
+    """Graph kotası nedeniyle gönderilmeyen çağrı için tekrar denenebilir 503 yanıtı."""
+    response = JsonResponse({'error': str(error), 'retryable': True}, status=503)
+    response['Retry-After'] = str(max(int(error.retry_after + 0.5), 1))
+    return response
+
+
 @api_view(['GET'])
 @permission_classes([AllowAny])
 def company_instagram_callback(request):
@@ -440,16 +404,22 @@ def company_instagram_callback(request):
     if not code or not state:
         return JsonResponse({'error': 'Yetkilendirme kodu veya state alınamadı.'}, status=400)
     # Token alma
-    token_resp = requests.get(
-        'https://graph.facebook.com/v20.0/oauth/access_token',
-        params={
-            'client_id': META_CLIENT_ID,
-            'redirect_uri': META_REDIRECT_URI,
-            'client_secret': META_CLIENT_SECRET,
-            'code': code
-        },
-        timeout=10
-    )
+    try:
+        token_resp = graph_get(
+            graph_url('oauth/access_token', 'v20.0'),
+            params={
+                'client_id': META_CLIENT_ID,
+                'redirect_uri': META_REDIRECT_URI,
+                'client_secret': META_CLIENT_SECRET,
+                'code': code
+            },
+            timeout=10,
+            # Kod tek kullanımlık; ikinci deneme her zaman başarısız olur ve asıl hatayı gizler
+            retry=False
+        )
+    except GraphRateLimited as e:
+        # İstek gönderilmedi, kod harcanmadı; kullanıcı aynı callback'i tekrar deneyebilir
+        return _rate_limited_response(e)
     if token_resp.status_code != 200:
         return JsonResponse({'error': 'Token alınamadı', 'detail': token_resp.text}, status=400)
     token_data = token_resp.json()
@@ -457,6 +427,15 @@ def company_instagram_callback(request):
     expires_in = token_data.get('expires_in')
     if not access_token:
         return JsonResponse({'error': 'Access token alınamadı'}, status=400)
+    # Koddan gelen token kısa ömürlüdür (~1 saat); renew_instagram_tokens yalnızca süresi
+    # dolmamış token'ları yenileyebildiği için hemen uzun ömürlü (60 gün) token'la değiştirilir
+    try:
+        access_token, expires_in = exchange_token(access_token)
+    except GraphRateLimited as e:
+        return _rate_limited_response(e)
+    except Exception as e:
+        print(f"❌ Uzun ömürlü Instagram token alınamadı: {e}")
+        return JsonResponse({'error': 'Uzun ömürlü token alınamadı', 'detail': str(e)}, status=400)
     # State ile company_profile bul
     try:
         state_obj = OAuthState.objects.get(state=state, provider="instagram")
@@ -467,8 +446,8 @@ def company_instagram_callback(request):
     instagram_business_account_id = None
     facebook_page_id = None
     try:
-        pages_resp = requests.get(
-            'https://graph.facebook.com/v20.0/me/accounts',
+        pages_resp = graph_get(
+            graph_url('me/accounts', 'v20.0'),
             params={'access_token': access_token},
             timeout=10
         )
@@ -480,8 +459,8 @@ def company_instagram_callback(request):
                     print("PAGE:", page)
                     page_id = page['id']
                     page_token = page['access_token']
-                    ig_resp = requests.get(
-                        f'https://graph.facebook.com/v20.0/{page_id}',
+                    ig_resp = graph_get(
+                        graph_url(f'{page_id}', 'v20.0'),
                         params={
                             'fields': 'connected_instagram_account',
                             'access_token': page_token
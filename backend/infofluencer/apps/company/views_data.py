@@ -18,11 +18,131 @@ from .models import (
     InstagramReport,
     GA4Report,
     YouTubeReport,
+    RefreshJob,
+    InstagramAccountDailyMetric,
 )
-from apps.company.scripts.instagram_reports import get_comprehensive_instagram_data, get_instagram_basic_info, get_media_comprehensive, get_demographics_comprehensive, get_user_insights_comprehensive, get_story_insights, calculate_advanced_metrics
+from . import queries
+from .helpers import stored_number
+from apps.company.scripts.comment_analytics import analyze_comment_texts
+from apps.company.scripts.instagram_media import media_payload
 from .models import InstagramToken
+from apps.company.scripts.refresh_jobs import enqueue_refresh_job, has_recent_job, serialize_job
+from apps.company.scripts.refresh_scheduler import is_connected, request_refresh
+from apps.company.scripts.snapshot_history import snapshot_history
 from apps.accounts.models import CompanyProfile
 from django.conf import settings
+from django.utils import timezone
+from datetime import timedelta
+
+# instagram_insights'ın döndüğü gün sayısı (Graph sorgusuyla aynı pencere)
+INSIGHTS_WINDOW_DAYS = 28
+
+
+def _user_insights_payload(rows):
+    """
+    Günlük metrik satırlarını Graph insights yanıt biçimine çevirir:
+    {metric: {"data": [{"name", "period", "total_value" | "values"}]}}.
+    Toplamlarda en yeni gün, günlük değerlerde eskiden yeniye seri kullanılır.
+    """
+    totals = {}
+    series = {}
+    for row in rows:
+        value = stored_number(row["value"])
+        if row["period"] == InstagramAccountDailyMetric.PERIOD_TOTAL:
+            totals.setdefault(row["metric"], value)
+        else:
+            series.setdefault(row["metric"], []).append(
+                {"value": value, "end_time": row["date"].isoformat()}
+            )
+
+    payload = {}
+    for metric, value in totals.items():
+        payload.setdefault(metric, {"data": []})["data"].append(
+            {"name": metric, "period": "day", "total_value": {"value": value}}
+        )
+    for metric, values in series.items():
+        payload.setdefault(metric, {"data": []})["data"].append(
+            {"name": metric, "period": "day", "values": values[::-1]}
+        )
+    return payload
+
+
+def _snapshot_pending(provider, company_profile, not_connected_error):
+    """
+    Snapshot henüz yoksa API çağrılmaz; şirket zamanlayıcıda öne alınır ve
+    istemciye verinin hazırlandığı bildirilir.
+    """
+    if not is_connected(provider, company_profile):
+        return Response({"success": False, "error": not_connected_error}, status=400)
+    request_refresh(provider, company_profile)
+    return Response(
+        {
+            "success": False,
+            "pending": True,
+            "message": "Veriler hazırlanıyor, kısa süre sonra tekrar deneyin.",
+        },
+        status=202,
+    )
+
+
+def _max_age(request):
+    """
+    ?max_age=<dakika>: snapshot bundan eskiyse arka planda yenilenir.
+    Verilmezse REFRESH_STALE_AFTER_MINUTES; geçersizse None.
+    """
+    raw = request.query_params.get("max_age")
+    if raw in (None, ""):
+        return timedelta(minutes=getattr(settings, "REFRESH_STALE_AFTER_MINUTES", 60))
+    try:
+        minutes = int(raw)
+    except ValueError:
+        return None
+    return timedelta(minutes=max(minutes, 0))
+
+
+def _invalid_max_age():
+    return Response(
+        {"success": False, "error": "max_age dakika cinsinden bir tam sayı olmalıdır."},
+        status=400,
+    )
+
+
+def _section_response(company_profile, data, fetched_at, max_age):
+    """
+    Bölüm verisini hemen döner; veri max_age'den eskiyse yanıtta stale=True olur ve
+    Instagram yenileme işi kuyruğa alınır. Aktif ya da yakın zamanda açılmış bir iş
+    varsa tek bir EXISTS sorgusundan sonra yazma yapılmaz.
+    """
+    stale = fetched_at is None or timezone.now() - fetched_at > max_age
+    if (
+        stale
+        and not has_recent_job(company_profile, "instagram")
+        and is_connected("instagram", company_profile)
+    ):
+        enqueue_refresh_job(company_profile, "instagram")
+    return Response(
+        {"success": True, "data": data, "fetched_at": fetched_at, "stale": stale}
+    )
+
+
+def _instagram_snapshot_section(request, column):
+    """Son InstagramReport'un yalnızca istenen kolonunu okuyup döner."""
+    company_profile = CompanyProfile.objects.get(user=request.user)
+    max_age = _max_age(request)
+    if max_age is None:
+        return _invalid_max_age()
+    snapshot = (
+        InstagramReport.objects.filter(company=company_profile)
+        .values(column, "fetched_at")
+        .first()
+    )
+    if snapshot is None:
+        return _snapshot_pending(
+            "instagram", company_profile, "Instagram hesabı bağlı değil."
+        )
+    return _section_response(
+        company_profile, snapshot[column], snapshot["fetched_at"], max_age
+    )
 
 
 @api_view(["POST"])
@@ -44,28 +164,15 @@ def instagram_report(request):
                 "data": {
                     "basic_info": report.basic_info,
                     "media_data": report.media_data,
-                    "demographics": report.demographics,
+                    "demographics": queries.latest_instagram_demographics(company_profile) or {},
                     "user_insights": report.user_insights,
                     "calculated_metrics": report.calculated_metrics,
+                    "story_insights": report.story_insights,
                 }
             })
-        else:
-            # Token ve business account id kontrolü
-            token = InstagramToken.objects.filter(company=company_profile).first()
-            if not token or not token.instagram_business_account_id or not token.access_token:
-                return Response({"success": False, "error": "Instagram hesabı bağlı değil veya token eksik."}, status=400)
-            ig_id = token.instagram_business_account_id
-            page_token = token.access_token
-            data = get_comprehensive_instagram_data(ig_id, page_token)
-            InstagramReport.objects.create(
-                company=company_profile,
-                basic_info=data.get("basic_info", {}),
-                media_data=data.get("media_data", {}),
-                demographics=data.get("demographics", {}),
-                user_insights=data.get("user_insights", {}),
-                calculated_metrics=data.get("calculated_metrics", {}),
-            )
-            return Response({"success": True, "data": data})
+        return _snapshot_pending(
+            "instagram", company_profile, "Instagram hesabı bağlı değil veya token eksik."
+        )
     except Exception as e:
         return Response({"success": False, "error": str(e)})
 
@@ -73,19 +180,9 @@ def instagram_report(request):
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
 def instagram_basic_info(request):
-    """Instagram hesap temel bilgileri"""
-    user = request.user
+    """Instagram hesap temel bilgileri (son snapshot'tan)"""
     try:
-        company_profile = CompanyProfile.objects.get(user=user)
-        token = InstagramToken.objects.filter(company=company_profile).first()
-        if not token or not token.instagram_business_account_id or not token.access_token:
-            return Response({"success": False, "error": "Instagram hesabı bağlı değil."}, status=400)
-        
-        basic_info = get_instagram_basic_info(token.instagram_business_account_id, token.access_token)
-        if basic_info:
-            return Response({"success": True, "data": basic_info})
-        else:
-            return Response({"success": False, "error": "Temel bilgiler alınamadı."}, status=500)
+        return _instagram_snapshot_section(request, "basic_info")
     except Exception as e:
         return Response({"success": False, "error": str(e)}, status=500)
 
@@ -93,19 +190,23 @@ def instagram_basic_info(request):
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
 def instagram_media_data(request):
-    """Instagram medya verileri"""
+    """Instagram medya verileri (aktarılmış medya ve metrik tablolarından)"""
     user = request.user
     try:
         company_profile = CompanyProfile.objects.get(user=user)
-        token = InstagramToken.objects.filter(company=company_profile).first()
-        if not token or not token.instagram_business_account_id or not token.access_token:
+        max_age = _max_age(request)
+        if max_age is None:
+            return _invalid_max_age()
+        account = queries.instagram_account(company_profile)
+        if not account:
             return Response({"success": False, "error": "Instagram hesabı bağlı değil."}, status=400)
-        
-        media_data = get_media_comprehensive(token.instagram_business_account_id, token.access_token)
-        if media_data:
-            return Response({"success": True, "data": media_data})
-        else:
-            return Response({"success": False, "error": "Medya verileri alınamadı."}, status=500)
+
+        media_data = media_payload(account["instagram_business_account_id"])
+        if media_data["data"]:
+            return _section_response(
+                company_profile, media_data, account["last_data_fetch"], max_age
+            )
+        return _snapshot_pending("instagram", company_profile, "Instagram hesabı bağlı değil.")
     except Exception as e:
         return Response({"success": False, "error": str(e)}, status=500)
 
@@ -113,19 +214,23 @@ def instagram_media_data(request):
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
 def instagram_demographics(request):
-    """Instagram demografik verileri"""
+    """Instagram demografik verileri (InstagramDemographic tablosundan)"""
     user = request.user
     try:
         company_profile = CompanyProfile.objects.get(user=user)
-        token = InstagramToken.objects.filter(company=company_profile).first()
-        if not token or not token.instagram_business_account_id or not token.access_token:
+        max_age = _max_age(request)
+        if max_age is None:
+            return _invalid_max_age()
+        account = queries.instagram_account(company_profile)
+        if not account:
             return Response({"success": False, "error": "Instagram hesabı bağlı değil."}, status=400)
-        
-        demographics = get_demographics_comprehensive(token.instagram_business_account_id, token.access_token)
+
+        demographics = queries.latest_instagram_demographics(company_profile)
         if demographics:
-            return Response({"success": True, "data": demographics})
-        else:
-            return Response({"success": False, "error": "Demografik veriler alınamadı."}, status=500)
+            return _section_response(
+                company_profile, demographics, account["last_data_fetch"], max_age
+            )
+        return _snapshot_pending("instagram", company_profile, "Instagram hesabı bağlı değil.")
     except Exception as e:
         return Response({"success": False, "error": str(e)}, status=500)
 
@@ -133,19 +238,26 @@ def instagram_demographics(request):
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
 def instagram_insights(request):
-    """Instagram insights verileri"""
+    """Instagram insights verileri (son 28 günün günlük metrik tablosundan)"""
     user = request.user
     try:
         company_profile = CompanyProfile.objects.get(user=user)
-        token = InstagramToken.objects.filter(company=company_profile).first()
-        if not token or not token.instagram_business_account_id or not token.access_token:
+        max_age = _max_age(request)
+        if max_age is None:
+            return _invalid_max_age()
+        account = queries.instagram_account(company_profile)
+        if not account:
             return Response({"success": False, "error": "Instagram hesabı bağlı değil."}, status=400)
-        
-        insights = get_user_insights_comprehensive(token.instagram_business_account_id, token.access_token)
+
+        since = timezone.localdate() - timedelta(days=INSIGHTS_WINDOW_DAYS)
+        insights = _user_insights_payload(
+            queries.instagram_daily_metric_rows(account["instagram_business_account_id"], since)
+        )
         if insights:
-            return Response({"success": True, "data": insights})
-        else:
-            return Response({"success": False, "error": "Insights verileri alınamadı."}, status=500)
+            return _section_response(
+                company_profile, insights, account["last_data_fetch"], max_age
+            )
+        return _snapshot_pending("instagram", company_profile, "Instagram hesabı bağlı değil.")
     except Exception as e:
         return Response({"success": False, "error": str(e)}, status=500)
 
@@ -153,58 +265,69 @@ def instagram_insights(request):
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
 def instagram_stories(request):
-    """Instagram story verileri"""
+    """Instagram story verileri (son snapshot'tan)"""
+    try:
+        return _instagram_snapshot_section(request, "story_insights")
+    except Exception as e:
+        return Response({"success": False, "error": str(e)}, status=500)
+
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def instagram_calculated_metrics(request):
+    """Instagram hesaplanmış metrikler (son snapshot'tan)"""
+    try:
+        return _instagram_snapshot_section(request, "calculated_metrics")
+    except Exception as e:
+        return Response({"success": False, "error": str(e)}, status=500)
+
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def instagram_history(request):
+    """Takipçi/medya sayısı geçmişi (?days=90); eski dönemler haftalık/aylık snapshot'lardan gelir"""
     user = request.user
     try:
         company_profile = CompanyProfile.objects.get(user=user)
-        token = InstagramToken.objects.filter(company=company_profile).first()
-        if not token or not token.instagram_business_account_id or not token.access_token:
-            return Response({"success": False, "error": "Instagram hesabı bağlı değil."}, status=400)
-        
-        stories = get_story_insights(token.instagram_business_account_id, token.access_token)
-        if stories:
-            return Response({"success": True, "data": stories})
-        else:
-            return Response({"success": False, "error": "Story verileri alınamadı."}, status=500)
+        try:
+            days = int(request.query_params.get("days") or 90)
+        except ValueError:
+            return Response({"success": False, "error": "days bir tam sayı olmalıdır."}, status=400)
+
+        since = timezone.now() - timedelta(days=days)
+        history = [
+            {
+                "date": snapshot["fetched_at"],
+                "granularity": snapshot["granularity"],
+                "followers_count": (snapshot["basic_info"] or {}).get("followers_count"),
+                "follows_count": (snapshot["basic_info"] or {}).get("follows_count"),
+                "media_count": (snapshot["basic_info"] or {}).get("media_count"),
+            }
+            for snapshot in snapshot_history(InstagramReport, company_profile, since, "basic_info")
+        ]
+        return Response({"success": True, "data": history})
     except Exception as e:
         return Response({"success": False, "error": str(e)}, status=500)
 
 
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
-def instagram_calculated_metrics(request):
-    """Instagram hesaplanmış metrikler"""
+def instagram_comment_analytics(request):
+    """Son ?days=30 gündeki tüm yorumların terim, hashtag, mention, emoji ve duygu dağılımı"""
     user = request.user
     try:
         company_profile = CompanyProfile.objects.get(user=user)
-        token = InstagramToken.objects.filter(company=company_profile).first()
-        if not token or not token.instagram_business_account_id or not token.access_token:
+        try:
+            days = int(request.query_params.get("days") or 30)
+        except ValueError:
+            return Response({"success": False, "error": "days bir tam sayı olmalıdır."}, status=400)
+        account = queries.instagram_account(company_profile)
+        if not account:
             return Response({"success": False, "error": "Instagram hesabı bağlı değil."}, status=400)
-        
-        # Önce tüm verileri topla
-        results = {}
-        basic_info = get_instagram_basic_info(token.instagram_business_account_id, token.access_token)
-        if basic_info:
-            results['basic_info'] = basic_info
-        
-        user_insights = get_user_insights_comprehensive(token.instagram_business_account_id, token.access_token)
-        if user_insights:
-            results['user_insights'] = user_insights
-        
-        media_data = get_media_comprehensive(token.instagram_business_account_id, token.access_token)
-        if media_data:
-            results['media_data'] = media_data
-        
-        story_insights = get_story_insights(token.instagram_business_account_id, token.access_token)
-        if story_insights:
-            results['story_insights'] = story_insights
-        
-        # Hesaplanmış metrikleri hesapla
-        calculated_metrics = calculate_advanced_metrics(results)
-        if calculated_metrics:
-            return Response({"success": True, "data": calculated_metrics})
-        else:
-            return Response({"success": False, "error": "Hesaplanmış metrikler oluşturulamadı."}, status=500)
+
+        since = timezone.now() - timedelta(days=days)
+        texts = queries.instagram_comment_texts(account["instagram_business_account_id"], since)
+        return Response({"success": True, "data": analyze_comment_texts(texts)})
     except Exception as e:
         return Response({"success": False, "error": str(e)}, status=500)
 
@@ -233,19 +356,34 @@ def refresh_instagram_data(request):
     user = request.user
     try:
         company_profile = CompanyProfile.objects.get(user=user)
-        token = InstagramToken.objects.filter(company=company_profile).first()
-        if not token or not token.instagram_business_account_id or not token.access_token:
+        if not is_connected("instagram", company_profile):
             return Response({"success": False, "error": "Instagram hesabı bağlı değil."}, status=400)
-        
-        # Kapsamlı analizi çalıştır
-        results = get_comprehensive_instagram_data(token.instagram_business_account_id, token.access_token)
-        
-        # Token'ın son güncelleme zamanını güncelle
-        from datetime import datetime
-        token.last_data_fetch = datetime.now()
-        token.save()
-        
-        return Response({"success": True, "data": results, "message": "Veriler başarıyla yenilendi."})
+
+        # Veri çekme isteği bekletmez; iş run_refresh_jobs worker'ında çalışır
+        job, created = enqueue_refresh_job(company_profile, "instagram")
+        return Response(
+            {
+                "success": True,
+                "data": serialize_job(job),
+                "coalesced": not created,
+                "message": "Veri yenileme kuyruğa alındı.",
+            },
+            status=202,
+        )
+    except Exception as e:
+        return Response({"success": False, "error": str(e)}, status=500)
+
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def refresh_job_status(request, job_id):
+    """Yenileme işinin durumu ve bölüm bazında ilerlemesi"""
+    try:
+        company_profile = CompanyProfile.objects.get(user=request.user)
+        job = RefreshJob.objects.filter(id=job_id, company=company_profile).first()
+        if not job:
+            return Response({"success": False, "error": "İş bulunamadı."}, status=404)
+        return Response({"success": True, "data": serialize_job(job)})
     except Exception as e:
         return Response({"success": False, "error": str(e)}, status=500)
 
@@ -253,123 +391,27 @@ def refresh_instagram_data(request):
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
 def ga4_report(request):
-    from django.conf import settings
-    from apps.company.scripts.ga4_reports import get_ga4_report
     try:
         company_profile = CompanyProfile.objects.get(user=request.user)
         report = GA4Report.objects.filter(company=company_profile).first()
         if report:
             return Response({"success": True, "data": report.report_data})
-        # --- Eğer veri yoksa API'den çek ---
-        token = GA4Token.objects.filter(company=company_profile).first()
-        if not token or not token.access_token or not token.property_id:
-            return Response({"success": False, "error": "GA4 bağlantısı veya property ID eksik."}, status=400)
-        # Client ID ve secret settings.py'den
-        client_id = getattr(settings, "GOOGLE_CLIENT_ID", None)
-        client_secret = getattr(settings, "GOOGLE_CLIENT_SECRET", None)
-        if not client_id or not client_secret:
-            return Response({"success": False, "error": "GA4 client ID veya secret eksik."}, status=400)
-        # API'den veri çek
-        try:
-            # Örnek: summary, traffic_sources, device_categories, geo, daily gibi anahtarlar bekleniyor
-            # Burada tek bir toplu fonksiyon yoksa, birden fazla rapor çekip birleştirilebilir
-            summary = get_ga4_report("userAcquisitionSource", token.access_token, token.refresh_token, client_id, client_secret, token.property_id)
-            traffic_sources = get_ga4_report("userAcquisitionSource", token.access_token, token.refresh_token, client_id, client_secret, token.property_id)
-            device_categories = get_ga4_report("deviceCategory", token.access_token, token.refresh_token, client_id, client_secret, token.property_id)
-            geo = get_ga4_report("country", token.access_token, token.refresh_token, client_id, client_secret, token.property_id)
-            daily = []  # Günlük kullanıcı için ek fonksiyon eklenebilir
-            # Demografik veriler
-            age_data = get_ga4_report("age", token.access_token, token.refresh_token, client_id, client_secret, token.property_id)
-            gender_data = get_ga4_report("userGender", token.access_token, token.refresh_token, client_id, client_secret, token.property_id)
-            report_data = {
-                "summary": {
-                    "total_users": sum([item.get("new_users", 0) for item in summary]),
-                    "conversions": sum([item.get("conversions", 0) for item in summary]),
-                    "conversion_rate": 0,  # Eklenebilir
-                    "avg_session_duration": 0,  # Eklenebilir
-                },
-                "traffic_sources": traffic_sources,
-                "device_categories": device_categories,
-                "geo": geo,
-                "daily": daily,
-                "demographics": {
-                    "age": age_data,
-                    "gender": gender_data,
-                }
-            }
-            GA4Report.objects.create(company=company_profile, report_data=report_data)
-            return Response({"success": True, "data": report_data})
-        except Exception as e:
-            return Response({"success": False, "error": f"GA4 API hatası: {str(e)}"}, status=500)
+        return _snapshot_pending(
+            "ga4", company_profile, "GA4 bağlantısı veya property ID eksik."
+        )
     except Exception as e:
         return Response({"success": False, "error": str(e)})
 
-YOUTUBE_REPORT_TYPES = [
-    'trafficSource', 'ageGroup', 'deviceType'
-]
-
-def fetch_youtube_reports_for_company(company_profile):
-    from .scripts.youtube_reports import get_youtube_report
-    from django.conf import settings
-    import sys
-    from apps.company.models import YouTubeReport
-    youtube_token = YouTubeToken.objects.filter(company=company_profile).first()
-    if not youtube_token:
-        print('[YouTubeReport][DEBUG] YouTube bağlantısı yok.', file=sys.stderr)
-        return False, ['YouTube bağlantısı yok.']
-    successful = 0
-    failed = 0
-    errors = []
-    # Tüm raporları tek bir JSON'da biriktir
-    combined_report_data = {}
-    for report_type in YOUTUBE_REPORT_TYPES:
-        try:
-            print(f'[YouTubeReport][DEBUG] {report_type} raporu çekiliyor...', file=sys.stderr)
-            data = get_youtube_report(
-                report_type=report_type,
-                access_token=youtube_token.access_token,
-                refresh_token=youtube_token.refresh_token,
-                client_id=settings.YOUTUBE_CLIENT_ID,
-                client_secret=settings.YOUTUBE_CLIENT_SECRET
-            )
-            print(f'[YouTubeReport][DEBUG] {report_type} API response: {data}', file=sys.stderr)
-            # Her rapor tipini kendi anahtarında biriktir
-            if report_type == 'trafficSource':
-                combined_report_data['traffic_sources'] = data
-            elif report_type == 'ageGroup':
-                combined_report_data['age_groups'] = data
-            elif report_type == 'deviceType':
-                combined_report_data['device_types'] = data
-            successful += 1
-        except Exception as e:
-            failed += 1
-            print(f'[YouTubeReport][ERROR] {report_type} hatası: {e}', file=sys.stderr)
-            errors.append(f"{report_type}: {str(e)}")
-    # Eğer en az bir rapor çekildiyse, kaydet
-    if successful > 0:
-        report, created = YouTubeReport.objects.get_or_create(
-            company=company_profile,
-            defaults={'report_data': {}}
-        )
-        report_data = report.report_data or {}
-        report_data.update(combined_report_data)
-        report.report_data = report_data
-        report.save()
-        print(f'[YouTubeReport][DEBUG] Tüm raporlar YouTubeReport tablosuna kaydedildi.', file=sys.stderr)
-        return True, []
-    print(f'[YouTubeReport][DEBUG] Sonuç: {successful} başarılı, {failed} başarısız', file=sys.stderr)
-    return False, errors
-
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def fetch_youtube_reports(request):
     try:
         company_profile = CompanyProfile.objects.get(user=request.user)
-        success, errors = fetch_youtube_reports_for_company(company_profile)
-        return Response({
-            'success': success,
-            'errors': errors
-        })
+        if not is_connected('youtube', company_profile):
+            return Response({'success': False, 'errors': ['YouTube bağlantısı yok.']}, status=400)
+        # Raporlar zamanlayıcı tarafından arka planda çekilir
+        request_refresh('youtube', company_profile)
+        return Response({'success': True, 'pending': True, 'errors': []}, status=202)
     except Exception as e:
         return Response({'success': False, 'error': str(e)}, status=500)
 
@@ -422,20 +464,8 @@ def youtube_report(request):
             print('[YouTubeReport][DEBUG] DBde rapor bulundu, direkt dönülüyor.', file=sys.stderr)
             formatted = format_youtube_report_for_frontend(report.report_data)
             return Response({'success': True, 'data': formatted})
-        print('[YouTubeReport][DEBUG] DBde rapor yok, APIden çekilecek.', file=sys.stderr)
-        success, errors = fetch_youtube_reports_for_company(company_profile)
-        if success:
-            report = YouTubeReport.objects.filter(company=company_profile).first()
-            if report:
-                print('[YouTubeReport][DEBUG] API sonrası rapor kaydedildi ve dönülüyor.', file=sys.stderr)
-                formatted = format_youtube_report_for_frontend(report.report_data)
-                return Response({'success': True, 'data': formatted, 'message': 'Veri API üzerinden güncellendi.'})
-            else:
-                print('[YouTubeReport][ERROR] API çağrısı başarılı ama veri kaydedilemedi.', file=sys.stderr)
-                return Response({'success': False, 'error': 'API çağrısı başarılı ama veri kaydedilemedi.'}, status=500)
-        else:
-            print(f'[YouTubeReport][ERROR] Veri yok ve API çağrısı başarısız. Hatalar: {errors}', file=sys.stderr)
-            return Response({'success': False, 'error': 'Veri yok ve API çağrısı başarısız.', 'api_error': errors}, status=500)
+        print('[YouTubeReport][DEBUG] DBde rapor yok, yenileme kuyruğa alınıyor.', file=sys.stderr)
+        return _snapshot_pending('youtube', company_profile, 'YouTube bağlantısı yok.')
     except Exception as e:
         print(f'[YouTubeReport][ERROR] Genel hata: {e}', file=sys.stderr)
         return Response({'success': False, 'error': str(e)}, status=500)
@@ -11,7 +11,7 @@ from rest_framework.permissions import IsAuthenticated
 from rest_framework.decorators import api_view, permission_classes
 from django.utils import timezone
 from django.http import JsonResponse, HttpResponseBadRequest
-import requests
+from apps.company.scripts.graph_client import graph_get, graph_url
 from .models import InstagramToken
 from .permissions import IsInfluencer
 from django.shortcuts import redirect
@@ -84,15 +84,17 @@ def instagram_callback(request):
     if not code:
         return JsonResponse({'error': 'Yetkilendirme kodu alınamadı.'}, status=400)
     # Token alma
-    token_resp = requests.get(
-        'https://graph.facebook.com/v20.0/oauth/access_token',
+    token_resp = graph_get(
+        graph_url('oauth/access_token', 'v20.0'),
         params={
             'client_id': META_CLIENT_ID,
             'redirect_uri': META_REDIRECT_URI,
             'client_secret': META_CLIENT_SECRET,
             'code': code
         },
-        timeout=10
+        timeout=10,
+        # Kod tek kullanımlık; yeniden denenmez
+        retry=False
     )
     if token_resp.status_code != 200:
         return JsonResponse({'error': 'Token alınamadı', 'detail': token_resp.text}, status=400)
@@ -118,11 +120,17 @@ def instagram_report(request):
     except Exception:
         return JsonResponse({'error': 'Instagram hesabı bağlı değil.'}, status=400)
     # Örnek: Profil ve medya verisi çek
-    profile_url = 'https://graph.facebook.com/v20.0/me?fields=id,username,account_type,media_count&access_token=' + access_token
-    profile_resp = requests.get(profile_url, timeout=10)
+    profile_resp = graph_get(
+        graph_url('me', 'v20.0'),
+        params={'fields': 'id,username,account_type,media_count', 'access_token': access_token},
+        timeout=10
+    )
     profile = profile_resp.json() if profile_resp.status_code == 200 else {}
-    media_url = 'https://graph.facebook.com/v20.0/me/media?fields=id,media_type,media_url,caption,timestamp&limit=5&access_token=' + access_token
-    media_resp = requests.get(media_url, timeout=10)
+    media_resp = graph_get(
+        graph_url('me/media', 'v20.0'),
+        params={'fields': 'id,media_type,media_url,caption,timestamp', 'limit': 5, 'access_token': access_token},
+        timeout=10
+    )
     media = media_resp.json().get('data', []) if media_resp.status_code == 200 else []
     return JsonResponse({
         'profile': profile,
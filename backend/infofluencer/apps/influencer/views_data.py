@@ -1,8 +1,8 @@
-import requests
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from django.http import JsonResponse
 from .permissions import IsInfluencer
+from apps.company.scripts.graph_client import graph_get, graph_url
 from datetime import datetime, timedelta
 import json
 
@@ -10,8 +10,8 @@ import json
 
 def get_extended_instagram_info(ig_id, page_token):
     fields = 'id,username,profile_picture_url,name,biography,website,followers_count,media_count'
-    resp = requests.get(
-        f'https://graph.facebook.com/v20.0/{ig_id}',
+    resp = graph_get(
+        graph_url(f'{ig_id}', 'v20.0'),
         params={
             'fields': fields,
             'access_token': page_token
@@ -24,8 +24,8 @@ def get_extended_instagram_info(ig_id, page_token):
 
 def get_facebook_page_info(page_id, page_token):
     fields = 'id,name,emails,location,category_list,category'
-    resp = requests.get(
-        f'https://graph.facebook.com/v20.0/{page_id}',
+    resp = graph_get(
+        graph_url(f'{page_id}', 'v20.0'),
         params={
             'fields': fields,
             'access_token': page_token
@@ -70,8 +70,8 @@ def get_demographics_data(ig_id, page_token):
     ]
     results = {}
     for metric in demographic_metrics:
-        resp = requests.get(
-            f'https://graph.facebook.com/v20.0/{ig_id}/insights',
+        resp = graph_get(
+            graph_url(f'{ig_id}/insights', 'v20.0'),
             params={
                 'metric': metric,
                 'period': 'lifetime',
@@ -96,8 +96,8 @@ def get_audience_data(ig_id, page_token):
     ]
     results = {}
     for metric in audience_metrics:
-        resp = requests.get(
-            f'https://graph.facebook.com/v20.0/{ig_id}/insights',
+        resp = graph_get(
+            graph_url(f'{ig_id}/insights', 'v20.0'),
             params={
                 'metric': metric,
                 'period': 'day',
@@ -122,8 +122,8 @@ def get_story_insights(ig_id, page_token):
     until_date = datetime.now().strftime('%Y-%m-%d')
     results = {}
     for metric in story_metrics:
-        resp = requests.get(
-            f'https://graph.facebook.com/v20.0/{ig_id}/insights',
+        resp = graph_get(
+            graph_url(f'{ig_id}/insights', 'v20.0'),
             params={
                 'metric': metric,
                 'period': 'day',
@@ -140,8 +140,8 @@ def get_story_insights(ig_id, page_token):
     return results
 
 def analyze_media_performance(ig_id, page_token):
-    media_resp = requests.get(
-        f'https://graph.facebook.com/v20.0/{ig_id}/media',
+    media_resp = graph_get(
+        graph_url(f'{ig_id}/media', 'v20.0'),
         params={
             'fields': 'id,media_type,like_count,comments_count,timestamp,permalink',
             'limit': 10,
@@ -172,8 +172,8 @@ def analyze_media_performance(ig_id, page_token):
 
 def get_facebook_page_and_ig_id(access_token, page_id=None):
     print(f"[DEBUG] get_facebook_page_and_ig_id: access_token={access_token[:10]}... page_id={page_id}")
-    pages_resp = requests.get(
-        'https://graph.facebook.com/v20.0/me/accounts',
+    pages_resp = graph_get(
+        graph_url('me/accounts', 'v20.0'),
         params={'access_token': access_token},
         timeout=10
     )
@@ -195,8 +195,8 @@ def get_facebook_page_and_ig_id(access_token, page_id=None):
         return None, None, None, {'error': 'Uygun Facebook sayfası bulunamadı.'}
     page_id = page['id']
     page_token = page['access_token']
-    ig_resp = requests.get(
-        f'https://graph.facebook.com/v20.0/{page_id}',
+    ig_resp = graph_get(
+        graph_url(f'{page_id}', 'v20.0'),
         params={
             'fields': 'connected_instagram_account',
             'access_token': page_token
@@ -220,8 +220,8 @@ def get_demographics_data_v22(ig_id, page_token):
         results = {}
         breakdown_options = ['age', 'city', 'country', 'gender']
         for breakdown in breakdown_options:
-            resp = requests.get(
-                f'https://graph.facebook.com/v22.0/{ig_id}/insights',
+            resp = graph_get(
+                graph_url(f'{ig_id}/insights'),
                 params={
                     'metric': 'follower_demographics',
                     'period': 'lifetime',
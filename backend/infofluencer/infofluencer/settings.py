@@ -78,6 +78,19 @@ DATABASES = {
     }
 }
 
+# Önbellek: varsayılan süreç içi bellek; üretimde CACHE_BACKEND ile değiştirilebilir
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', 'infofluencer'),
+    }
+}
+
+# Dashboard yanıt önbelleği veritabanındaki veri sürümüyle geçersiz kılınır (None = süresiz).
+# Süreç içi (locmem) önbellekte None yerine DASHBOARD_LOCAL_CACHE_TIMEOUT saniye kullanılır
+DASHBOARD_CACHE_TIMEOUT = None
+DASHBOARD_LOCAL_CACHE_TIMEOUT = int(os.getenv('DASHBOARD_LOCAL_CACHE_TIMEOUT', 300))
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -162,6 +175,95 @@ YOUTUBE_CLIENT_SECRET = os.getenv('YOUTUBE_CLIENT_SECRET')
 INSTAGRAM_APP_ID = os.getenv('INSTAGRAM_APP_ID')
 INSTAGRAM_APP_SECRET = os.getenv('INSTAGRAM_APP_SECRET')
 
+# Graph API kök adresi (testlerde sahte sunucuya yönlendirilir)
+GRAPH_API_BASE_URL = os.getenv('GRAPH_API_BASE_URL', 'https://graph.facebook.com')
+
+# Graph API HTTP istemcisi: bağlantı havuzu, yeniden deneme ve zaman aşımı
+GRAPH_API_POOL_SIZE = int(os.getenv('GRAPH_API_POOL_SIZE', 20))
+GRAPH_API_MAX_RETRIES = int(os.getenv('GRAPH_API_MAX_RETRIES', 2))
+GRAPH_API_BACKOFF_FACTOR = float(os.getenv('GRAPH_API_BACKOFF_FACTOR', 0.5))
+GRAPH_API_TIMEOUT = int(os.getenv('GRAPH_API_TIMEOUT', 15))
+
+# Graph API hız sınırı yöneticisi: X-App-Usage / X-Business-Use-Case-Usage yüzdesi bu hedefi
+# geçmeyecek şekilde çağrılar bekletilir; kapasite bilinmiyorsa hedef aşıldığında her çağrı
+# GRAPH_RATE_BACKOFF_SECONDS bekler, tek çağrı en fazla GRAPH_RATE_MAX_WAIT_SECONDS bekletilir
+GRAPH_RATE_GOVERNOR_ENABLED = os.getenv('GRAPH_RATE_GOVERNOR_ENABLED', 'True') == 'True'
+GRAPH_RATE_TARGET_PERCENT = float(os.getenv('GRAPH_RATE_TARGET_PERCENT', 90))
+GRAPH_RATE_BACKOFF_SECONDS = float(os.getenv('GRAPH_RATE_BACKOFF_SECONDS', 5))
+GRAPH_RATE_MAX_WAIT_SECONDS = float(os.getenv('GRAPH_RATE_MAX_WAIT_SECONDS', 300))
+# Web isteklerindeki Graph çağrıları en fazla bu kadar bekler; fazlası gerekirse hemen
+# GraphRateLimited ile döner (GRAPH_RATE_MAX_WAIT_SECONDS yalnızca worker komutlarında geçerli)
+GRAPH_RATE_REQUEST_MAX_WAIT_SECONDS = float(os.getenv('GRAPH_RATE_REQUEST_MAX_WAIT_SECONDS', 2))
+
+# Instagram veri çekme: bölümler paralel çekilir, hesap başına en fazla bu kadar eşzamanlı bölüm
+INSTAGRAM_CONCURRENT_FETCH = os.getenv('INSTAGRAM_CONCURRENT_FETCH', 'True') == 'True'
+INSTAGRAM_FETCH_MAX_WORKERS = int(os.getenv('INSTAGRAM_FETCH_MAX_WORKERS', 4))
+
+# Artımlı medya aktarımı: sayfa boyutu, insights'ı yeniden taranan gün sayısı ve çalıştırma başına backfill sayfası
+INSTAGRAM_MEDIA_PAGE_SIZE = int(os.getenv('INSTAGRAM_MEDIA_PAGE_SIZE', 50))
+INSTAGRAM_MEDIA_RESCAN_DAYS = int(os.getenv('INSTAGRAM_MEDIA_RESCAN_DAYS', 7))
+INSTAGRAM_MEDIA_BACKFILL_PAGES = int(os.getenv('INSTAGRAM_MEDIA_BACKFILL_PAGES', 5))
+
+# Yorum aktarımı: medya başına en fazla sayfa (100 yorum/sayfa) ve comments_analysis'te tutulan metin sayısı
+INSTAGRAM_COMMENT_MAX_PAGES = int(os.getenv('INSTAGRAM_COMMENT_MAX_PAGES', 50))
+INSTAGRAM_COMMENT_TEXT_SAMPLE = int(os.getenv('INSTAGRAM_COMMENT_TEXT_SAMPLE', 20))
+
+# Desteklenmediği kaydedilen insights metrikleri bu kadar gün sonra yeniden denenir
+INSTAGRAM_CAPABILITY_REPROBE_DAYS = int(os.getenv('INSTAGRAM_CAPABILITY_REPROBE_DAYS', 7))
+
+# renew_instagram_tokens: süresi bu kadar gün içinde dolacak token'lar yenilenir;
+# aynı anda en fazla INSTAGRAM_TOKEN_RENEW_CONCURRENCY yenileme isteği atılır
+INSTAGRAM_TOKEN_RENEW_WITHIN_DAYS = int(os.getenv('INSTAGRAM_TOKEN_RENEW_WITHIN_DAYS', 7))
+INSTAGRAM_TOKEN_RENEW_CONCURRENCY = int(os.getenv('INSTAGRAM_TOKEN_RENEW_CONCURRENCY', 4))
+
+# Arka plan yenileme zamanlayıcısı (refresh_stale_accounts): eskime süresi ve sağlayıcı başına eşzamanlılık
+REFRESH_STALE_AFTER_MINUTES = int(os.getenv('REFRESH_STALE_AFTER_MINUTES', 60))
+REFRESH_PROVIDER_CONCURRENCY = {
+    'ga4': int(os.getenv('REFRESH_GA4_CONCURRENCY', 2)),
+    'youtube': int(os.getenv('REFRESH_YOUTUBE_CONCURRENCY', 2)),
+    'instagram': int(os.getenv('REFRESH_INSTAGRAM_CONCURRENCY', 2)),
+}
+
+# Yenilemesi art arda başarısız olan şirketler REFRESH_FAILURE_BACKOFF_MINUTES'tan başlayıp
+# her hatada ikiye katlanan (en fazla REFRESH_FAILURE_BACKOFF_MAX_MINUTES) süre boyunca atlanır
+REFRESH_FAILURE_BACKOFF_MINUTES = int(os.getenv('REFRESH_FAILURE_BACKOFF_MINUTES', 15))
+REFRESH_FAILURE_BACKOFF_MAX_MINUTES = int(os.getenv('REFRESH_FAILURE_BACKOFF_MAX_MINUTES', 1440))
+
+# RefreshJob kuyruğu (run_refresh_jobs): bu süreden uzun 'running' kalan işler başarısız sayılır
+REFRESH_JOB_TIMEOUT_MINUTES = int(os.getenv('REFRESH_JOB_TIMEOUT_MINUTES', 30))
+# Hiçbir worker'ın almadığı 'pending' işler bu süreden sonra başarısız sayılır (dakika)
+REFRESH_JOB_PENDING_TIMEOUT_MINUTES = int(os.getenv('REFRESH_JOB_PENDING_TIMEOUT_MINUTES', 15))
+# Okuma endpointleri eski veri gördüğünde bu süre içinde açılmış bir iş varsa yeni iş açmaz (dakika)
+REFRESH_ON_READ_THROTTLE_MINUTES = int(os.getenv('REFRESH_ON_READ_THROTTLE_MINUTES', 5))
+
+# GA4 günlük fact tabloları: ilk çalıştırmada geriye dönük çekilen gün sayısı ve GA4'ün
+# geç işlenen verisi için her yenilemede yeniden çekilen son gün sayısı
+GA4_DAILY_BACKFILL_DAYS = int(os.getenv('GA4_DAILY_BACKFILL_DAYS', 90))
+GA4_DAILY_RESTATE_DAYS = int(os.getenv('GA4_DAILY_RESTATE_DAYS', 3))
+
+# YouTube günlük fact'leri: pencere başına gün sayısı, ilk çalıştırmada geriye dönük gün,
+# her yenilemede yeniden çekilen son gün sayısı, snapshot bölümlerinin kapsadığı gün ve
+# reports.query sayfa boyutu (startIndex sayfalaması)
+YOUTUBE_WINDOW_DAYS = int(os.getenv('YOUTUBE_WINDOW_DAYS', 30))
+YOUTUBE_BACKFILL_DAYS = int(os.getenv('YOUTUBE_BACKFILL_DAYS', 90))
+YOUTUBE_RESTATE_DAYS = int(os.getenv('YOUTUBE_RESTATE_DAYS', 3))
+YOUTUBE_REPORT_WINDOW_DAYS = int(os.getenv('YOUTUBE_REPORT_WINDOW_DAYS', 90))
+YOUTUBE_PAGE_SIZE = int(os.getenv('YOUTUBE_PAGE_SIZE', 200))
+# Bir şirketin YouTube rapor tiplerini aynı anda sorgulayan thread sayısı (1 = sıralı)
+YOUTUBE_QUERY_CONCURRENCY = int(os.getenv('YOUTUBE_QUERY_CONCURRENCY', 1))
+
+# GA4/YouTube token önbelleği: token'lar bu süre bellekte tutulur ve süresinin
+# dolmasına CREDENTIAL_REFRESH_MARGIN_SECONDS kala yenilenir (saniye)
+CREDENTIAL_CACHE_TTL_SECONDS = int(os.getenv('CREDENTIAL_CACHE_TTL_SECONDS', 300))
+CREDENTIAL_REFRESH_MARGIN_SECONDS = int(os.getenv('CREDENTIAL_REFRESH_MARGIN_SECONDS', 300))
+
+# Rapor snapshot geçmişi (prune_snapshots): bu günden yeni snapshot'lar ham kalır, daha
+# eskileri SNAPSHOT_WEEKLY_DAYS'e kadar haftada bire, sonrası ayda bire indirgenir;
+# SNAPSHOT_RETENTION_DAYS'ten eskiler silinir
+SNAPSHOT_RAW_DAYS = int(os.getenv('SNAPSHOT_RAW_DAYS', 14))
+SNAPSHOT_WEEKLY_DAYS = int(os.getenv('SNAPSHOT_WEEKLY_DAYS', 180))
+SNAPSHOT_RETENTION_DAYS = int(os.getenv('SNAPSHOT_RETENTION_DAYS', 730))
+
 META_CLIENT_ID = os.getenv('META_CLIENT_ID')
 META_CLIENT_SECRET = os.getenv('META_CLIENT_SECRET')
 
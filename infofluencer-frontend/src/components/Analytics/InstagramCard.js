@@ -1,4 +1,4 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import { Card, CardContent, CardHeader, CardTitle } from '../common/Card';
 import Button from '../common/Button';
 import ErrorMessage from '../common/ErrorMessage';
@@ -12,15 +12,23 @@ import {
   getInstagramStories, 
   getInstagramCalculatedMetrics, 
   refreshInstagramData,
+  getRefreshJobStatus,
   getInstagramConnectionStatus
 } from '../../services/analyticsApi';
 
+const REFRESH_POLL_INTERVAL_MS = 2000;
+const REFRESH_POLL_ATTEMPTS = 90;
+
 const InstagramCard = () => {
   const [loading, setLoading] = useState(false);
   const [error, setError] = useState(null);
   const [data, setData] = useState(null);
   const [activeTab, setActiveTab] = useState('overview');
   const [isConnected, setIsConnected] = useState(false);
+  const [refreshing, setRefreshing] = useState(false);
+  // İş bitince o an açık olan sekme yeniden yüklenir
+  const activeTabRef = useRef(activeTab);
+  activeTabRef.current = activeTab;
 
   const fetchInstagramData = async (endpoint) => {
     setLoading(true);
@@ -74,18 +82,39 @@ const InstagramCard = () => {
     }
   };
 
+  const waitForJob = async (jobId) => {
+    for (let attempt = 0; attempt < REFRESH_POLL_ATTEMPTS; attempt++) {
+      await new Promise((resolve) => setTimeout(resolve, REFRESH_POLL_INTERVAL_MS));
+      const result = await getRefreshJobStatus(jobId);
+      if (!result.success) return { status: 'failed', error: result.error };
+      if (result.data.status === 'succeeded' || result.data.status === 'failed') return result.data;
+    }
+    return null;
+  };
+
   const refreshData = async () => {
+    setRefreshing(true);
     try {
+      // Endpoint veriyi değil kuyruğa alınan RefreshJob'ı döner (202)
       const result = await refreshInstagramData();
-      
-      if (result.success) {
-        setData(result.data);
+      if (!result.success) {
+        showMessage(result.error || 'Veri yenileme hatası', 'error');
+        return;
+      }
+      showMessage('Veri yenileme başlatıldı', 'info');
+      const job = await waitForJob(result.data.job_id);
+      if (!job) {
+        showMessage('Veri yenileme sürüyor, daha sonra tekrar yükleyin', 'info');
+      } else if (job.status === 'succeeded') {
         showMessage('Veriler başarıyla yenilendi', 'success');
+        await fetchInstagramData(activeTabRef.current);
       } else {
-        showMessage(result.error || 'Veri yenileme hatası', 'error');
+        showMessage(job.error || 'Veri yenileme hatası', 'error');
       }
     } catch (err) {
       showMessage('Veri yenileme hatası', 'error');
+    } finally {
+      setRefreshing(false);
     }
   };
 
@@ -191,9 +220,9 @@ const InstagramCard = () => {
                           <div className="text-gray-600">{comment.text}</div>
                         </div>
                       ))}
-                      {media.comments_analysis.comment_texts.length > 3 && (
+                      {(media.comments_analysis.text_count ?? media.comments_analysis.comment_texts.length) > 3 && (
                         <div className="text-xs text-gray-500">
-                          +{media.comments_analysis.comment_texts.length - 3} yorum daha...
+                          +{(media.comments_analysis.text_count ?? media.comments_analysis.comment_texts.length) - 3} yorum daha...
                         </div>
                       )}
                     </div>
@@ -285,10 +314,13 @@ const InstagramCard = () => {
     if (!data?.media_data?.data) return <p>Medya verisi bulunamadı</p>;
 
     const allComments = [];
+    // comment_texts medya başına bir örnektir; toplam metinli yorum sayısı text_count'tadır
+    let totalTextComments = 0;
     
     // Tüm medyalardan yorumları topla
     data.media_data.data.forEach((media) => {
       if (media.comments_analysis?.comment_texts) {
+        totalTextComments += media.comments_analysis.text_count ?? media.comments_analysis.comment_texts.length;
         media.comments_analysis.comment_texts.forEach((comment) => {
           allComments.push({
             ...comment,
@@ -304,7 +336,14 @@ const InstagramCard = () => {
     return (
       <div className="space-y-4">
         <div className="flex justify-between items-center">
-          <h4 className="font-semibold">Toplam {allComments.length} Yorum</h4>
+          <h4 className="font-semibold">
+            Toplam {totalTextComments} Yorum
+            {totalTextComments > allComments.length && (
+              <span className="ml-2 text-sm font-normal text-gray-500">
+                (örnek: {allComments.length} yorum gösteriliyor)
+              </span>
+            )}
+          </h4>
           <div className="text-sm text-gray-500">
             Ortalama uzunluk: {Math.round(allComments.reduce((sum, c) => sum + c.text.length, 0) / allComments.length)} karakter
           </div>
@@ -381,11 +420,11 @@ const InstagramCard = () => {
             </Button>
             <Button
               onClick={refreshData}
-              disabled={loading}
+              disabled={loading || refreshing}
               size="sm"
               variant="outline"
             >
-              Yenile
+              {refreshing ? 'Yenileniyor...' : 'Yenile'}
             </Button>
           </div>
         </CardTitle>
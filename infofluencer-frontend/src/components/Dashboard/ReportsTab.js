@@ -125,7 +125,11 @@ const ReportsTab = () => {
     let totalLength = 0;
     let totalComments = 0;
     mediaData.forEach(m => {
-      if (m.comments_analysis && m.comments_analysis.comment_texts) {
+      // comment_texts bir örnektir; varsa tüm yorumların ortalaması kullanılır
+      if (m.comments_analysis && m.comments_analysis.total_comments) {
+        totalLength += (m.comments_analysis.average_length || 0) * m.comments_analysis.total_comments;
+        totalComments += m.comments_analysis.total_comments;
+      } else if (m.comments_analysis && m.comments_analysis.comment_texts) {
         m.comments_analysis.comment_texts.forEach(c => {
           totalLength += (c.text || '').length;
           totalComments++;
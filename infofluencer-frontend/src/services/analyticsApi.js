@@ -208,3 +208,12 @@ export async function refreshInstagramData() {
   });
   return await response.json();
 }
+
+// Yenileme işinin durumu (pending | running | succeeded | failed)
+export async function getRefreshJobStatus(jobId) {
+  const token = localStorage.getItem("access_token");
+  const response = await fetch(`/api/company/analytics/refresh-jobs/${jobId}/`, {
+    headers: { Authorization: `Bearer ${token}` },
+  });
+  return await response.json();
+}